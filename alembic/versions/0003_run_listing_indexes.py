@@ -0,0 +1,38 @@
+"""run listing indexes
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'ix_runs_created_at_id': ['created_at', 'id'],
+    'ix_runs_workflow_id_created_at_id': ['workflow_id', 'created_at', 'id'],
+    'ix_runs_tenant_id_created_at_id': ['tenant_id', 'created_at', 'id'],
+    'ix_runs_status_created_at_id': ['status', 'created_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    # CONCURRENTLY keeps the runs table writable while the indexes build; it
+    # cannot run inside the migration transaction.
+    with op.get_context().autocommit_block():
+        for name, columns in INDEXES.items():
+            op.create_index(name, 'runs', columns, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.drop_index(name, table_name='runs', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,53 @@
+"""snapshot deltas and compressed blobs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'snapshot_blobs',
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('encoding', sa.String(), nullable=False),
+        sa.Column('size_bytes', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('content_hash'),
+    )
+    # Blobs are already compressed; don't let TOAST try again.
+    op.execute("ALTER TABLE snapshot_blobs ALTER COLUMN data SET STORAGE EXTERNAL")
+
+    op.add_column('run_snapshots', sa.Column('kind', sa.String(), server_default='full', nullable=False))
+    op.add_column('run_snapshots', sa.Column('base_snapshot_id', postgresql.UUID(as_uuid=True), nullable=True))
+    op.add_column('run_snapshots', sa.Column('blob_hash', sa.String(length=64), nullable=True))
+    op.alter_column('run_snapshots', 'snapshot_json', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=True)
+    op.create_foreign_key('run_snapshots_base_snapshot_id_fkey', 'run_snapshots', 'run_snapshots', ['base_snapshot_id'], ['id'])
+    op.create_foreign_key('run_snapshots_blob_hash_fkey', 'run_snapshots', 'snapshot_blobs', ['blob_hash'], ['content_hash'])
+    op.create_index('ix_run_snapshots_run_id_created_at', 'run_snapshots', ['run_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_run_snapshots_run_id_created_at', table_name='run_snapshots')
+    op.drop_constraint('run_snapshots_blob_hash_fkey', 'run_snapshots', type_='foreignkey')
+    op.drop_constraint('run_snapshots_base_snapshot_id_fkey', 'run_snapshots', type_='foreignkey')
+    # Deltas and blob-backed rows can't be expressed in the old schema.
+    op.execute("DELETE FROM run_snapshots WHERE snapshot_json IS NULL OR kind <> 'full'")
+    op.alter_column('run_snapshots', 'snapshot_json', existing_type=postgresql.JSONB(astext_type=sa.Text()), nullable=False)
+    op.drop_column('run_snapshots', 'blob_hash')
+    op.drop_column('run_snapshots', 'base_snapshot_id')
+    op.drop_column('run_snapshots', 'kind')
+    op.drop_table('snapshot_blobs')
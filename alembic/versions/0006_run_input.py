@@ -0,0 +1,28 @@
+"""run input payload and webhook input schema
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('input_json', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+    op.add_column('webhook_endpoints', sa.Column('input_schema', postgresql.JSONB(astext_type=sa.Text()), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('webhook_endpoints', 'input_schema')
+    op.drop_column('runs', 'input_json')
@@ -0,0 +1,41 @@
+"""delayed runs and cron schedules
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('runs', sa.Column('scheduled_at', sa.DateTime(), nullable=True))
+    op.create_table(
+        'workflow_schedules',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('workflow_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('cron', sa.String(), nullable=False),
+        sa.Column('input_json', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['workflow_id'], ['workflows.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_workflow_schedules_workflow_id', 'workflow_schedules', ['workflow_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_workflow_schedules_workflow_id', table_name='workflow_schedules')
+    op.drop_table('workflow_schedules')
+    op.drop_column('runs', 'scheduled_at')
@@ -0,0 +1,27 @@
+"""workflow and run priority
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('workflows', sa.Column('priority', sa.String(), server_default='normal', nullable=False))
+    op.add_column('runs', sa.Column('priority', sa.String(), server_default='normal', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('runs', 'priority')
+    op.drop_column('workflows', 'priority')
@@ -1,5 +1,6 @@
 import redis.asyncio as redis
 import os
+from apps.api.app.metrics import count_round_trips
 
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
@@ -10,6 +11,7 @@ class RedisClient:
     async def connect(self):
         if not self.client:
             self.client = redis.from_url(REDIS_URL, encoding="utf-8", decode_responses=True)
+            count_round_trips(self.client)
 
     async def close(self):
         if self.client:
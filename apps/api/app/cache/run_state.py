@@ -0,0 +1,137 @@
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from .redis_client import get_redis
+
+RUN_STATE_TTL_SECONDS = int(os.getenv("RUN_STATE_TTL_SECONDS", "86400"))
+RUN_EVENTS_CHANNEL = os.getenv("RUN_EVENTS_CHANNEL", "runs:events")
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "CANCELED"}
+
+# Run state lives in a Redis hash so each field can be updated on its own;
+# step results live under separate keys so large outputs are written once and
+# never re-sent with status changes.
+RUN_STATE_FIELDS = (
+    "run_id",
+    "workflow_id",
+    "status",
+    "current_step_index",
+    "error",
+    "created_at",
+    "started_at",
+    "finished_at",
+    "last_updated_at",
+)
+_INT_FIELDS = {"current_step_index"}
+
+# Only touch the hash while it exists, so a late update can't resurrect an
+# expired run as a partial hash. ARGV: ttl, channel, event message (both may
+# be empty), then field/value pairs.
+_UPDATE_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+if #ARGV > 3 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 4))
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+if ARGV[3] ~= '' then
+    redis.call('PUBLISH', ARGV[2], ARGV[3])
+end
+return 1
+"""
+
+def run_state_key(run_id) -> str:
+    return f"run:{run_id}:state"
+
+def run_step_key(run_id, index: int) -> str:
+    return f"run:{run_id}:step:{index}"
+
+def encode_state(state: Dict[str, Any]) -> Dict[str, str]:
+    encoded = {}
+    for name, value in state.items():
+        if name not in RUN_STATE_FIELDS or value is None:
+            continue
+        encoded[name] = value.isoformat() if isinstance(value, datetime) else str(value)
+    return encoded
+
+def decode_state(fields: Iterable[str], values: Iterable[Optional[str]]) -> Dict[str, Any]:
+    state = {}
+    for name, value in zip(fields, values):
+        if value is not None and name in _INT_FIELDS:
+            value = int(value)
+        state[name] = value
+    return state
+
+
+class RunStateStore:
+    def __init__(self):
+        self._update_script = None
+
+    async def update(self, run_id, event: Optional[str] = None, event_data: Optional[Dict[str, Any]] = None, **fields) -> bool:
+        """Atomically sets the given state fields; returns False if the state has expired.
+
+        When ``event`` is given, a run event is published on ``RUN_EVENTS_CHANNEL``
+        in the same round trip so streaming clients see it as soon as the state changes.
+        """
+        redis = await get_redis()
+        if self._update_script is None:
+            self._update_script = redis.register_script(_UPDATE_IF_EXISTS)
+        encoded = encode_state({**fields, "last_updated_at": datetime.utcnow()})
+        message = ""
+        if event:
+            message = json.dumps({"run_id": str(run_id), "event": event, **(event_data or {})}, default=str)
+        args = [RUN_STATE_TTL_SECONDS, RUN_EVENTS_CHANNEL, message]
+        for name, value in encoded.items():
+            args.extend((name, value))
+        return bool(await self._update_script(keys=[run_state_key(run_id)], args=args))
+
+    async def get(self, run_id, fields: Iterable[str] = RUN_STATE_FIELDS) -> Optional[Dict[str, Any]]:
+        fields = list(fields)
+        redis = await get_redis()
+        values = await redis.hmget(run_state_key(run_id), fields)
+        if all(value is None for value in values):
+            return None
+        return decode_state(fields, values)
+
+    async def get_many(self, run_ids: Iterable, fields: Iterable[str] = RUN_STATE_FIELDS) -> Dict[str, Dict[str, Any]]:
+        """Reads the state of many runs in one pipelined round trip; missing runs are omitted."""
+        run_ids = [str(run_id) for run_id in run_ids]
+        fields = list(fields)
+        if not run_ids:
+            return {}
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for run_id in run_ids:
+                pipe.hmget(run_state_key(run_id), fields)
+            rows = await pipe.execute()
+        return {
+            run_id: decode_state(fields, values)
+            for run_id, values in zip(run_ids, rows)
+            if any(value is not None for value in values)
+        }
+
+    async def set_step_result(self, run_id, index: int, step_type: str, result: Any):
+        """Stores a step result and announces ``step_finished`` in one round trip."""
+        redis = await get_redis()
+        event = {"run_id": str(run_id), "event": "step_finished", "step_index": index, "step_type": step_type}
+        async with redis.pipeline(transaction=False) as pipe:
+            pipe.set(
+                run_step_key(run_id, index),
+                json.dumps({"type": step_type, "result": result}),
+                ex=RUN_STATE_TTL_SECONDS,
+            )
+            pipe.publish(RUN_EVENTS_CHANNEL, json.dumps(event))
+            await pipe.execute()
+
+    async def get_step_results(self, run_id, indices: Iterable[int]) -> Dict[int, Any]:
+        indices = list(indices)
+        if not indices:
+            return {}
+        redis = await get_redis()
+        values = await redis.mget([run_step_key(run_id, index) for index in indices])
+        return {index: json.loads(value) for index, value in zip(indices, values) if value is not None}
+
+
+run_state_store = RunStateStore()
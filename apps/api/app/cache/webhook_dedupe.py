@@ -0,0 +1,113 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.cache.webhook_endpoints import ResolvedEndpoint
+
+WEBHOOK_IDEMPOTENCY_TTL_SECONDS = int(os.getenv("WEBHOOK_IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a claim may stay unconfirmed. If the API process dies between
+# claiming and creating the run, retries are refused for this long.
+WEBHOOK_CLAIM_PENDING_TTL_SECONDS = int(os.getenv("WEBHOOK_CLAIM_PENDING_TTL_SECONDS", "30"))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# Claims hold "pending:<run id>" until the run is created, then the run id.
+PENDING_PREFIX = "pending:"
+
+# SET NX, or return whoever holds the key, in one round trip.
+_CLAIM = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    return false
+end
+return redis.call('GET', KEYS[1])
+"""
+# Compare-and-set of our own pending marker. ARGV: marker, run id, ttl.
+_CONFIRM_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class DeliveryInProgress(Exception):
+    """An earlier delivery with the same key hasn't finished creating its run."""
+
+
+def dedupe_key(endpoint: ResolvedEndpoint, idempotency_key: Optional[str], body: bytes) -> Optional[Tuple[str, int]]:
+    """Returns the Redis key and TTL that identify this delivery, if the request can be de-duplicated.
+
+    An explicit ``Idempotency-Key`` wins; otherwise endpoints with a dedupe
+    window treat identical bodies within the window as one delivery.
+    """
+    if idempotency_key:
+        digest = hashlib.sha256(idempotency_key.encode()).hexdigest()
+        return f"webhook:{endpoint.id}:idem:{digest}", WEBHOOK_IDEMPOTENCY_TTL_SECONDS
+    if endpoint.dedupe_window_seconds:
+        return f"webhook:{endpoint.id}:body:{hashlib.sha256(body).hexdigest()}", endpoint.dedupe_window_seconds
+    return None
+
+
+class WebhookDeduplicator:
+    """Maps webhook deliveries to the run they created, so sender retries don't start new runs.
+
+    A claim starts out pending and only records the run id once ``confirm()``
+    is called after the run has been committed and enqueued. Until then a
+    duplicate gets ``DeliveryInProgress`` rather than the id of a run that
+    may never exist.
+    """
+
+    def __init__(self, pending_ttl: int = WEBHOOK_CLAIM_PENDING_TTL_SECONDS):
+        self.pending_ttl = pending_ttl
+        self._claim = None
+        self._confirm = None
+        self._release = None
+        self.claims = 0
+        self.duplicates = 0
+        self.in_progress = 0
+
+    async def _scripts(self):
+        redis = await get_redis()
+        if self._claim is None:
+            self._claim = redis.register_script(_CLAIM)
+            self._confirm = redis.register_script(_CONFIRM_IF_OWNER)
+            self._release = redis.register_script(_RELEASE_IF_OWNER)
+
+    async def claim(self, key: str, run_id: str) -> Optional[str]:
+        """Claims the delivery for ``run_id``, or returns the run id of an earlier one.
+
+        Raises ``DeliveryInProgress`` if the earlier delivery hasn't been confirmed yet.
+        """
+        await self._scripts()
+        existing = await self._claim(keys=[key], args=[PENDING_PREFIX + run_id, self.pending_ttl])
+        if not existing:
+            self.claims += 1
+            return None
+        if existing.startswith(PENDING_PREFIX):
+            self.in_progress += 1
+            raise DeliveryInProgress(key)
+        self.duplicates += 1
+        return existing
+
+    async def confirm(self, key: str, ttl: int, run_id: str) -> bool:
+        """Records ``run_id`` for ``ttl`` seconds once its run exists; False if the claim was lost."""
+        await self._scripts()
+        return bool(await self._confirm(keys=[key], args=[PENDING_PREFIX + run_id, run_id, ttl]))
+
+    async def release(self, key: str, run_id: str):
+        """Forgets a claim whose run could not be created, so the sender's retry can go through."""
+        await self._scripts()
+        await self._release(keys=[key], args=[PENDING_PREFIX + run_id])
+
+    def stats(self) -> dict:
+        return {"claims": self.claims, "duplicates": self.duplicates, "in_progress": self.in_progress}
+
+
+webhook_deduplicator = WebhookDeduplicator()
@@ -0,0 +1,137 @@
+import json
+import os
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.db.models import WebhookEndpoint, Workflow
+
+# The in-process layer is only invalidated locally, so keep it short; the Redis
+# layer is shared by every API process and is invalidated on every change.
+WEBHOOK_ENDPOINT_LOCAL_TTL_SECONDS = float(os.getenv("WEBHOOK_ENDPOINT_LOCAL_TTL_SECONDS", "5"))
+WEBHOOK_ENDPOINT_REDIS_TTL_SECONDS = int(os.getenv("WEBHOOK_ENDPOINT_REDIS_TTL_SECONDS", "300"))
+WEBHOOK_ENDPOINT_NEGATIVE_TTL_SECONDS = int(os.getenv("WEBHOOK_ENDPOINT_NEGATIVE_TTL_SECONDS", "30"))
+WEBHOOK_ENDPOINT_LOCAL_MAX_ENTRIES = int(os.getenv("WEBHOOK_ENDPOINT_LOCAL_MAX_ENTRIES", "10000"))
+
+_NOT_FOUND = "null"
+
+
+@dataclass(frozen=True)
+class ResolvedEndpoint:
+    id: str
+    workflow_id: str
+    tenant_id: Optional[str]
+    is_active: bool
+    secret: str
+    dedupe_window_seconds: int = 0
+    input_schema: Optional[dict] = None
+    priority: str = "normal"
+
+
+def _redis_key(path: str) -> str:
+    return f"webhook_endpoint:{path}"
+
+
+class WebhookEndpointResolver:
+    """Resolves webhook paths through a local TTL cache, then Redis, then Postgres.
+
+    Unknown paths are cached too (for ``WEBHOOK_ENDPOINT_NEGATIVE_TTL_SECONDS``)
+    so that scanners probing random paths don't reach the database.
+
+    Secrets never go to Redis. The Redis entry carries the row's ``updated_at``
+    as a version instead, and each process keeps the secrets it has loaded
+    under that version; a Redis hit for a version this process hasn't seen
+    (a new endpoint, or a rotated secret) is resolved from Postgres.
+    """
+
+    def __init__(self):
+        self._local: "OrderedDict[str, Tuple[float, Optional[ResolvedEndpoint]]]" = OrderedDict()
+        # endpoint id -> (version, secret)
+        self._secrets: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, db: AsyncSession, path: str) -> Optional[ResolvedEndpoint]:
+        now = time.monotonic()
+        entry = self._local.get(path)
+        if entry is not None and entry[0] > now:
+            self.hits += 1
+            return entry[1]
+
+        redis = await get_redis()
+        cached = await redis.get(_redis_key(path))
+        if cached == _NOT_FOUND:
+            self.hits += 1
+            self._remember(path, None, now)
+            return None
+        if cached is not None:
+            fields = json.loads(cached)
+            secret = self._secret(fields["id"], fields.pop("version", None))
+            if secret is not None:
+                self.hits += 1
+                endpoint = ResolvedEndpoint(secret=secret, **fields)
+                self._remember(path, endpoint, now)
+                return endpoint
+
+        self.misses += 1
+        stmt = (
+            select(WebhookEndpoint, Workflow.tenant_id, Workflow.priority)
+            .join(Workflow, Workflow.id == WebhookEndpoint.workflow_id)
+            .where(WebhookEndpoint.path == path)
+        )
+        row = (await db.execute(stmt)).one_or_none()
+        if row is None:
+            await redis.set(_redis_key(path), _NOT_FOUND, ex=WEBHOOK_ENDPOINT_NEGATIVE_TTL_SECONDS)
+            self._remember(path, None, now)
+            return None
+
+        db_endpoint, tenant_id, priority = row
+        endpoint = ResolvedEndpoint(
+            id=str(db_endpoint.id),
+            workflow_id=str(db_endpoint.workflow_id),
+            tenant_id=str(tenant_id) if tenant_id else None,
+            is_active=db_endpoint.is_active,
+            secret=db_endpoint.secret,
+            dedupe_window_seconds=db_endpoint.dedupe_window_seconds or 0,
+            input_schema=db_endpoint.input_schema,
+            priority=priority,
+        )
+        version = db_endpoint.updated_at.isoformat()
+        shared = {**asdict(endpoint), "version": version}
+        del shared["secret"]
+        await redis.set(_redis_key(path), json.dumps(shared), ex=WEBHOOK_ENDPOINT_REDIS_TTL_SECONDS)
+        self._secrets[endpoint.id] = (version, endpoint.secret)
+        self._secrets.move_to_end(endpoint.id)
+        while len(self._secrets) > WEBHOOK_ENDPOINT_LOCAL_MAX_ENTRIES:
+            self._secrets.popitem(last=False)
+        self._remember(path, endpoint, now)
+        return endpoint
+
+    def _secret(self, endpoint_id: str, version: Optional[str]) -> Optional[str]:
+        entry = self._secrets.get(endpoint_id)
+        if entry is None or entry[0] != version:
+            return None
+        self._secrets.move_to_end(endpoint_id)
+        return entry[1]
+
+    def _remember(self, path: str, endpoint: Optional[ResolvedEndpoint], now: float):
+        self._local[path] = (now + WEBHOOK_ENDPOINT_LOCAL_TTL_SECONDS, endpoint)
+        self._local.move_to_end(path)
+        while len(self._local) > WEBHOOK_ENDPOINT_LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def invalidate(self, path: str):
+        self._local.pop(path, None)
+        redis = await get_redis()
+        await redis.delete(_redis_key(path))
+
+    def stats(self) -> dict:
+        return {"entries": len(self._local), "hits": self.hits, "misses": self.misses}
+
+
+endpoint_resolver = WebhookEndpointResolver()
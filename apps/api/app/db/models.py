@@ -1,7 +1,8 @@
 from __future__ import annotations
 import uuid
 import datetime
-from sqlalchemy import Column, String, Boolean, DateTime, Integer, Text, ForeignKey, Enum
+from typing import Any
+from sqlalchemy import Column, String, Boolean, DateTime, Integer, BigInteger, Text, ForeignKey, Enum, Index, LargeBinary
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -15,12 +16,14 @@ class Workflow(Base):
     tenant_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
     name: Mapped[str] = mapped_column(String, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    priority: Mapped[str] = mapped_column(String, nullable=False, default="normal", server_default="normal") # ENUM: high, normal, low
     definition_json: Mapped[dict] = mapped_column(JSONB, nullable=False)
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
     updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     runs = relationship("Run", back_populates="workflow")
     webhook_endpoints = relationship("WebhookEndpoint", back_populates="workflow")
+    schedules = relationship("WorkflowSchedule", back_populates="workflow")
 
 
 class Run(Base):
@@ -29,18 +32,29 @@ class Run(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     workflow_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("workflows.id"), nullable=False)
     tenant_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), nullable=True)
-    status: Mapped[str] = mapped_column(String, nullable=False) # ENUM: QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELED
-    triggered_by: Mapped[str] = mapped_column(String, nullable=False) # ENUM: WEBHOOK, API
+    status: Mapped[str] = mapped_column(String, nullable=False) # ENUM: SCHEDULED, QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELED
+    triggered_by: Mapped[str] = mapped_column(String, nullable=False) # ENUM: WEBHOOK, API, SCHEDULE
+    priority: Mapped[str] = mapped_column(String, nullable=False, default="normal", server_default="normal") # queue it is dispatched from
+    scheduled_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True) # when a delayed or cron run is due
     started_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime.datetime | None] = mapped_column(DateTime, nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     current_step_index: Mapped[int] = mapped_column(Integer, default=0)
+    input_json: Mapped[Any | None] = mapped_column(JSONB, nullable=True) # trigger payload, read by {{ input.* }} placeholders
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
     updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     workflow = relationship("Workflow", back_populates="runs")
     snapshots = relationship("RunSnapshot", back_populates="run")
 
+    # Composite indexes matching the keyset-paginated listings (newest first).
+    __table_args__ = (
+        Index("ix_runs_created_at_id", "created_at", "id"),
+        Index("ix_runs_workflow_id_created_at_id", "workflow_id", "created_at", "id"),
+        Index("ix_runs_tenant_id_created_at_id", "tenant_id", "created_at", "id"),
+        Index("ix_runs_status_created_at_id", "status", "created_at", "id"),
+    )
+
 
 class RunSnapshot(Base):
     __tablename__ = "run_snapshots"
@@ -48,11 +62,28 @@ class RunSnapshot(Base):
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     run_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("runs.id"), nullable=False)
     step_index: Mapped[int] = mapped_column(Integer, nullable=False)
-    snapshot_json: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    kind: Mapped[str] = mapped_column(String, nullable=False, default="full", server_default="full") # ENUM: full, delta
+    base_snapshot_id: Mapped[uuid.UUID | None] = mapped_column(ForeignKey("run_snapshots.id"), nullable=True) # snapshot a delta applies to
+    snapshot_json: Mapped[dict | None] = mapped_column(JSONB, nullable=True) # small payloads are stored inline
+    blob_hash: Mapped[str | None] = mapped_column(ForeignKey("snapshot_blobs.content_hash"), nullable=True) # large payloads live in snapshot_blobs
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
 
     run = relationship("Run", back_populates="snapshots")
 
+    __table_args__ = (
+        Index("ix_run_snapshots_run_id_created_at", "run_id", "created_at"),
+    )
+
+
+class SnapshotBlob(Base):
+    __tablename__ = "snapshot_blobs"
+
+    content_hash: Mapped[str] = mapped_column(String(64), primary_key=True) # sha256 of the uncompressed payload
+    encoding: Mapped[str] = mapped_column(String, nullable=False) # ENUM: identity, gzip, zstd
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+
 
 class WebhookEndpoint(Base):
     __tablename__ = "webhook_endpoints"
@@ -62,7 +93,37 @@ class WebhookEndpoint(Base):
     path: Mapped[str] = mapped_column(String, unique=True, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     secret: Mapped[str] = mapped_column(String, nullable=False)
+    dedupe_window_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True) # identical bodies within the window map to one run
+    input_schema: Mapped[dict | None] = mapped_column(JSONB, nullable=True) # JSON Schema the body must satisfy
     created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
     updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
 
     workflow = relationship("Workflow", back_populates="webhook_endpoints")
+
+
+class WorkflowSchedule(Base):
+    __tablename__ = "workflow_schedules"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    workflow_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("workflows.id"), nullable=False)
+    cron: Mapped[str] = mapped_column(String, nullable=False) # five-field expression, evaluated in UTC
+    input_json: Mapped[Any | None] = mapped_column(JSONB, nullable=True) # input of every run it starts
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
+    updated_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    workflow = relationship("Workflow", back_populates="schedules")
+
+    __table_args__ = (
+        Index("ix_workflow_schedules_workflow_id", "workflow_id"),
+    )
+
+
+class OutboxEvent(Base):
+    __tablename__ = "event_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    event_name: Mapped[str] = mapped_column(String, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    run_state: Mapped[dict | None] = mapped_column(JSONB, nullable=True) # initial Redis state written alongside the event
+    created_at: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow)
@@ -1,16 +1,173 @@
 import json
 import os
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
 from ..cache.redis_client import get_redis
+from ..cache.run_state import RUN_STATE_TTL_SECONDS, encode_state, run_state_key
 
-EVENT_QUEUE_KEY = os.getenv("EVENT_QUEUE_KEY", "events:workflow")
+EVENT_STREAM_KEY = os.getenv("EVENT_STREAM_KEY", "events:workflow:stream")
+EVENT_STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "1000000"))
+EVENT_CONSUMER_GROUP = os.getenv("EVENT_CONSUMER_GROUP", "workers")
+EVENT_DEAD_LETTER_KEY = os.getenv("EVENT_DEAD_LETTER_KEY", f"{EVENT_STREAM_KEY}:dead")
+WORKFLOW_INVALIDATION_CHANNEL = os.getenv("WORKFLOW_INVALIDATION_CHANNEL", "workflows:invalidate")
+# Run events go to one stream per priority and tenant (see run_stream_key), so
+# one tenant's backlog can't hold up everyone else's runs. Every stream that
+# has been published to is recorded in this set for workers to find.
+EVENT_STREAMS_KEY = os.getenv("EVENT_STREAMS_KEY", f"{EVENT_STREAM_KEY}:streams")
+DEFAULT_RUN_PRIORITY = "normal"
+# Sorted sets scored by due time (epoch seconds): delayed runs, whose members
+# are their RunStarted payloads, and cron schedules, whose members are schedule ids.
+SCHEDULED_RUNS_KEY = os.getenv("SCHEDULED_RUNS_KEY", "scheduler:runs")
+SCHEDULES_KEY = os.getenv("SCHEDULES_KEY", "scheduler:schedules")
+
+# Moves due delayed runs onto their streams in one atomic step, so each is
+# published exactly once. The run state flips to QUEUED in the same step,
+# before any worker can see the event and mark it RUNNING. The stream is
+# chosen as in run_stream_key().
+# The state and stream keys are built inside the script rather than passed in
+# KEYS, so this assumes a single Redis node (or a primary with replicas), not
+# Redis Cluster, where they could live in other slots.
+# ARGV: now, limit, stream maxlen, state key prefix and suffix, default priority.
+_RELEASE_DUE_RUNS = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, payload in ipairs(due) do
+    local run = cjson.decode(payload)
+    local state = ARGV[4] .. run['run_id'] .. ARGV[5]
+    if redis.call('HGET', state, 'status') == 'SCHEDULED' then
+        redis.call('HSET', state, 'status', 'QUEUED')
+    end
+    local priority, tenant = run['priority'], run['tenant_id']
+    if type(priority) ~= 'string' or priority == '' then priority = ARGV[6] end
+    local stream = KEYS[2]
+    if type(tenant) == 'string' and tenant ~= '' then
+        stream = KEYS[2] .. ':' .. priority .. ':' .. tenant
+    elseif priority ~= ARGV[6] then
+        stream = KEYS[2] .. ':' .. priority .. ':-'
+    end
+    redis.call('XADD', stream, 'MAXLEN', '~', ARGV[3], '*', 'event', 'RunStarted', 'payload', payload)
+    redis.call('SADD', KEYS[3], stream)
+end
+if #due > 0 then
+    redis.call('ZREM', KEYS[1], unpack(due))
+end
+return due
+"""
+_STATE_KEY_PREFIX, _STATE_KEY_SUFFIX = run_state_key("{}").split("{}")
+
+def run_stream_key(payload: dict) -> str:
+    """The stream a run's events go to: ``<EVENT_STREAM_KEY>:<priority>:<tenant_id or ->``.
+
+    Normal-priority runs without a tenant use ``EVENT_STREAM_KEY`` itself, so
+    single-tenant deployments keep a single stream.
+    """
+    priority = payload.get("priority") or DEFAULT_RUN_PRIORITY
+    tenant_id = payload.get("tenant_id")
+    if not tenant_id and priority == DEFAULT_RUN_PRIORITY:
+        return EVENT_STREAM_KEY
+    return f"{EVENT_STREAM_KEY}:{priority}:{tenant_id or '-'}"
+
+def stream_flow(stream: str) -> Tuple[str, Optional[str]]:
+    """The (priority, tenant_id) a stream from run_stream_key() holds."""
+    if stream == EVENT_STREAM_KEY:
+        return DEFAULT_RUN_PRIORITY, None
+    priority, _, tenant_id = stream[len(EVENT_STREAM_KEY) + 1:].partition(":")
+    return priority, None if tenant_id == "-" else tenant_id
+
+def epoch(moment: datetime) -> float:
+    """Seconds since the epoch for a naive UTC datetime."""
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+def scheduled_run_member(payload: dict) -> str:
+    # Canonical, so re-adding the same run (see RunScheduler.reconcile) never duplicates it.
+    return json.dumps(payload, sort_keys=True)
+
+def encode_event(event_name: str, payload: dict) -> dict:
+    return {"event": event_name, "payload": json.dumps(payload)}
+
+def decode_event(fields: dict) -> dict:
+    return {"event": fields.get("event"), "payload": json.loads(fields.get("payload") or "{}")}
 
 class EventBus:
-    async def publish(self, event_name: str, payload: dict):
+    def __init__(self):
+        self._release_script = None
+
+    async def publish(self, event_name: str, payload: dict) -> str:
+        entries = await self.publish_many([(event_name, payload, None)])
+        return entries[0]
+
+    async def enqueue_run(self, run_state: dict, payload: dict) -> str:
+        """Writes the initial run state and publishes RunStarted in one MULTI/EXEC round trip."""
+        entries = await self.publish_many([("RunStarted", payload, run_state)])
+        return entries[0]
+
+    async def publish_many(self, events: Iterable[Tuple[str, dict, Optional[dict]]]) -> List[str]:
+        """Publishes (event_name, payload, run_state) tuples atomically in one round trip.
+
+        When ``run_state`` is given it is stored under the run's state key
+        before the event becomes visible to consumers.
+        """
+        redis = await get_redis()
+        streams = set()
+        async with redis.pipeline(transaction=True) as pipe:
+            for event_name, payload, run_state in events:
+                if run_state is not None:
+                    key = run_state_key(run_state["run_id"])
+                    pipe.hset(key, mapping=encode_state(run_state))
+                    pipe.expire(key, RUN_STATE_TTL_SECONDS)
+                stream = run_stream_key(payload)
+                streams.add(stream)
+                # Approximate trimming is O(1) amortized; acked entries are deleted by
+                # consumers anyway, so MAXLEN only guards against runaway growth.
+                pipe.xadd(
+                    stream,
+                    encode_event(event_name, payload),
+                    maxlen=EVENT_STREAM_MAXLEN,
+                    approximate=True,
+                )
+            if streams:
+                pipe.sadd(EVENT_STREAMS_KEY, *streams)
+            results = await pipe.execute()
+        # HSET/EXPIRE/SADD replies are ints/booleans, XADD replies are entry ids.
+        return [r for r in results if isinstance(r, str)]
+
+    async def schedule_run(self, run_state: dict, payload: dict, run_at: datetime):
+        """Writes the initial run state and adds the run to the delayed-run set in one round trip.
+
+        The scheduler publishes RunStarted once ``run_at`` has passed.
+        """
+        redis = await get_redis()
+        key = run_state_key(run_state["run_id"])
+        # Keep the state until the run has been due for as long as any other run's.
+        ttl = RUN_STATE_TTL_SECONDS + max(0, int(epoch(run_at) - time.time()))
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=encode_state(run_state))
+            pipe.expire(key, ttl)
+            pipe.zadd(SCHEDULED_RUNS_KEY, {scheduled_run_member(payload): epoch(run_at)})
+            await pipe.execute()
+
+    async def release_due_runs(self, now: float, limit: int) -> List[dict]:
+        """Publishes RunStarted for up to ``limit`` delayed runs due by ``now``; returns their payloads."""
+        redis = await get_redis()
+        if self._release_script is None:
+            self._release_script = redis.register_script(_RELEASE_DUE_RUNS)
+        released = await self._release_script(
+            keys=[SCHEDULED_RUNS_KEY, EVENT_STREAM_KEY, EVENT_STREAMS_KEY],
+            args=[now, limit, EVENT_STREAM_MAXLEN, _STATE_KEY_PREFIX, _STATE_KEY_SUFFIX, DEFAULT_RUN_PRIORITY],
+        )
+        return [json.loads(payload) for payload in released]
+
+    async def set_schedule(self, schedule_id: str, next_run_at: Optional[datetime]):
+        """Sets when a cron schedule next fires; ``None`` removes it."""
+        redis = await get_redis()
+        if next_run_at is None:
+            await redis.zrem(SCHEDULES_KEY, schedule_id)
+        else:
+            await redis.zadd(SCHEDULES_KEY, {schedule_id: epoch(next_run_at)})
+
+    async def invalidate_workflow(self, workflow_id: str):
+        """Tells workers to drop their cached copy of a workflow definition."""
         redis = await get_redis()
-        message = {
-            "event": event_name,
-            "payload": payload
-        }
-        await redis.rpush(EVENT_QUEUE_KEY, json.dumps(message))
+        await redis.publish(WORKFLOW_INVALIDATION_CHANNEL, json.dumps({"workflow_id": workflow_id}))
 
 event_bus = EventBus()
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Set
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.cache.run_state import RUN_EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+RUN_EVENTS_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("RUN_EVENTS_SUBSCRIBER_QUEUE_SIZE", "100"))
+
+
+class RunEventHub:
+    """Fans run events out to streaming clients from one Redis subscription per process.
+
+    Every API process subscribes to ``RUN_EVENTS_CHANNEL`` once; events are
+    routed in memory to the queues of clients watching that run. A client that
+    falls behind loses its oldest queued events rather than stalling the hub.
+    """
+
+    def __init__(self, queue_size: int = RUN_EVENTS_SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._read_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    @asynccontextmanager
+    async def subscribe(self, run_id: str) -> AsyncIterator[asyncio.Queue]:
+        await self.start()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(run_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            queues = self._subscribers.get(run_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[run_id]
+
+    def dispatch(self, event: dict):
+        for queue in self._subscribers.get(event.get("run_id"), ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _read_loop(self):
+        while True:
+            redis = await get_redis()
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(RUN_EVENTS_CHANNEL)
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None or not self._subscribers:
+                        continue
+                    self.dispatch(json.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Run event subscription failed, reconnecting: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+run_event_hub = RunEventHub()
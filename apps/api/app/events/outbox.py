@@ -0,0 +1,72 @@
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from apps.api.app.db.models import OutboxEvent
+from apps.api.app.db.session import AsyncSessionLocal
+from apps.api.app.events.bus import event_bus
+
+logger = logging.getLogger(__name__)
+
+EVENT_OUTBOX_ENABLED = os.getenv("EVENT_OUTBOX_ENABLED", "false").lower() in ("1", "true", "yes")
+EVENT_OUTBOX_BATCH_SIZE = int(os.getenv("EVENT_OUTBOX_BATCH_SIZE", "500"))
+EVENT_OUTBOX_POLL_INTERVAL_SECONDS = float(os.getenv("EVENT_OUTBOX_POLL_INTERVAL_SECONDS", "1"))
+
+
+class OutboxRelay:
+    """Moves committed ``event_outbox`` rows onto the Redis event stream in batches.
+
+    Rows are claimed with ``FOR UPDATE SKIP LOCKED`` so several API processes can
+    relay concurrently, and deleted in the same transaction once Redis has
+    accepted them. A crash between the two steps re-sends the batch, so
+    delivery is at-least-once.
+    """
+
+    def __init__(self, batch_size: int = EVENT_OUTBOX_BATCH_SIZE, poll_interval: float = EVENT_OUTBOX_POLL_INTERVAL_SECONDS):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        """Wakes the relay right away instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    async def relay_once(self) -> int:
+        async with AsyncSessionLocal() as session:
+            stmt = (
+                select(OutboxEvent)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = (await session.execute(stmt)).scalars().all()
+            if not rows:
+                await session.rollback()
+                return 0
+
+            await event_bus.publish_many((row.event_name, row.payload, row.run_state) for row in rows)
+            await session.execute(delete(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in rows])))
+            await session.commit()
+            return len(rows)
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        stop_event = stop_event or asyncio.Event()
+        logger.info(f"Outbox relay started (batch size {self.batch_size})")
+        while not stop_event.is_set():
+            self._wakeup.clear()
+            try:
+                relayed = await self.relay_once()
+                if relayed == self.batch_size:
+                    continue  # more rows are probably waiting
+            except Exception as e:
+                logger.error(f"Outbox relay failed: {e}")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_relay = OutboxRelay()
@@ -1,9 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from contextlib import asynccontextmanager
 from apps.api.app.routes import workflows, webhooks, runs
-from apps.api.app.db.session import engine
+from apps.api.app.db.session import dispose_engines, engine, pool_stats
 from apps.api.app.db.models import Base
-from apps.api.app.cache.redis_client import redis_client
+from apps.api.app.cache.redis_client import redis_client, get_redis
+from apps.api.app.cache.webhook_dedupe import webhook_deduplicator
+from apps.api.app.cache.webhook_endpoints import endpoint_resolver
+from apps.api.app.metrics import component_stats, refresh_queue_metrics
+from apps.api.app.events.outbox import EVENT_OUTBOX_ENABLED, outbox_relay
+from apps.api.app.events.hub import run_event_hub
+import asyncio
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -12,9 +19,18 @@ async def lifespan(app: FastAPI):
         # Create tables for dev (in prod use Alembic)
         await conn.run_sync(Base.metadata.create_all)
     await redis_client.connect()
+    await run_event_hub.start()
+    stop_event = asyncio.Event()
+    relay_task = asyncio.create_task(outbox_relay.run(stop_event)) if EVENT_OUTBOX_ENABLED else None
     yield
     # Shutdown
+    await run_event_hub.stop()
+    stop_event.set()
+    if relay_task:
+        outbox_relay.notify()
+        await relay_task
     await redis_client.close()
+    await dispose_engines()
 
 app = FastAPI(title="Secure MCP Workflow Orchestrator", lifespan=lifespan)
 
@@ -22,6 +38,15 @@ app.include_router(workflows.router, prefix="/workflows", tags=["Workflows"])
 app.include_router(webhooks.router, prefix="/webhooks", tags=["Webhooks"])
 app.include_router(runs.router, prefix="/runs", tags=["Runs"])
 
+component_stats.register("db_pool", pool_stats)
+component_stats.register("webhook_endpoints", endpoint_resolver.stats)
+component_stats.register("webhook_dedupe", webhook_deduplicator.stats)
+
 @app.get("/health")
 async def health():
     return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    await refresh_queue_metrics(await get_redis())
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,127 @@
+"""Prometheus metrics shared by the API and the worker.
+
+Each process serves its own registry: the API at ``/metrics`` and the worker
+on ``WORKER_METRICS_PORT``. Counters that components already keep for their
+``stats()`` are read at scrape time rather than counted a second time.
+"""
+import logging
+import os
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import REGISTRY, Counter, Gauge
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+DB_STATEMENTS = Counter("orchestrator_db_statements", "SQL statements sent to Postgres")
+REDIS_ROUND_TRIPS = Counter("orchestrator_redis_round_trips", "Requests sent to Redis; a pipeline counts once")
+QUEUE_DEPTH = Gauge("orchestrator_queue_depth", "Run events waiting to be delivered to a worker")
+QUEUE_PENDING = Gauge("orchestrator_queue_pending", "Run events delivered to a worker and not yet acknowledged")
+QUEUE_DEAD_LETTERS = Gauge("orchestrator_queue_dead_letters", "Run events in the dead-letter stream")
+TENANT_QUEUE_DEPTH = Gauge(
+    "orchestrator_tenant_queue_depth", "Run events waiting to be delivered to a worker, per tenant and priority",
+    ["tenant", "priority"],
+)
+# Tenants beyond the deepest METRICS_MAX_TENANTS are reported together as "other".
+METRICS_MAX_TENANTS = int(os.getenv("METRICS_MAX_TENANTS", "100"))
+
+
+def count_statements(engine):
+    """Counts every statement the (async) engine sends."""
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: DB_STATEMENTS.inc())
+
+
+_counting_classes: Dict[type, type] = {}
+
+
+def count_round_trips(client):
+    """Counts requests written to Redis by the client's connections, whatever their transport."""
+    pool = client.connection_pool
+    base = pool.connection_class
+    counting = _counting_classes.get(base)
+    if counting is None:
+        async def send_packed_command(self, command, check_health=True):
+            REDIS_ROUND_TRIPS.inc()
+            await base.send_packed_command(self, command, check_health)
+
+        counting = _counting_classes[base] = type(f"Counting{base.__name__}", (base,), {"send_packed_command": send_packed_command})
+    pool.connection_class = counting
+
+
+async def refresh_queue_metrics(redis):
+    from apps.api.app.events.bus import EVENT_CONSUMER_GROUP, EVENT_DEAD_LETTER_KEY, EVENT_STREAM_KEY, EVENT_STREAMS_KEY, stream_flow
+
+    streams = sorted(set(await redis.smembers(EVENT_STREAMS_KEY)) | {EVENT_STREAM_KEY})
+    async with redis.pipeline(transaction=False) as pipe:
+        for stream in streams:
+            pipe.xlen(stream)
+            pipe.xpending(stream, EVENT_CONSUMER_GROUP)
+        pipe.xlen(EVENT_DEAD_LETTER_KEY)
+        *results, dead = await pipe.execute(raise_on_error=False)
+    errors = [result for result in results[::2] + [dead] if isinstance(result, Exception)]
+    if errors:
+        logger.warning(f"Could not read queue depth: {errors[0]}")
+        return
+
+    waiting: Dict[Tuple[str, str], int] = {}
+    total_waiting = total_pending = 0
+    for stream, length, pending in zip(streams, results[::2], results[1::2]):
+        # The group doesn't exist until the first worker starts.
+        pending = 0 if isinstance(pending, Exception) else pending["pending"]
+        # Consumers delete entries once acknowledged, so a stream holds waiting and pending runs.
+        depth = max(0, length - pending)
+        priority, tenant_id = stream_flow(stream)
+        waiting[(tenant_id or "none", priority)] = depth
+        total_waiting += depth
+        total_pending += pending
+    QUEUE_DEPTH.set(total_waiting)
+    QUEUE_PENDING.set(total_pending)
+    QUEUE_DEAD_LETTERS.set(dead)
+
+    kept = set()
+    for (tenant, _), _ in sorted(waiting.items(), key=lambda item: item[1], reverse=True):
+        if len(kept) < METRICS_MAX_TENANTS:
+            kept.add(tenant)
+    depths: Dict[Tuple[str, str], int] = {}
+    for (tenant, priority), depth in waiting.items():
+        labels = (tenant if tenant in kept else "other", priority)
+        depths[labels] = depths.get(labels, 0) + depth
+    # Start over so tenants folded into "other" since the last refresh disappear.
+    TENANT_QUEUE_DEPTH.clear()
+    for (tenant, priority), depth in depths.items():
+        TENANT_QUEUE_DEPTH.labels(tenant, priority).set(depth)
+
+
+class StatsCollector(Collector):
+    """Exports components' ``stats()`` as ``orchestrator_<component>_<stat>`` gauges.
+
+    Only numeric (and boolean) values are exported. With ``label``, ``stats()``
+    returns one dict of stats per label value, e.g. per MCP server.
+    """
+
+    def __init__(self):
+        self._sources: Dict[str, Tuple[Callable[[], dict], Optional[str]]] = {}
+
+    def register(self, component: str, stats: Callable[[], dict], label: Optional[str] = None):
+        self._sources[component] = (stats, label)
+
+    def collect(self):
+        for component, (stats, label) in self._sources.items():
+            families: Dict[str, GaugeMetricFamily] = {}
+            groups = stats().items() if label else [(None, stats())]
+            for label_value, values in groups:
+                for key, value in values.items():
+                    if not isinstance(value, (bool, int, float)):
+                        continue
+                    name = f"orchestrator_{component}_{key}"
+                    family = families.get(name)
+                    if family is None:
+                        family = families[name] = GaugeMetricFamily(name, f"{component} {key}", labels=[label] if label else [])
+                    family.add_metric([label_value] if label else [], float(value))
+            yield from families.values()
+
+
+component_stats = StatsCollector()
+REGISTRY.register(component_stats)
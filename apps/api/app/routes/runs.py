@@ -1,34 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-from apps.api.app.db.session import get_db
+from apps.api.app.db.session import AsyncReadSessionLocal, get_by_id, get_read_db
 from apps.api.app.db.models import Run
-from apps.api.app.schemas import RunResponse
-from apps.api.app.cache.redis_client import get_redis
-import uuid
+from apps.api.app.schemas import RunResponse, RunListResponse, RunBatchGetRequest, RunBatchGetResponse
+from apps.api.app.cache.run_state import TERMINAL_STATUSES, run_state_store
+from apps.api.app.events.hub import run_event_hub
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import base64
 import json
+import os
+import uuid
 
 router = APIRouter()
 
-@router.get("/{run_id}", response_model=RunResponse)
-async def get_run(run_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
-    redis = await get_redis()
-    state_json = await redis.get(f"run:{run_id}:state")
-    
-    if state_json:
-        state = json.loads(state_json)
-        return RunResponse(
-            id=state["run_id"],
-            workflow_id=state["workflow_id"],
-            status=state["status"],
-            current_step_index=state["current_step_index"],
-            created_at=state.get("created_at", None) or None # Adjust as needed
-            # Note: The Redis state might not have all fields, ideally we fetch from DB and overlay Redis state
-        )
-
-    run = await db.get(Run, run_id)
-    if not run:
-        raise HTTPException(status_code=404, detail="Run not found")
-        
+RUN_EVENTS_KEEPALIVE_SECONDS = float(os.getenv("RUN_EVENTS_KEEPALIVE_SECONDS", "15"))
+RUN_LIST_DEFAULT_LIMIT = int(os.getenv("RUN_LIST_DEFAULT_LIMIT", "50"))
+RUN_LIST_MAX_LIMIT = int(os.getenv("RUN_LIST_MAX_LIMIT", "200"))
+
+# Only the hash fields RunResponse needs; step results are never read here.
+RUN_RESPONSE_STATE_FIELDS = (
+    "run_id",
+    "workflow_id",
+    "status",
+    "current_step_index",
+    "error",
+    "created_at",
+    "started_at",
+    "finished_at",
+)
+
+# Columns RunResponse is built from; listings never load the full row.
+RUN_RESPONSE_COLUMNS = (
+    Run.id,
+    Run.workflow_id,
+    Run.status,
+    Run.current_step_index,
+    Run.started_at,
+    Run.finished_at,
+    Run.error_message,
+    Run.created_at,
+)
+
+def run_response(run) -> RunResponse:
     return RunResponse(
         id=run.id,
         workflow_id=run.workflow_id,
@@ -39,3 +56,189 @@ async def get_run(run_id: uuid.UUID, db: AsyncSession = Depends(get_db)):
         error_message=run.error_message,
         created_at=run.created_at
     )
+
+def state_response(state: Dict) -> Optional[RunResponse]:
+    """Builds a RunResponse from the Redis hash, or None if the hash is partial."""
+    if not (state.get("workflow_id") and state.get("created_at")):
+        return None
+    return RunResponse(
+        id=state["run_id"],
+        workflow_id=state["workflow_id"],
+        status=state["status"],
+        current_step_index=state["current_step_index"] or 0,
+        started_at=state["started_at"],
+        finished_at=state["finished_at"],
+        error_message=state["error"],
+        created_at=state["created_at"]
+    )
+
+def overlay_state(response: RunResponse, state: Optional[Dict]) -> RunResponse:
+    """Applies the live fields from the Redis hash over a (possibly stale) DB row."""
+    if not state or not state.get("status"):
+        return response
+    fields = response.model_dump()
+    fields.update(status=state["status"])
+    for name, state_name in (("current_step_index", "current_step_index"), ("started_at", "started_at"),
+                             ("finished_at", "finished_at"), ("error_message", "error")):
+        if state.get(state_name) is not None:
+            fields[name] = state[state_name]
+    return RunResponse(**fields)
+
+def encode_cursor(created_at: datetime, run_id: uuid.UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(run_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, run_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), uuid.UUID(run_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def list_runs_page(
+    db: AsyncSession,
+    limit: int,
+    cursor: Optional[str] = None,
+    workflow_id: Optional[uuid.UUID] = None,
+    tenant_id: Optional[uuid.UUID] = None,
+    status: Optional[str] = None,
+) -> RunListResponse:
+    """Returns one page of runs, newest first, using keyset pagination on (created_at, id)."""
+    query = select(*RUN_RESPONSE_COLUMNS)
+    if workflow_id is not None:
+        query = query.where(Run.workflow_id == workflow_id)
+    if tenant_id is not None:
+        query = query.where(Run.tenant_id == tenant_id)
+    if status is not None:
+        query = query.where(Run.status == status)
+    if cursor:
+        query = query.where(tuple_(Run.created_at, Run.id) < tuple_(*decode_cursor(cursor)))
+    # One extra row tells us whether there is a next page without a COUNT.
+    query = query.order_by(Run.created_at.desc(), Run.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Rows for in-flight runs lag behind Redis by up to one progress flush.
+    live = await run_state_store.get_many(
+        [row.id for row in rows if row.status not in TERMINAL_STATUSES], RUN_RESPONSE_STATE_FIELDS
+    )
+    items = [overlay_state(run_response(row), live.get(str(row.id))) for row in rows]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return RunListResponse(items=items, next_cursor=next_cursor)
+
+@router.get("/", response_model=RunListResponse)
+async def list_runs(
+    status: Optional[str] = None,
+    tenant_id: Optional[uuid.UUID] = None,
+    workflow_id: Optional[uuid.UUID] = None,
+    limit: int = Query(RUN_LIST_DEFAULT_LIMIT, ge=1, le=RUN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    return await list_runs_page(db, limit, cursor, workflow_id=workflow_id, tenant_id=tenant_id, status=status)
+
+@router.post(":batchGet", response_model=RunBatchGetResponse)
+async def batch_get_runs(request: RunBatchGetRequest, db: AsyncSession = Depends(get_read_db)):
+    run_ids: List[uuid.UUID] = list(dict.fromkeys(request.ids))
+    found: Dict[uuid.UUID, RunResponse] = {}
+
+    states = await run_state_store.get_many(run_ids, RUN_RESPONSE_STATE_FIELDS)
+    for run_id in run_ids:
+        state = states.get(str(run_id))
+        response = state_response(state) if state else None
+        if response is not None:
+            found[run_id] = response
+
+    misses = [run_id for run_id in run_ids if run_id not in found]
+    if misses:
+        rows = (await db.execute(select(*RUN_RESPONSE_COLUMNS).where(Run.id.in_(misses)))).all()
+        for row in rows:
+            found[row.id] = run_response(row)
+
+    return RunBatchGetResponse(
+        items=[found[run_id] for run_id in run_ids if run_id in found],
+        not_found=[run_id for run_id in run_ids if run_id not in found],
+    )
+
+@router.get("/{run_id}", response_model=RunResponse)
+async def get_run(run_id: uuid.UUID, db: AsyncSession = Depends(get_read_db)):
+    state = await run_state_store.get(run_id, RUN_RESPONSE_STATE_FIELDS)
+    response = state_response(state) if state else None
+    if response is not None:
+        return response
+
+    # A replica may not have caught up with a run created moments ago.
+    run = await get_by_id(db, Run, run_id)
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    return run_response(run)
+
+@router.get("/{run_id}/steps/{step_index}")
+async def get_run_step(run_id: uuid.UUID, step_index: int):
+    results = await run_state_store.get_step_results(run_id, [step_index])
+    if step_index not in results:
+        raise HTTPException(status_code=404, detail="Step result not found or expired")
+    return {"run_id": str(run_id), "step_index": step_index, **results[step_index]}
+
+async def run_event_stream(run_id: uuid.UUID) -> AsyncIterator[Optional[dict]]:
+    """Yields the current state, then live events until the run is terminal.
+
+    Yields None when nothing happened for RUN_EVENTS_KEEPALIVE_SECONDS so the
+    transport can send a keepalive.
+    """
+    # Subscribe before reading the state so no event can slip in between.
+    async with run_event_hub.subscribe(str(run_id)) as queue:
+        # The request's session is torn down before a streaming body is sent,
+        # and streams can stay open for a long time, so use a short-lived one.
+        async with AsyncReadSessionLocal() as db:
+            current = await get_run(run_id, db)
+        yield {"event": "state", **current.model_dump(mode="json")}
+        if current.status in TERMINAL_STATUSES:
+            return
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), RUN_EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            yield event
+            if event.get("terminal"):
+                return
+
+@router.get("/{run_id}/events")
+async def stream_run_events(run_id: uuid.UUID, request: Request, db: AsyncSession = Depends(get_read_db)):
+    # Resolve 404s before the response starts streaming.
+    await get_run(run_id, db)
+
+    async def sse():
+        async for event in run_event_stream(run_id):
+            if await request.is_disconnected():
+                return
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/{run_id}/ws")
+async def run_events_websocket(websocket: WebSocket, run_id: uuid.UUID):
+    await websocket.accept()
+    try:
+        async for event in run_event_stream(run_id):
+            if event is not None:
+                await websocket.send_json(event)
+    except HTTPException as e:
+        await websocket.send_json({"event": "error", "detail": e.detail})
+    except WebSocketDisconnect:
+        return
+    await websocket.close()
@@ -1,58 +1,200 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from apps.api.app.db.session import get_db
-from apps.api.app.db.models import WebhookEndpoint, Run
+from apps.api.app.db.models import Run, OutboxEvent
 from apps.api.app.events.bus import event_bus
-from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.events.outbox import EVENT_OUTBOX_ENABLED, outbox_relay
+from apps.api.app.cache.webhook_endpoints import endpoint_resolver, ResolvedEndpoint
+from apps.api.app.cache.webhook_dedupe import IDEMPOTENCY_KEY_MAX_LENGTH, DeliveryInProgress, dedupe_key, webhook_deduplicator
+from apps.api.app import tracing
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import hmac
 import json
+import logging
+import os
 import uuid
 
+try:
+    import jsonschema
+except ImportError:  # input_schema validation is optional
+    jsonschema = None
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
 
+SIGNATURE_PREFIX = "sha256="
+WEBHOOK_MAX_BODY_BYTES = int(os.getenv("WEBHOOK_MAX_BODY_BYTES", "1048576"))
+
+# Compiled validators by endpoint id, with the schema they were built from.
+_input_validators: Dict[str, Tuple[dict, Any]] = {}
+
+def verify_webhook_request(
+    endpoint: ResolvedEndpoint,
+    body: bytes,
+    signature: Optional[str],
+    secret: Optional[str],
+) -> bool:
+    """Accepts an HMAC-SHA256 signature of the raw body, or the shared secret itself.
+
+    Both comparisons use hmac.compare_digest so response timing doesn't leak
+    how much of the secret or signature matched.
+    """
+    if signature:
+        if not signature.startswith(SIGNATURE_PREFIX):
+            return False
+        expected = hmac.new(endpoint.secret.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature[len(SIGNATURE_PREFIX):])
+    if secret:
+        return hmac.compare_digest(endpoint.secret.encode(), secret.encode())
+    return False
+
+async def read_body(request: Request, limit: int = WEBHOOK_MAX_BODY_BYTES) -> bytes:
+    """Reads the request body, giving up with 413 as soon as it exceeds ``limit`` bytes."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > limit:
+        raise HTTPException(status_code=413, detail="Webhook body is too large")
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > limit:
+            raise HTTPException(status_code=413, detail="Webhook body is too large")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def check_input_schema(schema: dict):
+    if jsonschema is None:
+        raise HTTPException(status_code=400, detail="input_schema requires the jsonschema package")
+    try:
+        jsonschema.validators.validator_for(schema).check_schema(schema)
+    except jsonschema.exceptions.SchemaError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid input_schema: {e.message}")
+
+
+def validate_input(endpoint: ResolvedEndpoint, payload: Any):
+    if jsonschema is None:
+        logger.error(f"Webhook endpoint {endpoint.id} has an input_schema but jsonschema is not installed")
+        raise HTTPException(status_code=500, detail="Webhook input validation is unavailable")
+    cached = _input_validators.get(endpoint.id)
+    if cached is None or cached[0] != endpoint.input_schema:
+        validator = jsonschema.validators.validator_for(endpoint.input_schema)(endpoint.input_schema)
+        cached = _input_validators[endpoint.id] = (endpoint.input_schema, validator)
+    error = jsonschema.exceptions.best_match(cached[1].iter_errors(payload))
+    if error is not None:
+        location = "/".join(str(part) for part in error.absolute_path)
+        raise HTTPException(status_code=422, detail=f"Webhook body does not match input_schema at '/{location}': {error.message}")
+
+
+def parse_input(endpoint: ResolvedEndpoint, body: bytes) -> Any:
+    """Decodes the body into the run's input; an empty body means no input."""
+    if not body.strip():
+        payload = None
+    else:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Webhook body must be JSON")
+    if endpoint.input_schema:
+        validate_input(endpoint, payload)
+    return payload
+
 @router.post("/{path}")
 async def trigger_webhook(
     path: str, 
+    request: Request,
     x_webhook_secret: str = Header(None), 
+    x_webhook_signature: str = Header(None),
+    idempotency_key: str = Header(None),
     db: AsyncSession = Depends(get_db)
 ):
-    stmt = select(WebhookEndpoint).where(WebhookEndpoint.path == path)
-    result = await db.execute(stmt)
-    endpoint = result.scalar_one_or_none()
+    endpoint = await endpoint_resolver.resolve(db, path)
     
     if not endpoint:
         raise HTTPException(status_code=404, detail="Webhook endpoint not found")
+    tenant_id = endpoint.tenant_id
     
     if not endpoint.is_active:
         raise HTTPException(status_code=400, detail="Endpoint is inactive")
         
-    if endpoint.secret != x_webhook_secret:
+    if idempotency_key and len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    body = await read_body(request)
+    if not verify_webhook_request(endpoint, body, x_webhook_signature, x_webhook_secret):
         raise HTTPException(status_code=401, detail="Invalid secret")
+    run_input = parse_input(endpoint, body)
 
     run_id = uuid.uuid4()
+    # Retried deliveries get the original run back without touching Postgres.
+    dedupe = dedupe_key(endpoint, idempotency_key, body)
+    if dedupe:
+        try:
+            existing_run_id = await webhook_deduplicator.claim(dedupe[0], str(run_id))
+        except DeliveryInProgress:
+            # The first delivery's run isn't committed yet; its id may never be valid.
+            raise HTTPException(
+                status_code=409,
+                detail="A delivery with the same key is still being processed",
+                headers={"Retry-After": "1"},
+            )
+        if existing_run_id:
+            return {"run_id": existing_run_id, "duplicate": True}
+
+    created_at = datetime.utcnow()
     
     new_run = Run(
         id=run_id,
-        workflow_id=endpoint.workflow_id,
+        workflow_id=uuid.UUID(endpoint.workflow_id),
+        tenant_id=uuid.UUID(tenant_id) if tenant_id else None,
         status="QUEUED",
-        triggered_by="WEBHOOK"
+        triggered_by="WEBHOOK",
+        priority=endpoint.priority,
+        input_json=run_input,
+        created_at=created_at
     )
-    db.add(new_run)
-    await db.commit()
-    
-    # Store initial state in Redis
-    redis = await get_redis()
     initial_state = {
         "run_id": str(run_id),
-        "workflow_id": str(endpoint.workflow_id),
+        "workflow_id": endpoint.workflow_id,
         "status": "QUEUED",
         "current_step_index": 0,
-        "context": {},
-        "steps": []
+        "created_at": created_at.isoformat()
     }
-    await redis.set(f"run:{run_id}:state", json.dumps(initial_state), ex=86400) # 24h TTL
-    
-    # Publish event
-    await event_bus.publish("RunStarted", {"run_id": str(run_id)})
-    
+    payload = {
+        "run_id": str(run_id),
+        "workflow_id": endpoint.workflow_id,
+        "tenant_id": tenant_id,
+        "priority": endpoint.priority,
+    }
+    db.add(new_run)
+
+    with tracing.span("webhook.enqueue", request.headers, run_id=str(run_id), workflow_id=endpoint.workflow_id):
+        # The worker continues this trace from the RunStarted payload.
+        trace_context = tracing.inject()
+        if trace_context:
+            payload["trace"] = trace_context
+        try:
+            if EVENT_OUTBOX_ENABLED:
+                # The run and its event commit together; the relay publishes to Redis.
+                db.add(OutboxEvent(event_name="RunStarted", payload=payload, run_state=initial_state))
+                await db.commit()
+                outbox_relay.notify()
+            else:
+                await db.commit()
+                # Initial state and RunStarted event go to Redis in a single round trip.
+                await event_bus.enqueue_run(initial_state, payload)
+        except BaseException:
+            if dedupe:
+                await webhook_deduplicator.release(dedupe[0], str(run_id))
+            raise
+
+    if dedupe:
+        try:
+            await webhook_deduplicator.confirm(*dedupe, str(run_id))
+        except Exception as e:
+            # The run exists either way; retries get 409s until the pending claim expires.
+            logger.warning(f"Could not confirm webhook claim for run {run_id}: {e}")
+
     return {"run_id": str(run_id), "status": "QUEUED"}
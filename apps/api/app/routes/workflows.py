@@ -1,8 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from apps.api.app.db.session import get_db
-from apps.api.app.db.models import Workflow, WebhookEndpoint
-from apps.api.app.schemas import WorkflowCreate, WorkflowResponse, WebhookEndpointCreate, WebhookEndpointResponse
+from apps.api.app.db.session import get_by_id, get_db, get_read_db
+from apps.api.app.db.models import Workflow, WebhookEndpoint, Run, OutboxEvent, WorkflowSchedule
+from apps.api.app.schemas import (
+    WorkflowCreate, WorkflowUpdate, WorkflowResponse, WebhookEndpointCreate, WebhookEndpointUpdate, WebhookEndpointResponse,
+    RunListResponse, RunCreate, RunCreateResponse, ScheduleCreate, ScheduleUpdate, ScheduleResponse,
+)
+from apps.api.app.cache.webhook_endpoints import endpoint_resolver
+from apps.api.app.routes.webhooks import check_input_schema
+from apps.api.app.events.bus import event_bus
+from apps.api.app.events.outbox import EVENT_OUTBOX_ENABLED, outbox_relay
+from apps.api.app.routes.runs import RUN_LIST_DEFAULT_LIMIT, RUN_LIST_MAX_LIMIT, list_runs_page
+from datetime import datetime, timezone
+from typing import Optional
+from shared.shared.cron import CronExpression
 from shared.shared.schemas.workflow import WorkflowDefinition
 import uuid
 
@@ -12,6 +24,7 @@ router = APIRouter()
 async def create_workflow(workflow: WorkflowCreate, db: AsyncSession = Depends(get_db)):
     db_workflow = Workflow(
         name=workflow.name,
+        priority=workflow.priority,
         definition_json=workflow.definition.model_dump()
     )
     db.add(db_workflow)
@@ -21,29 +34,251 @@ async def create_workflow(workflow: WorkflowCreate, db: AsyncSession = Depends(g
         id=db_workflow.id,
         name=db_workflow.name,
         is_active=db_workflow.is_active,
+        priority=db_workflow.priority,
         definition=WorkflowDefinition(**db_workflow.definition_json),
         created_at=db_workflow.created_at,
         updated_at=db_workflow.updated_at
     )
 
+@router.put("/{workflow_id}", response_model=WorkflowResponse)
+async def update_workflow(workflow_id: uuid.UUID, update: WorkflowUpdate, db: AsyncSession = Depends(get_db)):
+    db_workflow = await db.get(Workflow, workflow_id)
+    if not db_workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+
+    if update.name is not None:
+        db_workflow.name = update.name
+    if update.is_active is not None:
+        db_workflow.is_active = update.is_active
+    if update.definition is not None:
+        db_workflow.definition_json = update.definition.model_dump()
+    priority_changed = update.priority is not None and update.priority != db_workflow.priority
+    if priority_changed:
+        db_workflow.priority = update.priority
+    await db.commit()
+    await db.refresh(db_workflow)
+
+    # Workers cache parsed definitions; tell them to reload this one.
+    await event_bus.invalidate_workflow(str(workflow_id))
+    if priority_changed:
+        # Resolved webhook endpoints carry the workflow's priority.
+        paths = await db.scalars(select(WebhookEndpoint.path).where(WebhookEndpoint.workflow_id == workflow_id))
+        for path in paths:
+            await endpoint_resolver.invalidate(path)
+
+    return WorkflowResponse(
+        id=db_workflow.id,
+        name=db_workflow.name,
+        is_active=db_workflow.is_active,
+        priority=db_workflow.priority,
+        definition=WorkflowDefinition(**db_workflow.definition_json),
+        created_at=db_workflow.created_at,
+        updated_at=db_workflow.updated_at
+    )
+
+@router.get("/{workflow_id}/runs", response_model=RunListResponse)
+async def list_workflow_runs(
+    workflow_id: uuid.UUID,
+    status: Optional[str] = None,
+    limit: int = Query(RUN_LIST_DEFAULT_LIMIT, ge=1, le=RUN_LIST_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    if not cursor and not await get_by_id(db, Workflow, workflow_id):
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    return await list_runs_page(db, limit, cursor, workflow_id=workflow_id, status=status)
+
 @router.post("/{workflow_id}/webhook-endpoints", response_model=WebhookEndpointResponse)
 async def create_webhook_endpoint(workflow_id: uuid.UUID, endpoint: WebhookEndpointCreate, db: AsyncSession = Depends(get_db)):
     db_workflow = await db.get(Workflow, workflow_id)
     if not db_workflow:
         raise HTTPException(status_code=404, detail="Workflow not found")
+    if endpoint.input_schema:
+        check_input_schema(endpoint.input_schema)
     
     db_endpoint = WebhookEndpoint(
         workflow_id=workflow_id,
         path=endpoint.path,
-        secret=endpoint.secret
+        secret=endpoint.secret,
+        dedupe_window_seconds=endpoint.dedupe_window_seconds or None,
+        input_schema=endpoint.input_schema or None
     )
     db.add(db_endpoint)
     await db.commit()
     await db.refresh(db_endpoint)
+    # Drop any negative-cache entry left by requests that hit this path before it existed.
+    await endpoint_resolver.invalidate(db_endpoint.path)
+    return WebhookEndpointResponse(
+        id=db_endpoint.id,
+        workflow_id=db_endpoint.workflow_id,
+        path=db_endpoint.path,
+        is_active=db_endpoint.is_active,
+        dedupe_window_seconds=db_endpoint.dedupe_window_seconds,
+        input_schema=db_endpoint.input_schema,
+        created_at=db_endpoint.created_at
+    )
+
+@router.patch("/{workflow_id}/webhook-endpoints/{endpoint_id}", response_model=WebhookEndpointResponse)
+async def update_webhook_endpoint(
+    workflow_id: uuid.UUID,
+    endpoint_id: uuid.UUID,
+    update: WebhookEndpointUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    db_endpoint = await db.get(WebhookEndpoint, endpoint_id)
+    if not db_endpoint or db_endpoint.workflow_id != workflow_id:
+        raise HTTPException(status_code=404, detail="Webhook endpoint not found")
+
+    if update.is_active is not None:
+        db_endpoint.is_active = update.is_active
+    if update.secret is not None:
+        db_endpoint.secret = update.secret
+    if update.dedupe_window_seconds is not None:
+        # 0 turns body-hash de-duplication off.
+        db_endpoint.dedupe_window_seconds = update.dedupe_window_seconds or None
+    if update.input_schema is not None:
+        # {} removes validation.
+        if update.input_schema:
+            check_input_schema(update.input_schema)
+        db_endpoint.input_schema = update.input_schema or None
+    await db.commit()
+    await db.refresh(db_endpoint)
+    await endpoint_resolver.invalidate(db_endpoint.path)
     return WebhookEndpointResponse(
         id=db_endpoint.id,
         workflow_id=db_endpoint.workflow_id,
         path=db_endpoint.path,
         is_active=db_endpoint.is_active,
+        dedupe_window_seconds=db_endpoint.dedupe_window_seconds,
+        input_schema=db_endpoint.input_schema,
         created_at=db_endpoint.created_at
     )
+
+@router.post("/{workflow_id}/runs", response_model=RunCreateResponse)
+async def create_run(workflow_id: uuid.UUID, request: RunCreate, db: AsyncSession = Depends(get_db)):
+    """Starts a run now, or at ``run_at`` if that is in the future."""
+    db_workflow = await db.get(Workflow, workflow_id)
+    if not db_workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if not db_workflow.is_active:
+        raise HTTPException(status_code=400, detail="Workflow is inactive")
+
+    created_at = datetime.utcnow()
+    run_at = request.run_at
+    if run_at is not None and run_at.tzinfo is not None:
+        run_at = run_at.astimezone(timezone.utc).replace(tzinfo=None)
+    delayed = run_at is not None and run_at > created_at
+
+    run_id = uuid.uuid4()
+    tenant_id = str(db_workflow.tenant_id) if db_workflow.tenant_id else None
+    status = "SCHEDULED" if delayed else "QUEUED"
+    priority = request.priority or db_workflow.priority
+    db.add(Run(
+        id=run_id,
+        workflow_id=workflow_id,
+        tenant_id=db_workflow.tenant_id,
+        status=status,
+        triggered_by="API",
+        priority=priority,
+        input_json=request.input,
+        scheduled_at=run_at,
+        created_at=created_at
+    ))
+    initial_state = {
+        "run_id": str(run_id),
+        "workflow_id": str(workflow_id),
+        "status": status,
+        "current_step_index": 0,
+        "created_at": created_at.isoformat()
+    }
+    payload = {
+        "run_id": str(run_id),
+        "workflow_id": str(workflow_id),
+        "tenant_id": tenant_id,
+        "priority": priority,
+    }
+
+    if delayed:
+        # If the scheduler set misses it, the scheduler's reconcile pass re-adds it from Postgres.
+        await db.commit()
+        await event_bus.schedule_run(initial_state, payload, run_at)
+    elif EVENT_OUTBOX_ENABLED:
+        db.add(OutboxEvent(event_name="RunStarted", payload=payload, run_state=initial_state))
+        await db.commit()
+        outbox_relay.notify()
+    else:
+        await db.commit()
+        await event_bus.enqueue_run(initial_state, payload)
+
+    return RunCreateResponse(run_id=run_id, status=status, run_at=run_at)
+
+
+def parse_cron(expression: str) -> CronExpression:
+    try:
+        return CronExpression.parse(expression)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cron expression: {e}")
+
+
+def next_run_at(schedule: WorkflowSchedule) -> Optional[datetime]:
+    if not schedule.is_active:
+        return None
+    return CronExpression.parse(schedule.cron).next_after(datetime.utcnow())
+
+
+def schedule_response(schedule: WorkflowSchedule, next_at: Optional[datetime]) -> ScheduleResponse:
+    return ScheduleResponse(
+        id=schedule.id,
+        workflow_id=schedule.workflow_id,
+        cron=schedule.cron,
+        input=schedule.input_json,
+        is_active=schedule.is_active,
+        next_run_at=next_at,
+        created_at=schedule.created_at
+    )
+
+
+@router.post("/{workflow_id}/schedules", response_model=ScheduleResponse)
+async def create_schedule(workflow_id: uuid.UUID, schedule: ScheduleCreate, db: AsyncSession = Depends(get_db)):
+    db_workflow = await db.get(Workflow, workflow_id)
+    if not db_workflow:
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    parse_cron(schedule.cron)
+
+    db_schedule = WorkflowSchedule(
+        workflow_id=workflow_id,
+        cron=schedule.cron,
+        input_json=schedule.input,
+        is_active=schedule.is_active
+    )
+    db.add(db_schedule)
+    await db.commit()
+    await db.refresh(db_schedule)
+    next_at = next_run_at(db_schedule)
+    await event_bus.set_schedule(str(db_schedule.id), next_at)
+    return schedule_response(db_schedule, next_at)
+
+
+@router.patch("/{workflow_id}/schedules/{schedule_id}", response_model=ScheduleResponse)
+async def update_schedule(
+    workflow_id: uuid.UUID,
+    schedule_id: uuid.UUID,
+    update: ScheduleUpdate,
+    db: AsyncSession = Depends(get_db)
+):
+    db_schedule = await db.get(WorkflowSchedule, schedule_id)
+    if not db_schedule or db_schedule.workflow_id != workflow_id:
+        raise HTTPException(status_code=404, detail="Schedule not found")
+
+    if update.cron is not None:
+        parse_cron(update.cron)
+        db_schedule.cron = update.cron
+    if update.input is not None:
+        db_schedule.input_json = update.input
+    if update.is_active is not None:
+        db_schedule.is_active = update.is_active
+    await db.commit()
+    await db.refresh(db_schedule)
+    next_at = next_run_at(db_schedule)
+    await event_bus.set_schedule(str(db_schedule.id), next_at)
+    return schedule_response(db_schedule, next_at)
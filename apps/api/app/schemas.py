@@ -1,17 +1,27 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal
 from uuid import UUID
 from datetime import datetime
 from shared.shared.schemas.workflow import WorkflowDefinition
 
+RunPriority = Literal["high", "normal", "low"]
+
 class WorkflowCreate(BaseModel):
     name: str
     definition: WorkflowDefinition
+    priority: RunPriority = "normal"
+
+class WorkflowUpdate(BaseModel):
+    name: Optional[str] = None
+    is_active: Optional[bool] = None
+    definition: Optional[WorkflowDefinition] = None
+    priority: Optional[RunPriority] = None
 
 class WorkflowResponse(BaseModel):
     id: UUID
     name: str
     is_active: bool
+    priority: RunPriority
     definition: WorkflowDefinition
     created_at: datetime
     updated_at: datetime
@@ -19,12 +29,52 @@ class WorkflowResponse(BaseModel):
 class WebhookEndpointCreate(BaseModel):
     path: str
     secret: str
+    dedupe_window_seconds: Optional[int] = Field(None, ge=0)
+    input_schema: Optional[Dict[str, Any]] = None
+
+class WebhookEndpointUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    secret: Optional[str] = None
+    dedupe_window_seconds: Optional[int] = Field(None, ge=0)
+    input_schema: Optional[Dict[str, Any]] = None
 
 class WebhookEndpointResponse(BaseModel):
     id: UUID
     workflow_id: UUID
     path: str
     is_active: bool
+    dedupe_window_seconds: Optional[int] = None
+    input_schema: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+class RunCreate(BaseModel):
+    input: Optional[Any] = None
+    run_at: Optional[datetime] = None
+    # Defaults to the workflow's priority.
+    priority: Optional[RunPriority] = None
+
+class RunCreateResponse(BaseModel):
+    run_id: UUID
+    status: str
+    run_at: Optional[datetime] = None
+
+class ScheduleCreate(BaseModel):
+    cron: str
+    input: Optional[Any] = None
+    is_active: bool = True
+
+class ScheduleUpdate(BaseModel):
+    cron: Optional[str] = None
+    input: Optional[Any] = None
+    is_active: Optional[bool] = None
+
+class ScheduleResponse(BaseModel):
+    id: UUID
+    workflow_id: UUID
+    cron: str
+    input: Optional[Any] = None
+    is_active: bool
+    next_run_at: Optional[datetime] = None
     created_at: datetime
 
 class RunResponse(BaseModel):
@@ -36,3 +86,14 @@ class RunResponse(BaseModel):
     finished_at: Optional[datetime] = None
     error_message: Optional[str] = None
     created_at: datetime
+
+class RunListResponse(BaseModel):
+    items: List[RunResponse]
+    next_cursor: Optional[str] = None
+
+class RunBatchGetRequest(BaseModel):
+    ids: List[UUID] = Field(..., min_length=1, max_length=500)
+
+class RunBatchGetResponse(BaseModel):
+    items: List[RunResponse]
+    not_found: List[UUID] = []
@@ -0,0 +1,36 @@
+"""Optional OpenTelemetry spans for the webhook-to-step hot path.
+
+Spans are only recorded when ``opentelemetry-api`` is installed and a tracer
+provider is configured (e.g. by running under ``opentelemetry-instrument``);
+otherwise these helpers do nothing. The trace context travels from webhook
+ingress to the worker inside the RunStarted payload.
+"""
+from contextlib import contextmanager
+from typing import Mapping, Optional
+
+try:
+    from opentelemetry import propagate, trace
+except ImportError:  # tracing is optional
+    trace = None
+
+_tracer = trace.get_tracer("orchestrator") if trace else None
+
+
+@contextmanager
+def span(name: str, carrier: Optional[Mapping[str, str]] = None, **attributes):
+    """Runs the block in a span, continuing the trace in ``carrier`` if there is one."""
+    if _tracer is None:
+        yield None
+        return
+    # An active span (e.g. from server instrumentation) already continues the caller's trace.
+    parent = propagate.extract(carrier) if carrier and not trace.get_current_span().get_span_context().is_valid else None
+    with _tracer.start_as_current_span(name, context=parent, attributes=attributes) as current:
+        yield current
+
+
+def inject() -> dict:
+    """Returns the current trace context as a carrier dict, empty when nothing is being traced."""
+    carrier: dict = {}
+    if trace is not None:
+        propagate.inject(carrier)
+    return carrier
@@ -0,0 +1,219 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterable, Optional, Tuple
+
+BLOB_STORE_BACKEND = os.getenv("BLOB_STORE_BACKEND", "local")
+BLOB_STORE_PATH = os.getenv("BLOB_STORE_PATH", "./data/blobs")
+BLOB_STORE_S3_BUCKET = os.getenv("BLOB_STORE_S3_BUCKET", "")
+BLOB_STORE_S3_PREFIX = os.getenv("BLOB_STORE_S3_PREFIX", "blobs/")
+BLOB_STORE_S3_ENDPOINT_URL = os.getenv("BLOB_STORE_S3_ENDPOINT_URL") or None
+# Step results whose JSON encoding is larger than this are stored as blobs and
+# replaced by a reference in the run context.
+BLOB_OFFLOAD_THRESHOLD_BYTES = int(os.getenv("BLOB_OFFLOAD_THRESHOLD_BYTES", "65536"))
+
+# A reference is a plain dict so it can live in the context, in Redis step
+# results and in snapshots like any other JSON value.
+BLOB_REF_KEY = "$blob"
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_ref(digest: str, size: int, media_type: str = "application/json") -> dict:
+    return {BLOB_REF_KEY: digest, "size": size, "media_type": media_type}
+
+
+def is_ref(value: Any) -> bool:
+    return isinstance(value, dict) and BLOB_REF_KEY in value
+
+
+class BlobStore(ABC):
+    """Content-addressed storage: blobs are immutable and keyed by their sha256."""
+
+    @abstractmethod
+    async def put(self, data: bytes) -> str:
+        """Stores the bytes and returns their digest; storing the same bytes twice is a no-op."""
+
+    @abstractmethod
+    async def get(self, digest: str) -> bytes:
+        """Returns the bytes for a digest; raises KeyError if missing."""
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        ...
+
+    async def put_stream(self, chunks: AsyncIterable[bytes]) -> Tuple[str, int]:
+        """Stores a body read in chunks; returns (digest, size). Backends may avoid buffering it."""
+        data = b"".join([chunk async for chunk in chunks])
+        return await self.put(data), len(data)
+
+
+class LocalBlobStore(BlobStore):
+    """Stores blobs as files under ``root/<digest[:2]>/<digest>``.
+
+    Only suitable when every worker shares the directory (a single host or a
+    shared volume); use the S3 backend otherwise.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_PATH):
+        self.root = os.path.abspath(root)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    def _write(self, digest: str, data: bytes):
+        path = self._path(digest)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so readers never see a partial blob.
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _read(self, digest: str) -> bytes:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(digest)
+
+    async def put(self, data: bytes) -> str:
+        digest = content_digest(data)
+        await asyncio.to_thread(self._write, digest, data)
+        return digest
+
+    async def put_stream(self, chunks: AsyncIterable[bytes]) -> Tuple[str, int]:
+        # Spool to a temp file while hashing, so the body is never held in memory.
+        await asyncio.to_thread(os.makedirs, self.root, exist_ok=True)
+        fd, tmp = await asyncio.to_thread(tempfile.mkstemp, dir=self.root)
+        digest, size = hashlib.sha256(), 0
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+            path = self._path(digest.hexdigest())
+            await asyncio.to_thread(os.makedirs, os.path.dirname(path), exist_ok=True)
+            await asyncio.to_thread(os.replace, tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return digest.hexdigest(), size
+
+    async def get(self, digest: str) -> bytes:
+        return await asyncio.to_thread(self._read, digest)
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(os.path.exists, self._path(digest))
+
+
+class S3BlobStore(BlobStore):
+    """Stores blobs in an S3-compatible bucket. Requires the optional ``boto3`` package."""
+
+    def __init__(self, bucket: str = BLOB_STORE_S3_BUCKET, prefix: str = BLOB_STORE_S3_PREFIX, endpoint_url: Optional[str] = BLOB_STORE_S3_ENDPOINT_URL):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("BLOB_STORE_BACKEND=s3 requires the boto3 package")
+        if not bucket:
+            raise RuntimeError("BLOB_STORE_S3_BUCKET must be set for the s3 blob store")
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._missing = self._client.exceptions.NoSuchKey
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}{digest}"
+
+    async def put(self, data: bytes) -> str:
+        digest = content_digest(data)
+        if not await self.exists(digest):
+            await asyncio.to_thread(self._client.put_object, Bucket=self.bucket, Key=self._key(digest), Body=data)
+        return digest
+
+    async def get(self, digest: str) -> bytes:
+        def read():
+            try:
+                return self._client.get_object(Bucket=self.bucket, Key=self._key(digest))["Body"].read()
+            except self._missing:
+                raise KeyError(digest)
+        return await asyncio.to_thread(read)
+
+    async def exists(self, digest: str) -> bool:
+        def head():
+            try:
+                self._client.head_object(Bucket=self.bucket, Key=self._key(digest))
+                return True
+            except self._client.exceptions.ClientError:
+                return False
+        return await asyncio.to_thread(head)
+
+
+def create_blob_store(backend: str = BLOB_STORE_BACKEND) -> BlobStore:
+    if backend == "local":
+        return LocalBlobStore()
+    if backend == "s3":
+        return S3BlobStore()
+    raise ValueError(f"Unknown BLOB_STORE_BACKEND: {backend}")
+
+
+class LazyBlobStore(BlobStore):
+    """Creates the configured store on first use, so importing this module never needs S3 settings."""
+
+    def __init__(self, backend: str = BLOB_STORE_BACKEND):
+        self.backend = backend
+        self._store: Optional[BlobStore] = None
+
+    @property
+    def store(self) -> BlobStore:
+        if self._store is None:
+            self._store = create_blob_store(self.backend)
+        return self._store
+
+    async def put(self, data: bytes) -> str:
+        return await self.store.put(data)
+
+    async def get(self, digest: str) -> bytes:
+        return await self.store.get(digest)
+
+    async def exists(self, digest: str) -> bool:
+        return await self.store.exists(digest)
+
+    async def put_stream(self, chunks: AsyncIterable[bytes]) -> Tuple[str, int]:
+        return await self.store.put_stream(chunks)
+
+
+blob_store = LazyBlobStore()
+
+
+async def offload(value: Any, store: BlobStore = blob_store, threshold: int = BLOB_OFFLOAD_THRESHOLD_BYTES) -> Any:
+    """Returns ``value`` unchanged if it is small, otherwise stores it and returns a reference."""
+    if value is None or isinstance(value, (bool, int, float)) or is_ref(value):
+        return value
+    data = json.dumps(value, separators=(",", ":")).encode()
+    if len(data) <= threshold:
+        return value
+    return make_ref(await store.put(data), len(data))
+
+
+async def load(value: Any, store: BlobStore = blob_store) -> Any:
+    """Resolves a reference back into the value it stands for; other values pass through."""
+    if not is_ref(value):
+        return value
+    data = await store.get(value[BLOB_REF_KEY])
+    if value.get("media_type") == "application/json":
+        return json.loads(data)
+    return data
@@ -0,0 +1,125 @@
+import itertools
+import os
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+CIRCUIT_WINDOW_SECONDS = float(os.getenv("CIRCUIT_WINDOW_SECONDS", "30"))
+CIRCUIT_MIN_REQUESTS = int(os.getenv("CIRCUIT_MIN_REQUESTS", "20"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpen(Exception):
+    def __init__(self, host: str, retry_in: float):
+        super().__init__(f"Circuit for {host} is open, retry in {retry_in:.0f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Tracks request outcomes for one host over a sliding time window.
+
+    Opens when at least ``min_requests`` were made in the window and the
+    failure rate reaches ``failure_rate``. After ``open_seconds`` a single
+    probe request is let through: success closes the circuit, failure opens
+    it again. Only the probe, identified by the token ``before_request()``
+    returned for it, can do either; requests sent before the circuit opened
+    don't count.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        window_seconds: float = CIRCUIT_WINDOW_SECONDS,
+        min_requests: int = CIRCUIT_MIN_REQUESTS,
+        failure_rate: float = CIRCUIT_FAILURE_RATE,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.host = host
+        self.window_seconds = window_seconds
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.clock = clock
+        self.state = CLOSED
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        # Token of the request probing the half-open circuit, 0 when there is none.
+        self._probe = 0
+        self._probe_tokens = itertools.count(1)
+
+    def before_request(self) -> Optional[int]:
+        """Raises CircuitOpen if the request should not be sent.
+
+        Returns a probe token when the request is the half-open probe; pass it
+        on to ``record()`` or ``abandon()``.
+        """
+        if self.state == CLOSED:
+            return None
+        now = self.clock()
+        if self.state == OPEN:
+            remaining = self._opened_at + self.open_seconds - now
+            if remaining > 0:
+                raise CircuitOpen(self.host, remaining)
+            self.state = HALF_OPEN
+        if self._probe:
+            raise CircuitOpen(self.host, self.open_seconds)
+        self._probe = next(self._probe_tokens)
+        return self._probe
+
+    def record(self, success: bool, probe: Optional[int] = None):
+        now = self.clock()
+        if self.state == HALF_OPEN:
+            if probe is None or probe != self._probe:
+                return
+            self._probe = 0
+            if success:
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._failures = 0
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, success))
+        if not success:
+            self._failures += 1
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            _, ok = self._outcomes.popleft()
+            if not ok:
+                self._failures -= 1
+        total = len(self._outcomes)
+        if self.state == CLOSED and total >= self.min_requests and self._failures / total >= self.failure_rate:
+            self._open(now)
+
+    def abandon(self, probe: Optional[int] = None):
+        """Forgets a request that ended without an outcome (e.g. it was cancelled)."""
+        if probe is not None and probe == self._probe:
+            self._probe = 0
+
+    def _open(self, now: float):
+        self.state = OPEN
+        self._opened_at = now
+
+
+class CircuitBreakerRegistry:
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host, **self.settings)
+        return breaker
+
+    def stats(self) -> dict:
+        return {host: breaker.state for host, breaker in self._breakers.items() if breaker.state != CLOSED}
+
+
+circuit_breakers = CircuitBreakerRegistry()
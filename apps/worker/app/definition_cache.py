@@ -0,0 +1,148 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.api.app.db.models import Workflow
+from apps.api.app.events.bus import WORKFLOW_INVALIDATION_CHANNEL
+from shared.shared.schemas.workflow import WorkflowDefinition
+from shared.shared.templating import StepTemplate, compile_step_templates
+
+logger = logging.getLogger(__name__)
+
+WORKFLOW_CACHE_MAX_ENTRIES = int(os.getenv("WORKFLOW_CACHE_MAX_ENTRIES", "1024"))
+# Safety net in case an invalidation message is missed.
+WORKFLOW_CACHE_TTL_SECONDS = float(os.getenv("WORKFLOW_CACHE_TTL_SECONDS", "300"))
+
+
+@dataclass(frozen=True)
+class CompiledWorkflow:
+    workflow_id: str
+    tenant_id: Optional[str]
+    updated_at: datetime
+    definition: WorkflowDefinition
+    is_dag: bool
+    dependencies: List[List[int]]
+    # Parsed {{ ... }} placeholders, by step index; steps without any are absent.
+    templates: Dict[int, StepTemplate]
+
+    @classmethod
+    def compile(cls, workflow: Workflow) -> "CompiledWorkflow":
+        definition = WorkflowDefinition(**workflow.definition_json)
+        return cls(
+            workflow_id=str(workflow.id),
+            tenant_id=str(workflow.tenant_id) if workflow.tenant_id else None,
+            updated_at=workflow.updated_at,
+            definition=definition,
+            is_dag=definition.is_dag,
+            dependencies=definition.dependency_indices(),
+            templates=compile_step_templates(definition.steps),
+        )
+
+
+class DefinitionCache:
+    """In-process LRU of parsed workflow definitions.
+
+    Entries are keyed by workflow id and remember the row's ``updated_at``; the
+    API publishes on ``WORKFLOW_INVALIDATION_CHANNEL`` whenever a workflow
+    changes and ``listen()`` evicts the matching entry. ``load()`` also checks
+    ``updated_at`` on every hit (a one-column primary key lookup, much cheaper
+    than loading and parsing the definition), so an edit whose invalidation
+    was missed is picked up by the next run rather than after the TTL.
+    """
+
+    def __init__(self, max_entries: int = WORKFLOW_CACHE_MAX_ENTRIES, ttl_seconds: float = WORKFLOW_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, CompiledWorkflow]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale = 0
+
+    def get(self, workflow_id: str) -> Optional[CompiledWorkflow]:
+        entry = self._entries.get(workflow_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        cached_at, compiled = entry
+        if time.monotonic() - cached_at > self.ttl_seconds:
+            del self._entries[workflow_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(workflow_id)
+        self.hits += 1
+        return compiled
+
+    def put(self, compiled: CompiledWorkflow):
+        self._entries[compiled.workflow_id] = (time.monotonic(), compiled)
+        self._entries.move_to_end(compiled.workflow_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, workflow_id: Optional[str] = None):
+        if workflow_id is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(workflow_id, None)
+        self.invalidations += 1
+
+    async def load(self, db: AsyncSession, workflow_id) -> Optional[CompiledWorkflow]:
+        compiled = self.get(str(workflow_id))
+        if compiled is not None:
+            result = await db.execute(select(Workflow.updated_at).where(Workflow.id == UUID(str(workflow_id))))
+            if result.scalar_one_or_none() == compiled.updated_at:
+                return compiled
+            self._entries.pop(compiled.workflow_id, None)
+            self.stale += 1
+
+        result = await db.execute(select(Workflow).where(Workflow.id == UUID(str(workflow_id))))
+        workflow = result.scalar_one_or_none()
+        if not workflow:
+            return None
+        compiled = CompiledWorkflow.compile(workflow)
+        self.put(compiled)
+        return compiled
+
+    async def listen(self, redis, stop_event: asyncio.Event):
+        """Evicts entries named on the invalidation channel until ``stop_event`` is set."""
+        while not stop_event.is_set():
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(WORKFLOW_INVALIDATION_CHANNEL)
+                # Anything published while we weren't subscribed is lost.
+                self.invalidate()
+                while not stop_event.is_set():
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is None:
+                        continue
+                    workflow_id = json.loads(message["data"]).get("workflow_id")
+                    self.invalidate(workflow_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Workflow invalidation listener failed: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "stale": self.stale,
+        }
+
+
+definition_cache = DefinitionCache()
@@ -1,38 +1,451 @@
 import asyncio
-import json
 import logging
+import math
+import os
+import socket
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from redis.exceptions import ResponseError
 from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.events.bus import (
+    EVENT_STREAM_KEY,
+    EVENT_STREAMS_KEY,
+    EVENT_CONSUMER_GROUP,
+    EVENT_DEAD_LETTER_KEY,
+    EVENT_STREAM_MAXLEN,
+    decode_event,
+    stream_flow,
+)
 from apps.worker.app.executor import WorkflowExecutor
-import os
+from apps.worker.app.fair_queue import FairQueue, parse_weights
+from apps.worker.app.task_scheduler import Job, TaskScheduler
 
 logger = logging.getLogger(__name__)
 
-EVENT_QUEUE_KEY = os.getenv("EVENT_QUEUE_KEY", "events:workflow")
+WORKER_CONSUMER_NAME = os.getenv("WORKER_CONSUMER_NAME", f"{socket.gethostname()}-{os.getpid()}")
+EVENT_READ_BATCH_SIZE = int(os.getenv("EVENT_READ_BATCH_SIZE", "16"))
+EVENT_READ_BLOCK_MS = int(os.getenv("EVENT_READ_BLOCK_MS", "5000"))
+EVENT_VISIBILITY_TIMEOUT_MS = int(os.getenv("EVENT_VISIBILITY_TIMEOUT_MS", "60000"))
+EVENT_MAX_DELIVERIES = int(os.getenv("EVENT_MAX_DELIVERIES", "5"))
+EVENT_RECLAIM_INTERVAL_SECONDS = float(os.getenv("EVENT_RECLAIM_INTERVAL_SECONDS", "15"))
+# How often workers look for streams of tenants (or priorities) they haven't seen yet.
+EVENT_STREAMS_REFRESH_SECONDS = float(os.getenv("EVENT_STREAMS_REFRESH_SECONDS", "5"))
+# Streams that have been empty this long are dropped from the registry until
+# their tenant publishes again.
+EVENT_STREAM_IDLE_SECONDS = float(os.getenv("EVENT_STREAM_IDLE_SECONDS", "300"))
+# Share of the worker each stream gets while backlogged: its priority's weight
+# times its tenant's (tenants not listed weigh 1).
+EVENT_PRIORITY_WEIGHTS = os.getenv("EVENT_PRIORITY_WEIGHTS", "high=8,normal=4,low=1")
+EVENT_TENANT_WEIGHTS = os.getenv("EVENT_TENANT_WEIGHTS", "")
 
-async def consume_events():
-    redis = await get_redis()
-    logger.info(f"Worker started. Listening on {EVENT_QUEUE_KEY}...")
-    
-    while True:
+# (stream, entry id, fields); entry ids are only unique within a stream.
+Entry = Tuple[str, str, Dict[str, str]]
+EntryKey = Tuple[str, str]
+
+# Unregisters the given streams that are empty. Runs atomically with respect to
+# EventBus.publish_many's MULTI, which re-registers a stream as it adds to it.
+# The stream key and its group are left alone, so reads already under way are
+# unaffected. KEYS: the registry, then the streams.
+_PRUNE_EMPTY_STREAMS = """
+local pruned = {}
+for i = 2, #KEYS do
+    if redis.call('XLEN', KEYS[i]) == 0 then
+        redis.call('SREM', KEYS[1], KEYS[i])
+        table.insert(pruned, KEYS[i])
+    end
+end
+return pruned
+"""
+
+
+class StreamConsumer:
+    """Reads RunStarted events from the per-priority, per-tenant Redis Streams of a consumer group.
+
+    Each read asks every stream for a share of the free slots in proportion
+    to its weight, all in one pipelined round trip, and what comes back is
+    started in weighted fair order (see ``FairQueue``). A tenant with a huge
+    backlog therefore takes its share of the workers, not all of them.
+
+    Entries stay in the group's pending list until the run finishes, and the
+    consumer keeps refreshing their idle time while they run. If a worker dies,
+    its entries go idle and another consumer reclaims them with XAUTOCLAIM after
+    ``EVENT_VISIBILITY_TIMEOUT_MS``. Entries delivered more than
+    ``EVENT_MAX_DELIVERIES`` times are moved to the dead-letter stream.
+    """
+
+    def __init__(
+        self,
+        redis,
+        scheduler: TaskScheduler,
+        consumer_name: str = WORKER_CONSUMER_NAME,
+        priority_weights: str = EVENT_PRIORITY_WEIGHTS,
+        tenant_weights: str = EVENT_TENANT_WEIGHTS,
+    ):
+        self.redis = redis
+        self.scheduler = scheduler
+        self.consumer_name = consumer_name
+        self.priority_weights = parse_weights(priority_weights)
+        self.tenant_weights = parse_weights(tenant_weights)
+        self.streams: List[str] = [EVENT_STREAM_KEY]
+        # Streams that filled their share on the last read, so probably have more.
+        self._busy: Set[str] = set()
+        # Where the next read starts probing idle streams, and when each stream
+        # last had something for us (monotonic time).
+        self._probe_cursor = 0
+        self._last_active: Dict[str, float] = {}
+        self._prune_script = None
+        self._backlog = FairQueue()
+        # Runs the scheduler can't take yet, by stream. Those streams aren't read
+        # until their held runs have been handed over.
+        self._held: Dict[str, Deque[Job]] = {}
+        self._inflight: Dict[EntryKey, Dict[str, str]] = {}
+        self._reclaim_cursors: Dict[str, str] = {}
+
+    def weight(self, stream: str) -> float:
+        priority, tenant_id = stream_flow(stream)
+        return self.priority_weights.get(priority, 1.0) * self.tenant_weights.get(tenant_id or "", 1.0)
+
+    async def ensure_groups(self, streams: List[str]):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream in streams:
+                pipe.xgroup_create(stream, EVENT_CONSUMER_GROUP, id="0", mkstream=True)
+            results = await pipe.execute(raise_on_error=False)
+        for result in results:
+            if isinstance(result, ResponseError) and "BUSYGROUP" not in str(result):
+                raise result
+
+    async def refresh_streams(self):
+        """Starts reading streams that appeared since the last refresh and stops reading pruned ones."""
+        registered = set(await self.redis.smembers(EVENT_STREAMS_KEY))
+        new = sorted(registered - set(self.streams))
+        if new:
+            await self.ensure_groups(new)
+        now = time.monotonic()
+        for stream in new:
+            self._last_active.setdefault(stream, now)
+        self.streams = [
+            stream for stream in self.streams
+            if stream == EVENT_STREAM_KEY or stream in registered or stream in self._held
+        ] + new
+
+    async def prune_streams(self, idle_seconds: float = EVENT_STREAM_IDLE_SECONDS) -> List[str]:
+        """Unregisters streams that have been empty for ``idle_seconds``, so they aren't probed any more."""
+        cutoff = time.monotonic() - idle_seconds
+        candidates = [
+            stream for stream in self.readable_streams()
+            if stream != EVENT_STREAM_KEY and self._last_active.get(stream, 0) <= cutoff
+        ]
+        if not candidates:
+            return []
+        if self._prune_script is None:
+            self._prune_script = self.redis.register_script(_PRUNE_EMPTY_STREAMS)
+        pruned = await self._prune_script(keys=[EVENT_STREAMS_KEY, *candidates])
+        if pruned:
+            logger.info(f"Stopped reading {len(pruned)} empty stream(s)")
+            self.streams = [stream for stream in self.streams if stream not in pruned]
+            for stream in pruned:
+                self._last_active.pop(stream, None)
+        return pruned
+
+    async def run(self, stop_event: asyncio.Event):
+        await self.ensure_groups([EVENT_STREAM_KEY])
+        loop = asyncio.get_running_loop()
+        last_reclaim = 0.0
+        last_refresh = None
+        last_extend = loop.time()
+        extend_interval = EVENT_VISIBILITY_TIMEOUT_MS / 3000
+
+        while not stop_event.is_set():
+            try:
+                if loop.time() - last_extend >= extend_interval:
+                    await self._extend_visibility()
+                    last_extend = loop.time()
+
+                if last_refresh is None or loop.time() - last_refresh >= EVENT_STREAMS_REFRESH_SECONDS:
+                    await self.refresh_streams()
+                    await self.prune_streams()
+                    last_refresh = loop.time()
+
+                # Backpressure: don't take more events off the streams than we can run.
+                if not await self.scheduler.wait_for_capacity(timeout=1):
+                    continue
+                self._start_backlog()
+                if self._backlog:
+                    continue
+                if not self.readable_streams():
+                    # Every stream is waiting on a capped tenant or workflow.
+                    await self.scheduler.wait_for_change(timeout=1)
+                    continue
+
+                entries: List[Entry] = []
+                if loop.time() - last_reclaim >= EVENT_RECLAIM_INTERVAL_SECONDS:
+                    entries = await self._reclaim(self.scheduler.free_slots())
+                    last_reclaim = loop.time()
+
+                if not entries:
+                    entries = await self._read(min(EVENT_READ_BATCH_SIZE, self.scheduler.free_slots()))
+
+                for stream, entry_id, fields in entries:
+                    await self._dispatch(stream, entry_id, fields)
+                self._start_backlog()
+
+            except Exception as e:
+                logger.error(f"Error in consumer loop: {e}")
+                await asyncio.sleep(1)
+
+    def read_quotas(self, count: int) -> Dict[str, int]:
+        """How many entries to ask each stream for when ``count`` slots are free.
+
+        Busy streams split ``count`` by weight. Up to ``count`` of the rest are
+        asked for one entry each, which tells us whether they've become busy;
+        successive reads take turns over the idle streams, so a long tail of
+        quiet tenants costs a bounded number of probes per read. A read can
+        therefore return up to twice ``count``; the extra waits in the backlog.
+        """
+        streams = self.readable_streams()
+        busy = [stream for stream in streams if stream in self._busy]
+        idle = [stream for stream in streams if stream not in self._busy]
+        total = sum(self.weight(stream) for stream in busy)
+        quotas = {stream: max(1, math.ceil(count * self.weight(stream) / total)) for stream in busy}
+        if idle:
+            start = self._probe_cursor % len(idle)
+            probes = (idle[start:] + idle[:start])[:count]
+            self._probe_cursor = start + len(probes)
+            quotas.update(dict.fromkeys(probes, 1))
+        return quotas
+
+    async def _read(self, count: int) -> List[Entry]:
+        if count <= 0:
+            return []
+        quotas = self.read_quotas(count)
+        if not quotas:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, quota in quotas.items():
+                pipe.xreadgroup(EVENT_CONSUMER_GROUP, self.consumer_name, {stream: ">"}, count=quota)
+            responses = await pipe.execute(raise_on_error=False)
+
+        entries = []
+        missing = []
+        self._busy = set()
+        now = time.monotonic()
+        for (stream, quota), response in zip(quotas.items(), responses):
+            if isinstance(response, ResponseError) and "NOGROUP" in str(response):
+                # The stream was deleted (and its group with it) since we created the group.
+                missing.append(stream)
+                continue
+            if isinstance(response, Exception):
+                raise response
+            stream_entries = [entry for _stream, items in response or [] for entry in items]
+            if len(stream_entries) >= quota:
+                self._busy.add(stream)
+            if stream_entries:
+                self._last_active[stream] = now
+            entries.extend((stream, entry_id, fields) for entry_id, fields in stream_entries)
+        if missing:
+            await self.ensure_groups(missing)
+        if entries or missing:
+            return entries
+
+        # Every stream we probed is empty: wait on all of them at once for the next event.
+        response = await self.redis.xreadgroup(
+            EVENT_CONSUMER_GROUP,
+            self.consumer_name,
+            {stream: ">" for stream in self.readable_streams()},
+            count=1,
+            block=EVENT_READ_BLOCK_MS,
+        )
+        now = time.monotonic()
+        for stream, items in response or []:
+            self._busy.add(stream)
+            self._last_active[stream] = now
+            entries.extend((stream, entry_id, fields) for entry_id, fields in items)
+        return entries
+
+    async def _reclaim(self, count: int) -> List[Entry]:
+        if count <= 0:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream in self.streams:
+                pipe.xautoclaim(
+                    stream,
+                    EVENT_CONSUMER_GROUP,
+                    self.consumer_name,
+                    min_idle_time=EVENT_VISIBILITY_TIMEOUT_MS,
+                    start_id=self._reclaim_cursors.get(stream, "0-0"),
+                    count=count,
+                )
+            responses = await pipe.execute(raise_on_error=False)
+
+        entries = []
+        for stream, response in zip(self.streams, responses):
+            if isinstance(response, Exception):
+                logger.warning(f"Could not reclaim events from {stream}: {response}")
+                continue
+            self._reclaim_cursors[stream] = response[0] or "0-0"
+            # Entries trimmed from the stream come back with no fields.
+            claimed = [(entry_id, fields) for entry_id, fields in response[1] if fields]
+            if not claimed:
+                continue
+
+            pending = await self.redis.xpending_range(
+                stream,
+                EVENT_CONSUMER_GROUP,
+                min=claimed[0][0],
+                max=claimed[-1][0],
+                count=len(claimed) + len(self._inflight),
+                consumername=self.consumer_name,
+            )
+            deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+            for entry_id, fields in claimed:
+                times_delivered = deliveries.get(entry_id, 0)
+                if times_delivered > EVENT_MAX_DELIVERIES:
+                    await self._dead_letter((stream, entry_id), fields, f"exceeded {EVENT_MAX_DELIVERIES} deliveries")
+                else:
+                    logger.warning(f"Reclaimed event {entry_id} from {stream} (delivery {times_delivered})")
+                    entries.append((stream, entry_id, fields))
+        return entries
+
+    async def _dispatch(self, stream: str, entry_id: str, fields: Dict[str, str]):
+        key = (stream, entry_id)
         try:
-            # BLPOP blocks until an item is available
-            # Returns (key, element) tuple
-            item = await redis.blpop(EVENT_QUEUE_KEY, timeout=5)
-            
-            if item:
-                key, message_str = item
-                message = json.loads(message_str)
-                logger.info(f"Received event: {message}")
-                
-                if message.get("event") == "RunStarted":
-                    run_id = message["payload"]["run_id"]
-                    executor = WorkflowExecutor(run_id)
-                    # Run execution in background task to not block consumer loop strictly? 
-                    # For now, let's await it to keep it simple and safe (sequential processing per worker)
-                    # Or create a task: asyncio.create_task(executor.execute())
-                    await executor.execute()
-                    
-        except Exception as e:
-            logger.error(f"Error in consumer loop: {e}")
-            await asyncio.sleep(1)
+            message = decode_event(fields)
+        except ValueError as e:
+            await self._dead_letter(key, fields, f"undecodable payload: {e}")
+            return
+        logger.debug(f"Received event {entry_id} from {stream}: {message['event']}")
+
+        if message["event"] != "RunStarted":
+            await self._ack(key)
+            return
+
+        payload = message["payload"]
+        run_id = payload["run_id"]
+        # Stream ids start with the millisecond the entry was added.
+        enqueued_at = int(entry_id.split("-", 1)[0]) / 1000
+        executor = WorkflowExecutor(run_id, enqueued_at=enqueued_at, trace_context=payload.get("trace"))
+        self._inflight[key] = fields
+        self._backlog.push(stream, Job(
+            run_id=run_id,
+            factory=executor.execute,
+            workflow_id=payload.get("workflow_id"),
+            tenant_id=payload.get("tenant_id"),
+            item=key,
+            on_done=self._on_job_done,
+            on_exit=self._on_job_exit,
+        ), self.weight(stream))
+
+    def readable_streams(self) -> List[str]:
+        return [stream for stream in self.streams if stream not in self._held]
 
+    def _start_backlog(self):
+        """Hands runs to the scheduler in fair order while it has room for them.
+
+        A run the scheduler can't start or park (its tenant or workflow already
+        has a full set parked) is held here, unacked, behind the held runs of
+        its stream.
+        """
+        for stream, jobs in list(self._held.items()):
+            while jobs and self.scheduler.free_slots() > 0 and self.scheduler.can_accept(jobs[0]):
+                self._submit(jobs.popleft())
+            if not jobs:
+                del self._held[stream]
+        while self._backlog and self.scheduler.free_slots() > 0:
+            job = self._backlog.pop()
+            stream = job.item[0]
+            if stream in self._held or not self.scheduler.can_accept(job):
+                self._held.setdefault(stream, deque()).append(job)
+            else:
+                self._submit(job)
+
+    def _submit(self, job: Job):
+        if not self.scheduler.submit(job):
+            logger.info(f"Run {job.run_id} parked: tenant/workflow concurrency cap reached")
+
+    async def _on_job_done(self, job: Job):
+        await self._ack(job.item)
+
+    def _on_job_exit(self, job: Job):
+        # A run that raised or was cancelled (e.g. its lease was lost) stays
+        # pending unacked; we just stop extending it so XAUTOCLAIM redelivers it
+        # and the delivery limit eventually dead-letters it.
+        self._inflight.pop(job.item, None)
+
+    async def _ack(self, key: EntryKey):
+        stream, entry_id = key
+        self._inflight.pop(key, None)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.xack(stream, EVENT_CONSUMER_GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+    async def _dead_letter(self, key: EntryKey, fields: Dict[str, str], reason: str):
+        stream, entry_id = key
+        logger.error(f"Moving event {entry_id} from {stream} to {EVENT_DEAD_LETTER_KEY}: {reason}")
+        self._inflight.pop(key, None)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                EVENT_DEAD_LETTER_KEY,
+                {**fields, "stream": stream, "original_id": entry_id, "reason": reason},
+                maxlen=EVENT_STREAM_MAXLEN,
+                approximate=True,
+            )
+            pipe.xack(stream, EVENT_CONSUMER_GROUP, entry_id)
+            pipe.xdel(stream, entry_id)
+            await pipe.execute()
+
+    async def _extend_visibility(self):
+        # XCLAIM to ourselves with JUSTID resets the idle time without bumping
+        # the delivery counter, so long runs aren't reclaimed by other workers.
+        if not self._inflight:
+            return
+        by_stream: Dict[str, List[str]] = {}
+        for stream, entry_id in self._inflight:
+            by_stream.setdefault(stream, []).append(entry_id)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for stream, entry_ids in by_stream.items():
+                pipe.xclaim(
+                    stream,
+                    EVENT_CONSUMER_GROUP,
+                    self.consumer_name,
+                    min_idle_time=0,
+                    message_ids=entry_ids,
+                    justid=True,
+                )
+            await pipe.execute()
+
+    async def drain(self):
+        logger.info(f"Shutting down, draining {self.scheduler.running} running run(s)...")
+        unstarted = await self.scheduler.drain() + self._backlog.drain()
+        for jobs in self._held.values():
+            unstarted.extend(jobs)
+        self._held.clear()
+        if not unstarted:
+            return
+        # Re-publish parked, held and backlogged runs so another worker picks them up
+        # immediately instead of waiting for the visibility timeout.
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for job in unstarted:
+                stream, entry_id = job.item
+                fields = self._inflight.pop(job.item)
+                pipe.xadd(stream, fields, maxlen=EVENT_STREAM_MAXLEN, approximate=True)
+                pipe.xack(stream, EVENT_CONSUMER_GROUP, entry_id)
+                pipe.xdel(stream, entry_id)
+            await pipe.execute()
+        logger.info(f"Returned {len(unstarted)} unstarted run(s) to their streams")
+
+
+async def consume_events(stop_event: Optional[asyncio.Event] = None, scheduler: Optional[TaskScheduler] = None):
+    redis = await get_redis()
+    stop_event = stop_event or asyncio.Event()
+    scheduler = scheduler or TaskScheduler()
+    consumer = StreamConsumer(redis, scheduler)
+    logger.info(
+        f"Worker {consumer.consumer_name} started. Reading {EVENT_STREAM_KEY} and its per-tenant streams as group "
+        f"{EVENT_CONSUMER_GROUP} with concurrency {scheduler.max_concurrency}..."
+    )
+    try:
+        await consumer.run(stop_event)
+    finally:
+        await consumer.drain()
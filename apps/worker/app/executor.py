@@ -1,40 +1,85 @@
 import asyncio
-import httpx
-import json
 import logging
+import time
 import traceback
 from datetime import datetime
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.api.app.db.session import AsyncSessionLocal
-from apps.api.app.db.models import Run, Workflow, RunSnapshot
-from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.db.models import Run
+from apps.api.app.cache.run_state import TERMINAL_STATUSES, run_state_store
+from apps.api.app import tracing
+from apps.worker.app.blobs import blob_store, load, offload
+from apps.worker.app.definition_cache import definition_cache
+from apps.worker.app.http_steps import execute_http_step
+from apps.worker.app.leases import Lease, run_lease_key
+from apps.worker.app.mcp.client import mcp_clients
+from apps.worker.app.metrics import QUEUE_WAIT, RUN_DURATION, RUNS_IN_FLIGHT, STEP_DURATION
+from apps.worker.app.progress import progress_writer
+from apps.worker.app.retry import call_with_retry
+from apps.worker.app.snapshots import SnapshotWriter, load_latest_snapshot, project
+from apps.worker.app.step_cache import step_cache
 from shared.shared.schemas.workflow import WorkflowDefinition, Step
+from shared.shared.templating import StepTemplate
 
 logger = logging.getLogger(__name__)
 
+class StepFailed(Exception):
+    def __init__(self, index: int, error: Exception):
+        super().__init__(f"Step {index} failed: {error}")
+        self.index = index
+        self.error = error
+
 class WorkflowExecutor:
-    def __init__(self, run_id: str):
+    def __init__(self, run_id: str, enqueued_at: Optional[float] = None, trace_context: Optional[dict] = None):
         self.run_id = run_id
-        self.redis = None
+        self.enqueued_at = enqueued_at
+        self.trace_context = trace_context
+        self.status: Optional[str] = None
+        self.state_store = run_state_store
         self.db = None
+        self.snapshots = SnapshotWriter(run_id)
+        self.blobs = blob_store
+        self.run_input = None
+        self.templates: Dict[int, StepTemplate] = {}
+        # Steps of a DAG run concurrently but share one AsyncSession.
+        self._db_lock = asyncio.Lock()
 
     async def execute(self):
-        self.redis = await get_redis()
-        async with AsyncSessionLocal() as session:
-            self.db = session
-            try:
-                await self._run_workflow()
-            except Exception as e:
-                logger.error(f"Error executing run {self.run_id}: {e}")
-                traceback.print_exc()
-                await self._fail_run(str(e))
+        # The lease keeps a redelivered or re-enqueued event from running the
+        # same run on two workers at once.
+        lease = Lease(run_lease_key(self.run_id))
+        if not await lease.acquire():
+            logger.info(f"Run {self.run_id} is leased by another worker, skipping")
+            return
+        if self.enqueued_at is not None:
+            QUEUE_WAIT.observe(max(0.0, time.time() - self.enqueued_at))
+        started = time.perf_counter()
+        try:
+            with RUNS_IN_FLIGHT.track_inprogress(), tracing.span("run.execute", self.trace_context, run_id=self.run_id):
+                async with lease.keep_alive():
+                    async with AsyncSessionLocal() as session:
+                        self.db = session
+                        try:
+                            await self._run_workflow()
+                        except Exception as e:
+                            logger.error(f"Error executing run {self.run_id}: {e}")
+                            traceback.print_exc()
+                            # A run already recorded as succeeded stays succeeded.
+                            if self.status != "SUCCEEDED":
+                                await self._fail_run(str(e))
+        finally:
+            await lease.release()
+            # Runs skipped as missing or already finished have no status and aren't timed.
+            if self.status:
+                RUN_DURATION.labels(self.status).observe(time.perf_counter() - started)
 
     async def _run_workflow(self):
-        # Load Run and Workflow from DB
+        # Load Run from DB; the parsed definition usually comes from the in-process cache
         stmt = select(Run).where(Run.id == UUID(self.run_id))
         result = await self.db.execute(stmt)
         run = result.scalar_one_or_none()
@@ -43,105 +88,205 @@ class WorkflowExecutor:
             logger.error(f"Run {self.run_id} not found")
             return
 
-        workflow_stmt = select(Workflow).where(Workflow.id == run.workflow_id)
-        wf_result = await self.db.execute(workflow_stmt)
-        workflow = wf_result.scalar_one_or_none()
+        if run.status in TERMINAL_STATUSES:
+            logger.info(f"Run {self.run_id} is already {run.status}, skipping")
+            return
+
+        compiled = await definition_cache.load(self.db, run.workflow_id)
         
-        if not workflow:
+        if not compiled:
             logger.error(f"Workflow {run.workflow_id} not found")
             return
 
-        definition = WorkflowDefinition(**workflow.definition_json)
-        
-        # Update status to RUNNING
-        run.status = "RUNNING"
-        run.started_at = datetime.utcnow()
+        definition = compiled.definition
+        self.run_input = run.input_json
+        self.templates = compiled.templates
+        context = await self._restore_context(run, definition)
+        # End the read transaction so the pooled connection isn't held while steps run.
         await self.db.commit()
-        await self._update_redis_state("RUNNING")
+        
+        # Update status to RUNNING; progress is written to Postgres in batches
+        started_at = run.started_at or datetime.utcnow()
+        progress_writer.record(self.run_id, status="RUNNING", started_at=started_at)
+        await self.state_store.update(
+            self.run_id, status="RUNNING", started_at=started_at,
+            event="run_status", event_data={"status": "RUNNING", "terminal": False},
+        )
+
+        try:
+            if compiled.is_dag:
+                await self._run_dag(run, definition, context, compiled.dependencies)
+            else:
+                await self._run_sequential(run, definition, context)
+        except StepFailed as e:
+            logger.error(f"Step {e.index} failed: {e.error}")
+            await self._fail_run(f"Step {e.index} failed: {str(e.error)}")
+            return
+
+        # Mark SUCCEEDED
+        self.status = "SUCCEEDED"
+        finished_at = datetime.utcnow()
+        await progress_writer.record_terminal(self.run_id, "SUCCEEDED", finished_at=finished_at)
+        await self.state_store.update(
+            self.run_id, status="SUCCEEDED", finished_at=finished_at,
+            event="run_status", event_data={"status": "SUCCEEDED", "terminal": True},
+        )
+        logger.info(f"Run {self.run_id} succeeded")
+
+    async def _restore_context(self, run: Run, definition: WorkflowDefinition) -> dict:
+        """Rebuilds the context of an interrupted run from its latest snapshot and step results.
+
+        Step results in Redis are the most complete record; the snapshot covers
+        steps whose results have already expired there.
+        """
+        results = await self.state_store.get_step_results(self.run_id, range(len(definition.steps)))
+        if not results and run.status in ("QUEUED", "SCHEDULED"):
+            return {}
 
         context = {}
-        
+        snapshot = await load_latest_snapshot(self.db, self.run_id)
+        if snapshot:
+            context.update(snapshot[1])
+        for index, result in results.items():
+            context[f"step_{index}"] = result
+        if context:
+            logger.info(f"Resuming run {self.run_id} with {len(context)} completed step(s)")
+        return context
+
+    async def _run_sequential(self, run: Run, definition: WorkflowDefinition, context: dict):
         for index, step in enumerate(definition.steps):
-            # Skip if already executed (in case of resume logic, though simple loop for now)
-            if index < run.current_step_index:
+            # Steps restored from a previous attempt already have their result in the context.
+            if f"step_{index}" in context:
                 continue
 
-            run.current_step_index = index
-            await self.db.commit()
-            
-            logger.info(f"Executing step {index}: {step.type}")
-            
+            progress_writer.record(self.run_id, current_step_index=index)
+
+            await self._run_step(index, step, context, current_step_index=index)
+
+    async def _run_dag(self, run: Run, definition: WorkflowDefinition, context: dict, dependencies: List[List[int]] = None):
+        """Runs steps as soon as their dependencies finish, at most max_parallelism at a time."""
+        if dependencies is None:
+            dependencies = definition.dependency_indices()
+        done = {index for index in range(len(dependencies)) if f"step_{index}" in context}
+        waiting_on = {index: set(deps) - done for index, deps in enumerate(dependencies) if index not in done}
+        dependents: Dict[int, List[int]] = {index: [] for index in range(len(dependencies))}
+        for index, deps in enumerate(dependencies):
+            for dep in deps:
+                dependents[dep].append(index)
+
+        ready = [index for index, deps in waiting_on.items() if not deps]
+        running: Dict[asyncio.Task, int] = {}
+        completed = len(done)
+
+        try:
+            while ready or running:
+                while ready and len(running) < definition.max_parallelism:
+                    index = ready.pop(0)
+                    task = asyncio.create_task(self._run_step(index, definition.steps[index], context))
+                    running[task] = index
+
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    index = running.pop(task)
+                    error = task.exception()
+                    if error is not None:
+                        raise error
+
+                    completed += 1
+                    for dependent in dependents[index]:
+                        if dependent not in waiting_on:
+                            continue
+                        waiting_on[dependent].discard(index)
+                        if not waiting_on[dependent]:
+                            ready.append(dependent)
+
+                progress_writer.record(self.run_id, current_step_index=completed)
+                await self.state_store.update(self.run_id, current_step_index=completed)
+        finally:
+            # A failed step (or cancellation of the run) stops its siblings.
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+    async def _run_step(self, index: int, step: Step, context: dict, **state_fields):
+        logger.info(f"Executing step {index}: {step.type}")
+        started = time.perf_counter()
+        outcome = "error"
+        with tracing.span(f"step.{step.type}", run_id=self.run_id, step_index=index):
+            await self.state_store.update(
+                self.run_id, event="step_started", event_data={"step_index": index, "step_type": step.type}, **state_fields
+            )
+
             try:
-                result = await self._execute_step(step, context)
+                template = self.templates.get(index)
+                if template is not None:
+                    # Rendered before the cache lookup, so the key covers the actual inputs.
+                    step = template.render(step, await self._template_scope(template, context))
+
+                async def produce():
+                    result = await call_with_retry(
+                        lambda: self._execute_step(step, context), step.retry, f"Run {self.run_id} step {index}"
+                    )
+                    # Large outputs are kept in the blob store; the context, Redis and
+                    # snapshots only carry a reference to them.
+                    return await offload(result, self.blobs)
+
+                if getattr(step, "cache", None):
+                    result = await step_cache.get_or_run(step, produce)
+                else:
+                    result = await produce()
                 context[f"step_{index}"] = {"type": step.type, "result": result}
-                
+                await self.state_store.set_step_result(self.run_id, index, step.type, result)
+
                 # Persist snapshot if needed
                 if step.type == "persist_snapshot":
-                    await self._save_snapshot(index, context)
+                    await self._save_snapshot(index, step, context)
+                outcome = "ok"
 
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
             except Exception as e:
-                logger.error(f"Step {index} failed: {e}")
-                await self._fail_run(f"Step {index} failed: {str(e)}")
-                return
+                raise StepFailed(index, e) from e
+            finally:
+                STEP_DURATION.labels(step.type, outcome).observe(time.perf_counter() - started)
 
-        # Mark SUCCEEDED
-        run.status = "SUCCEEDED"
-        run.finished_at = datetime.utcnow()
-        await self.db.commit()
-        await self._update_redis_state("SUCCEEDED", context)
-        logger.info(f"Run {self.run_id} succeeded")
+    async def step_result(self, context: dict, index: int):
+        """Returns a finished step's result, loading it from the blob store if it was offloaded."""
+        return await load(context[f"step_{index}"]["result"], self.blobs)
+
+    async def _template_scope(self, template: StepTemplate, context: dict) -> dict:
+        steps = {}
+        for ref in template.step_refs:
+            entry = context[f"step_{ref}"]
+            steps[ref] = {**entry, "result": await self.step_result(context, ref)}
+        return {"input": self.run_input, "steps": steps}
 
     async def _execute_step(self, step: Step, context: dict):
         if step.type == "http":
-            async with httpx.AsyncClient() as client:
-                response = await client.request(
-                    method=step.method,
-                    url=step.url,
-                    headers=step.headers,
-                    json=step.json_body,
-                    timeout=step.timeout_seconds
-                )
-                response.raise_for_status()
-                return response.json()
+            return await execute_http_step(step, self.blobs)
         
         elif step.type == "mcp_tool":
-            # Stub for MCP tool
-            return {"status": "mock_success", "tool": step.tool_name, "output": "Mock output"}
+            return await mcp_clients.call_tool(step.tool_name, step.input, server=step.server, timeout=step.timeout_seconds)
         
         elif step.type == "persist_snapshot":
             return {"status": "snapshot_taken"}
             
         return {}
 
-    async def _save_snapshot(self, index: int, context: dict):
-        snapshot = RunSnapshot(
-            run_id=UUID(self.run_id),
-            step_index=index,
-            snapshot_json=context
-        )
-        self.db.add(snapshot)
-        await self.db.commit()
+    async def _save_snapshot(self, index: int, step: Step, context: dict):
+        state = project(context, step.include_keys)
+        async with self._db_lock:
+            await self.snapshots.save(self.db, index, state)
 
     async def _fail_run(self, error_msg: str):
-        stmt = select(Run).where(Run.id == UUID(self.run_id))
-        result = await self.db.execute(stmt)
-        run = result.scalar_one_or_none()
-        if run:
-            run.status = "FAILED"
-            run.error_message = error_msg
-            run.finished_at = datetime.utcnow()
-            await self.db.commit()
-        await self._update_redis_state("FAILED", error=error_msg)
-
-    async def _update_redis_state(self, status: str, context: dict = None, error: str = None):
-        key = f"run:{self.run_id}:state"
-        current_state = await self.redis.get(key)
-        if current_state:
-            state = json.loads(current_state)
-            state["status"] = status
-            state["last_updated_at"] = str(datetime.utcnow())
-            if context:
-                state["context"] = context
-            if error:
-                state["error"] = error
-            await self.redis.set(key, json.dumps(state), ex=86400)
+        self.status = "FAILED"
+        finished_at = datetime.utcnow()
+        await progress_writer.record_terminal(
+            self.run_id, "FAILED", error_message=error_msg, finished_at=finished_at
+        )
+        await self.state_store.update(
+            self.run_id, status="FAILED", error=error_msg, finished_at=finished_at,
+            event="run_status", event_data={"status": "FAILED", "terminal": True, "error": error_msg},
+        )
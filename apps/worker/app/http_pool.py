@@ -0,0 +1,140 @@
+import importlib.util
+import logging
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_POOL_MAX_KEEPALIVE_PER_HOST = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE_PER_HOST", "10"))
+HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS", "30"))
+HTTP_POOL_MAX_HOSTS = int(os.getenv("HTTP_POOL_MAX_HOSTS", "256"))
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "false").lower() in ("1", "true", "yes")
+
+Origin = Tuple[str, str, int]
+
+# httpcore emits this trace event only when it has to open a new TCP connection,
+# so its absence means the request reused a pooled (or multiplexed) connection.
+_NEW_CONNECTION_EVENT = "connection.connect_tcp.started"
+
+
+class HTTPClientPool:
+    """Worker-wide keep-alive HTTP clients, one per origin.
+
+    Each origin gets its own ``httpx.AsyncClient`` so the connection limits
+    apply per host. Once ``max_hosts`` origins are tracked, further origins
+    share a single overflow client with the same limits.
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = HTTP_POOL_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_per_host: int = HTTP_POOL_MAX_KEEPALIVE_PER_HOST,
+        keepalive_expiry: float = HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS,
+        max_hosts: int = HTTP_POOL_MAX_HOSTS,
+        http2: bool = HTTP_POOL_HTTP2,
+    ):
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP_POOL_HTTP2 is enabled but the 'h2' package is not installed; using HTTP/1.1")
+            http2 = False
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.max_hosts = max_hosts
+        self.http2 = http2
+        self._clients: Dict[Origin, httpx.AsyncClient] = {}
+        self._overflow: Optional[httpx.AsyncClient] = None
+        self._hits: Dict[str, int] = defaultdict(int)
+        self._misses: Dict[str, int] = defaultdict(int)
+
+    async def start(self):
+        logger.info(
+            f"HTTP pool ready: {self.limits.max_connections} connections/host, "
+            f"keep-alive {self.limits.keepalive_expiry}s, http2={self.http2}"
+        )
+
+    async def close(self):
+        clients = list(self._clients.values())
+        if self._overflow:
+            clients.append(self._overflow)
+        self._clients.clear()
+        self._overflow = None
+        for client in clients:
+            await client.aclose()
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(limits=self.limits, http2=self.http2)
+
+    def client_for(self, url: httpx.URL) -> httpx.AsyncClient:
+        origin = (url.scheme, url.host, url.port or (443 if url.scheme == "https" else 80))
+        client = self._clients.get(origin)
+        if client is not None:
+            return client
+        if len(self._clients) < self.max_hosts:
+            client = self._clients[origin] = self._new_client()
+            return client
+        if self._overflow is None:
+            logger.warning(f"HTTP pool tracks {self.max_hosts} hosts; routing new hosts through the overflow client")
+            self._overflow = self._new_client()
+        return self._overflow
+
+    def _traced(self, url: httpx.URL, kwargs: dict):
+        """Adds a trace hook to the request kwargs; returns a callback that records hit or miss."""
+        new_connection = False
+
+        async def trace(event_name: str, info: dict):
+            nonlocal new_connection
+            if event_name == _NEW_CONNECTION_EVENT:
+                new_connection = True
+
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+        kwargs["extensions"] = extensions
+
+        def record():
+            if new_connection:
+                self._misses[url.host] += 1
+            else:
+                self._hits[url.host] += 1
+        return record
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        parsed = httpx.URL(url)
+        record = self._traced(parsed, kwargs)
+        try:
+            return await self.client_for(parsed).request(method, parsed, **kwargs)
+        finally:
+            record()
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Like ``request()``, but the body is read incrementally by the caller."""
+        parsed = httpx.URL(url)
+        record = self._traced(parsed, kwargs)
+        try:
+            async with self.client_for(parsed).stream(method, parsed, **kwargs) as response:
+                yield response
+        finally:
+            record()
+
+    def stats(self) -> dict:
+        hosts = set(self._hits) | set(self._misses)
+        return {
+            "hosts": len(self._clients),
+            "overflow": self._overflow is not None,
+            "hits": sum(self._hits.values()),
+            "misses": sum(self._misses.values()),
+            "per_host": {
+                host: {"hits": self._hits.get(host, 0), "misses": self._misses.get(host, 0)}
+                for host in sorted(hosts)
+            },
+        }
+
+
+http_pool = HTTPClientPool()
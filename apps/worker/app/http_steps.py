@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import time
+from typing import Any, AsyncIterator
+
+import httpx
+
+from apps.worker.app.blobs import BlobStore, make_ref
+from apps.worker.app.circuit_breaker import circuit_breakers
+from apps.worker.app.http_pool import http_pool
+from apps.worker.app.json_extract import StreamingExtractor, extract, ijson
+from apps.worker.app.metrics import HTTP_STEP_DURATION, host_label
+from apps.worker.app.rate_limit import rate_limiter
+from shared.shared.schemas.workflow import HTTPStep
+
+logger = logging.getLogger(__name__)
+
+HTTP_STEP_MAX_RESPONSE_BYTES = int(os.getenv("HTTP_STEP_MAX_RESPONSE_BYTES", str(10 * 1024 * 1024)))
+
+_warned_buffered_extract = False
+
+
+class ResponseTooLarge(Exception):
+    def __init__(self, url: str, limit: int):
+        super().__init__(f"Response from {url} exceeds {limit} bytes")
+        self.url = url
+        self.limit = limit
+
+
+async def _capped(response: httpx.Response, limit: int) -> AsyncIterator[bytes]:
+    """Yields the (decoded) body in chunks, failing as soon as it grows past ``limit``."""
+    declared = response.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > limit:
+        raise ResponseTooLarge(str(response.request.url), limit)
+    received = 0
+    async for chunk in response.aiter_bytes():
+        received += len(chunk)
+        if received > limit:
+            raise ResponseTooLarge(str(response.request.url), limit)
+        yield chunk
+
+
+async def execute_http_step(step: HTTPStep, blobs: BlobStore) -> Any:
+    """Runs an HTTP step through the host's circuit breaker and rate limiter.
+
+    Server errors (5xx) and connection failures count against the circuit;
+    anything else means the host answered.
+    """
+    host = httpx.URL(step.url).host
+    breaker = circuit_breakers.get(host)
+    probe = breaker.before_request()
+    try:
+        await rate_limiter.acquire(host)
+    except BaseException:
+        # Never sent: give up a half-open probe slot so the next request can probe.
+        breaker.abandon(probe)
+        raise
+
+    success = None
+    outcome = "cancelled"
+    started = time.perf_counter()
+    try:
+        result = await _read_response(step, blobs)
+        success, outcome = True, "ok"
+        return result
+    except httpx.HTTPStatusError as e:
+        success = e.response.status_code < 500
+        outcome = f"{e.response.status_code // 100}xx"
+        raise
+    except httpx.TransportError:
+        success, outcome = False, "transport_error"
+        raise
+    except Exception:
+        success, outcome = True, "error"
+        raise
+    finally:
+        # Time waiting on the rate limiter is excluded; this is the host's own latency.
+        HTTP_STEP_DURATION.labels(host_label(host), outcome).observe(time.perf_counter() - started)
+        if success is None:
+            breaker.abandon(probe)
+        else:
+            breaker.record(success, probe)
+
+
+def _warn_buffered_extract():
+    global _warned_buffered_extract
+    if not _warned_buffered_extract:
+        _warned_buffered_extract = True
+        logger.warning(
+            "HTTP steps use 'extract' but the 'ijson' package is not installed; "
+            "whole responses (up to max_response_bytes) are buffered before extracting"
+        )
+
+
+async def _read_response(step: HTTPStep, blobs: BlobStore) -> Any:
+    """Sends the request and reads the body as a stream bounded by the step's size limit.
+
+    Only what the step keeps is ever held in memory: the extracted fields, the
+    parsed body, or (in raw mode) nothing at all, since the bytes go straight
+    to the blob store.
+    """
+    limit = step.max_response_bytes or HTTP_STEP_MAX_RESPONSE_BYTES
+    async with http_pool.stream(
+        step.method,
+        step.url,
+        headers=step.headers,
+        json=step.json_body,
+        timeout=step.timeout_seconds,
+    ) as response:
+        response.raise_for_status()
+        body = _capped(response, limit)
+
+        if step.response_mode == "raw":
+            digest, size = await blobs.put_stream(body)
+            media_type = response.headers.get("content-type", "application/octet-stream").split(";")[0]
+            return make_ref(digest, size, media_type)
+
+        if step.extract and ijson is not None:
+            extractor = StreamingExtractor(step.extract)
+            async for chunk in body:
+                extractor.feed(chunk)
+                if extractor.done:
+                    # Everything we need has been seen; drop the rest of the body.
+                    break
+            await body.aclose()
+            return extractor.close()
+        if step.extract:
+            _warn_buffered_extract()
+
+        data = b"".join([chunk async for chunk in body])
+        document = json.loads(data)
+        return extract(document, step.extract) if step.extract else document
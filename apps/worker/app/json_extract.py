@@ -0,0 +1,145 @@
+import re
+from typing import Any, Dict, List, Tuple, Union
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+PathPart = Union[str, int]
+Path = Tuple[PathPart, ...]
+
+_PATH_TOKEN = re.compile(r"\.?([^.\[\]]+)|\[(\d+)\]")
+
+
+def parse_path(path: str) -> Path:
+    """Parses ``$.data.items[0].id`` (the leading ``$.`` is optional) into ``("data", "items", 0, "id")``."""
+    path = path.strip()
+    if path.startswith("$"):
+        path = path[1:]
+    parts: List[PathPart] = []
+    position = 0
+    while position < len(path):
+        match = _PATH_TOKEN.match(path, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Invalid field path: {path!r}")
+        key, index = match.groups()
+        parts.append(int(index) if index is not None else key)
+        position = match.end()
+    if not parts:
+        raise ValueError("Field path must not be empty")
+    return tuple(parts)
+
+
+def extract(document: Any, paths: Dict[str, str]) -> Dict[str, Any]:
+    """Picks the given paths out of an already-parsed document; missing paths are None."""
+    results = {}
+    for name, path in paths.items():
+        value = document
+        for part in parse_path(path):
+            try:
+                value = value[part]
+            except (KeyError, IndexError, TypeError):
+                value = None
+                break
+        results[name] = value
+    return results
+
+
+class StreamingExtractor:
+    """Extracts fields from a JSON document fed in chunks, keeping only the matched values.
+
+    Needs the optional ``ijson`` package. Everything outside the requested
+    paths is parsed and discarded without being materialised; ``done`` turns
+    True once every path has been seen, so the caller can stop reading early.
+    """
+
+    def __init__(self, paths: Dict[str, str]):
+        if ijson is None:
+            raise RuntimeError("Streaming extraction requires the ijson package")
+        self.targets: Dict[Path, str] = {parse_path(path): name for name, path in paths.items()}
+        self.prefixes = {target[:length] for target in self.targets for length in range(len(target))}
+        self.results: Dict[str, Any] = {name: None for name in paths}
+        self._captured = set()
+        self._events = ijson.sendable_list()
+        self._parser = ijson.basic_parse_coro(self._events, use_float=True)
+        # One frame per open container: [key or index, is_array].
+        self._frames: List[list] = []
+        self._skip_depth = 0
+        # [name, ObjectBuilder, depth] for each matched container being built.
+        self._building: List[list] = []
+
+    @property
+    def done(self) -> bool:
+        return len(self._captured) == len(self.targets)
+
+    def feed(self, chunk: bytes):
+        self._parser.send(chunk)
+        for event, value in self._events:
+            self._on_event(event, value)
+            if self.done:
+                break
+        del self._events[:]
+
+    def close(self) -> Dict[str, Any]:
+        if not self.done:
+            self._parser.close()
+            for event, value in self._events:
+                self._on_event(event, value)
+            del self._events[:]
+        return self.results
+
+    def _on_event(self, event: str, value: Any):
+        # Matched containers are built from their own events, independently of
+        # the traversal below (a target may sit inside another target).
+        for capture in list(self._building):
+            name, builder = capture[0], capture[1]
+            builder.event(event, value)
+            if event in ("start_map", "start_array"):
+                capture[2] += 1
+            elif event in ("end_map", "end_array"):
+                capture[2] -= 1
+                if capture[2] == 0:
+                    self._building.remove(capture)
+                    self._capture(name, builder.value)
+
+        if self._skip_depth:
+            if event in ("start_map", "start_array"):
+                self._skip_depth += 1
+            elif event in ("end_map", "end_array"):
+                self._skip_depth -= 1
+            return
+
+        if event == "map_key":
+            self._frames[-1][0] = value
+            return
+        if event in ("end_map", "end_array"):
+            self._frames.pop()
+            return
+
+        # Any other event starts a value; work out where it sits.
+        if self._frames and self._frames[-1][1]:
+            self._frames[-1][0] += 1
+        path = tuple(frame[0] for frame in self._frames)
+
+        name = self.targets.get(path)
+        if event in ("start_map", "start_array"):
+            if name is not None:
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                self._building.append([name, builder, 1])
+            self._enter(path, [-1, True] if event == "start_array" else [None, False])
+        elif name is not None:
+            self._capture(name, value)
+
+    def _enter(self, path: Path, frame: list):
+        if path in self.prefixes:
+            self._frames.append(frame)
+        else:
+            self._skip_depth = 1
+
+    def _capture(self, name: str, value: Any):
+        # Only the first occurrence counts if a key is repeated.
+        if name not in self._captured:
+            self._captured.add(name)
+            self.results[name] = value
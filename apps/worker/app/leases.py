@@ -0,0 +1,94 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from apps.api.app.cache.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = os.getenv("WORKER_ID", f"{socket.gethostname()}-{os.getpid()}")
+RUN_LEASE_TTL_MS = int(os.getenv("RUN_LEASE_TTL_MS", "30000"))
+
+# Renew/release only while we still own the key, so a lease that expired and
+# was taken over by another worker is never extended or deleted by us.
+_RENEW_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def run_lease_key(run_id) -> str:
+    return f"run:{run_id}:lease"
+
+
+class Lease:
+    """A Redis key held by one owner for ``ttl_ms`` and kept alive by heartbeats.
+
+    Used for per-run execution leases and for electing the reaper leader.
+    """
+
+    def __init__(self, key: str, ttl_ms: int = RUN_LEASE_TTL_MS, owner: Optional[str] = None):
+        self.key = key
+        self.ttl_ms = ttl_ms
+        # Unique per holder, so two executors in one process never share a lease.
+        self.token = owner or f"{WORKER_ID}:{uuid.uuid4().hex[:8]}"
+        self.held = False
+
+    async def acquire(self) -> bool:
+        redis = await get_redis()
+        self.held = bool(await redis.set(self.key, self.token, nx=True, px=self.ttl_ms))
+        return self.held
+
+    async def renew(self) -> bool:
+        redis = await get_redis()
+        self.held = bool(await redis.eval(_RENEW_IF_OWNER, 1, self.key, self.token, self.ttl_ms))
+        return self.held
+
+    async def release(self):
+        if not self.held:
+            return
+        self.held = False
+        redis = await get_redis()
+        await redis.eval(_RELEASE_IF_OWNER, 1, self.key, self.token)
+
+    @asynccontextmanager
+    async def keep_alive(self) -> AsyncIterator[None]:
+        """Renews the lease every ttl/3 while the block runs.
+
+        If the lease is lost (Redis unreachable for longer than the TTL, or the
+        key was taken over), the task running the block is cancelled rather
+        than left running alongside the new owner.
+        """
+        owner_task = asyncio.current_task()
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(self.ttl_ms / 3000)
+                try:
+                    renewed = await self.renew()
+                except Exception as e:
+                    logger.warning(f"Lease {self.key} heartbeat failed: {e}")
+                    continue
+                if not renewed:
+                    logger.error(f"Lost lease {self.key}, stopping")
+                    owner_task.cancel()
+                    return
+
+        task = asyncio.create_task(heartbeat())
+        try:
+            yield
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
@@ -1,7 +1,19 @@
 import asyncio
 import logging
+import signal
 import sys
 from apps.worker.app.events.consumer import consume_events
+from apps.api.app.cache.redis_client import redis_client, get_redis
+from apps.worker.app.definition_cache import definition_cache
+from apps.api.app.db.session import dispose_engines, pool_stats, use_profile
+from apps.api.app.metrics import component_stats
+from apps.worker.app.http_pool import http_pool
+from apps.worker.app.mcp.client import mcp_clients
+from apps.worker.app.metrics import sample_queue, start_metrics_server
+from apps.worker.app.progress import progress_writer
+from apps.worker.app.reaper import run_reaper
+from apps.worker.app.scheduler import run_scheduler
+from apps.worker.app.step_cache import step_cache
 
 # Configure logging
 logging.basicConfig(
@@ -9,9 +21,57 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[logging.StreamHandler(sys.stdout)]
 )
+logger = logging.getLogger(__name__)
+
+async def main():
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    use_profile("worker")
+    await http_pool.start()
+    component_stats.register("db_pool", pool_stats)
+    component_stats.register("http_pool", http_pool.stats)
+    component_stats.register("definition_cache", definition_cache.stats)
+    component_stats.register("progress", progress_writer.stats)
+    component_stats.register("reaper", run_reaper.stats)
+    component_stats.register("scheduler", run_scheduler.stats)
+    component_stats.register("step_cache", step_cache.stats)
+    component_stats.register("mcp", mcp_clients.stats, label="server")
+    start_metrics_server()
+    queue_sampler = asyncio.create_task(sample_queue(stop_event))
+    invalidation_listener = asyncio.create_task(definition_cache.listen(await get_redis(), stop_event))
+    reaper = asyncio.create_task(run_reaper.run(stop_event))
+    scheduler = asyncio.create_task(run_scheduler.run(stop_event))
+    # The progress writer must outlive the consumer drain so that runs
+    # finishing during shutdown still get their final flush.
+    writer_stop = asyncio.Event()
+    writer = asyncio.create_task(progress_writer.run(writer_stop))
+    try:
+        await consume_events(stop_event)
+    finally:
+        # consume_events may have raised rather than returned on a stop signal.
+        stop_event.set()
+        await invalidation_listener
+        await reaper
+        await scheduler
+        await queue_sampler
+        writer_stop.set()
+        await writer
+        await progress_writer.flush()
+        logger.info(f"HTTP pool stats: {http_pool.stats()}")
+        logger.info(f"Definition cache stats: {definition_cache.stats()}")
+        logger.info(f"Reaper stats: {run_reaper.stats()}")
+        logger.info(f"Scheduler stats: {run_scheduler.stats()}")
+        logger.info(f"MCP session stats: {mcp_clients.stats()}")
+        logger.info(f"Step cache stats: {step_cache.stats()}")
+        await mcp_clients.close()
+        await http_pool.close()
+        await redis_client.close()
+        await dispose_engines()
 
 if __name__ == "__main__":
     try:
-        asyncio.run(consume_events())
+        asyncio.run(main())
     except KeyboardInterrupt:
         pass
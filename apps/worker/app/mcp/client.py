@@ -0,0 +1,181 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from apps.worker.app.mcp.session import HTTPSession, MCPError, MCPSession, StdioSession
+
+logger = logging.getLogger(__name__)
+
+# Server configs as JSON, inline or in a file:
+# {"search": {"transport": "stdio", "command": ["python", "server.py"], "env": {...}},
+#  "crm": {"transport": "http", "url": "https://mcp.example.com/mcp", "headers": {...}}}
+MCP_SERVERS = os.getenv("MCP_SERVERS", "")
+MCP_SERVERS_FILE = os.getenv("MCP_SERVERS_FILE", "")
+MCP_DEFAULT_SERVER = os.getenv("MCP_DEFAULT_SERVER", "")
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+MCP_MAX_INFLIGHT_PER_SESSION = int(os.getenv("MCP_MAX_INFLIGHT_PER_SESSION", "16"))
+MCP_TOOLS_CACHE_TTL_SECONDS = float(os.getenv("MCP_TOOLS_CACHE_TTL_SECONDS", "300"))
+
+
+class MCPToolError(MCPError):
+    """The tool ran but reported failure (``isError`` in its result)."""
+
+    def __init__(self, tool_name: str, result: Dict[str, Any]):
+        text = " ".join(item.get("text", "") for item in result.get("content", []) if item.get("type") == "text")
+        super().__init__(f"Tool {tool_name} failed: {text or 'no details'}", data=result)
+
+
+def load_server_configs() -> Dict[str, dict]:
+    if MCP_SERVERS_FILE:
+        with open(MCP_SERVERS_FILE) as f:
+            return json.load(f)
+    return json.loads(MCP_SERVERS) if MCP_SERVERS else {}
+
+
+class MCPServerPool:
+    """Long-lived, initialized sessions to one MCP server, shared by all runs.
+
+    Calls go to the least busy session; a new session is only started when
+    every existing one has ``max_inflight`` calls outstanding and the pool is
+    below ``size``. Dead sessions are dropped and replaced on demand.
+    """
+
+    def __init__(self, name: str, config: dict):
+        self.name = name
+        self.config = config
+        self.size = max(1, int(config.get("pool_size", MCP_POOL_SIZE)))
+        self.max_inflight = max(1, int(config.get("max_inflight_per_session", MCP_MAX_INFLIGHT_PER_SESSION)))
+        self.tools_ttl = float(config.get("tools_cache_ttl_seconds", MCP_TOOLS_CACHE_TTL_SECONDS))
+        self._sessions: List[MCPSession] = []
+        self._open_lock = asyncio.Lock()
+        self._tools: Optional[List[dict]] = None
+        self._tools_fetched_at = 0.0
+        self.sessions_started = 0
+
+    def _new_session(self) -> MCPSession:
+        transport = self.config.get("transport", "stdio")
+        if transport == "stdio":
+            return StdioSession(
+                self.name,
+                self.config["command"],
+                env=self.config.get("env"),
+                cwd=self.config.get("cwd"),
+                on_notification=self._on_notification,
+            )
+        if transport == "http":
+            return HTTPSession(self.name, self.config["url"], headers=self.config.get("headers"), on_notification=self._on_notification)
+        raise MCPError(f"Unknown transport {transport!r} for MCP server {self.name}")
+
+    def _pick(self) -> Optional[MCPSession]:
+        self._sessions = [session for session in self._sessions if session.alive]
+        session = min(self._sessions, key=lambda s: s.inflight, default=None)
+        if session is not None and (session.inflight < self.max_inflight or len(self._sessions) >= self.size):
+            return session
+        return None
+
+    async def session(self) -> MCPSession:
+        session = self._pick()
+        if session is not None:
+            return session
+        async with self._open_lock:
+            # Another caller may have opened one while we waited.
+            session = self._pick()
+            if session is not None:
+                return session
+            session = self._new_session()
+            try:
+                await session.start()
+            except BaseException:
+                await session.close()
+                raise
+            self._sessions.append(session)
+            self.sessions_started += 1
+            logger.info(f"Started MCP session {len(self._sessions)}/{self.size} with {self.name}")
+            return session
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        session = await self.session()
+        return await session.request(method, params, timeout=timeout)
+
+    async def list_tools(self) -> List[dict]:
+        if self._tools is not None and time.monotonic() - self._tools_fetched_at < self.tools_ttl:
+            return self._tools
+        tools: List[dict] = []
+        cursor = None
+        while True:
+            result = await self.request("tools/list", {"cursor": cursor} if cursor else {})
+            tools.extend(result.get("tools", []))
+            cursor = result.get("nextCursor")
+            if not cursor:
+                break
+        self._tools, self._tools_fetched_at = tools, time.monotonic()
+        return tools
+
+    def _on_notification(self, method: str, params: Dict[str, Any]):
+        if method == "notifications/tools/list_changed":
+            self._tools = None
+
+    async def close(self):
+        sessions, self._sessions = self._sessions, []
+        await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "sessions_started": self.sessions_started,
+            "inflight": sum(session.inflight for session in self._sessions),
+            "tools_cached": self._tools is not None,
+        }
+
+
+class MCPClientManager:
+    def __init__(self, configs: Optional[Dict[str, dict]] = None, default_server: str = MCP_DEFAULT_SERVER):
+        self._configs = configs
+        self.default_server = default_server
+        self._pools: Dict[str, MCPServerPool] = {}
+
+    @property
+    def configs(self) -> Dict[str, dict]:
+        if self._configs is None:
+            self._configs = load_server_configs()
+        return self._configs
+
+    def pool(self, name: str) -> MCPServerPool:
+        pool = self._pools.get(name)
+        if pool is None:
+            if name not in self.configs:
+                raise MCPError(f"MCP server {name!r} is not configured")
+            pool = self._pools[name] = MCPServerPool(name, self.configs[name])
+        return pool
+
+    async def find_server(self, tool_name: str) -> str:
+        """Picks the server for a tool from the (cached) tool lists."""
+        if self.default_server:
+            return self.default_server
+        if len(self.configs) == 1:
+            return next(iter(self.configs))
+        for name in self.configs:
+            tools = await self.pool(name).list_tools()
+            if any(tool.get("name") == tool_name for tool in tools):
+                return name
+        raise MCPError(f"No configured MCP server provides tool {tool_name!r}")
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], server: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        pool = self.pool(server or await self.find_server(tool_name))
+        result = await pool.request("tools/call", {"name": tool_name, "arguments": arguments}, timeout=timeout)
+        if result.get("isError"):
+            raise MCPToolError(tool_name, result)
+        return result
+
+    async def close(self):
+        await asyncio.gather(*(pool.close() for pool in self._pools.values()), return_exceptions=True)
+        self._pools.clear()
+
+    def stats(self) -> dict:
+        return {name: pool.stats() for name, pool in self._pools.items()}
+
+
+mcp_clients = MCPClientManager()
@@ -0,0 +1,265 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional
+
+from apps.worker.app.http_pool import http_pool
+
+logger = logging.getLogger(__name__)
+
+MCP_PROTOCOL_VERSION = os.getenv("MCP_PROTOCOL_VERSION", "2025-03-26")
+MCP_STDIO_MAX_MESSAGE_BYTES = int(os.getenv("MCP_STDIO_MAX_MESSAGE_BYTES", str(16 * 1024 * 1024)))
+CLIENT_INFO = {"name": "workflow-orchestrator-worker", "version": "0.1.0"}
+
+METHOD_NOT_FOUND = -32601
+
+
+class MCPError(Exception):
+    def __init__(self, message: str, code: Optional[int] = None, data: Any = None):
+        super().__init__(message)
+        self.code = code
+        self.data = data
+
+
+class MCPConnectionError(MCPError):
+    """The session is gone (server exited, HTTP session expired); a new session may succeed."""
+    retryable = True
+
+
+NotificationHandler = Callable[[str, Dict[str, Any]], None]
+
+
+def _result(message: Dict[str, Any]) -> Any:
+    if "error" in message:
+        error = message["error"]
+        raise MCPError(error.get("message", "MCP error"), error.get("code"), error.get("data"))
+    return message.get("result")
+
+
+class MCPSession(ABC):
+    """One initialized MCP session. Requests carry their own JSON-RPC ids, so
+    any number of them can be in flight on the same session at once."""
+
+    def __init__(self, server: str, on_notification: Optional[NotificationHandler] = None):
+        self.server = server
+        self.on_notification = on_notification
+        self.inflight = 0
+        self.closed = False
+        self.server_info: Dict[str, Any] = {}
+        self.capabilities: Dict[str, Any] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def alive(self) -> bool:
+        return not self.closed
+
+    async def start(self):
+        await self._open()
+        result = await self.request("initialize", {
+            "protocolVersion": MCP_PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        })
+        self.server_info = result.get("serverInfo", {})
+        self.capabilities = result.get("capabilities", {})
+        await self.notify("notifications/initialized")
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        request_id = next(self._ids)
+        self.inflight += 1
+        try:
+            return await asyncio.wait_for(self._request(request_id, method, params or {}), timeout)
+        except asyncio.TimeoutError:
+            # Let the server stop working on it; the session itself stays usable.
+            try:
+                await self.notify("notifications/cancelled", {"requestId": request_id, "reason": "timeout"})
+            except Exception:
+                pass
+            raise
+        finally:
+            self.inflight -= 1
+
+    def _dispatch_notification(self, message: Dict[str, Any]):
+        if self.on_notification:
+            self.on_notification(message["method"], message.get("params") or {})
+
+    @abstractmethod
+    async def _open(self):
+        ...
+
+    @abstractmethod
+    async def _request(self, request_id: int, method: str, params: Dict[str, Any]) -> Any:
+        ...
+
+    @abstractmethod
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+
+class StdioSession(MCPSession):
+    """Talks to an MCP server subprocess over newline-delimited JSON-RPC on stdin/stdout."""
+
+    def __init__(self, server: str, command: List[str], env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None, **kwargs):
+        super().__init__(server, **kwargs)
+        self.command = command
+        self.env = env or {}
+        self.cwd = cwd
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._write_lock = asyncio.Lock()
+
+    async def _open(self):
+        self._process = await asyncio.create_subprocess_exec(
+            *self.command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env={**os.environ, **self.env},
+            cwd=self.cwd,
+            limit=MCP_STDIO_MAX_MESSAGE_BYTES,
+        )
+        self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logger.warning(f"MCP server {self.server} wrote a non-JSON line, ignoring")
+                    continue
+                await self._handle(message)
+        except Exception as e:
+            logger.error(f"MCP server {self.server} read loop failed: {e}")
+        finally:
+            self.closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(MCPConnectionError(f"MCP server {self.server} exited"))
+            self._pending.clear()
+
+    async def _handle(self, message: Dict[str, Any]):
+        if "method" not in message:
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+        elif "id" in message:
+            # Server-to-client request; we only answer pings.
+            if message["method"] == "ping":
+                await self._send({"jsonrpc": "2.0", "id": message["id"], "result": {}})
+            else:
+                await self._send({"jsonrpc": "2.0", "id": message["id"], "error": {"code": METHOD_NOT_FOUND, "message": "Method not found"}})
+        else:
+            self._dispatch_notification(message)
+
+    async def _send(self, message: Dict[str, Any]):
+        if self.closed:
+            raise MCPConnectionError(f"MCP server {self.server} is not running")
+        async with self._write_lock:
+            self._process.stdin.write(json.dumps(message).encode() + b"\n")
+            await self._process.stdin.drain()
+
+    async def _request(self, request_id: int, method: str, params: Dict[str, Any]) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._send({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+            return _result(await future)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params:
+            message["params"] = params
+        await self._send(message)
+
+    async def close(self):
+        self.closed = True
+        if self._process is None:
+            return
+        if self._process.returncode is None:
+            self._process.stdin.close()
+            try:
+                await asyncio.wait_for(self._process.wait(), 5)
+            except asyncio.TimeoutError:
+                self._process.kill()
+                await self._process.wait()
+        if self._reader:
+            await asyncio.gather(self._reader, return_exceptions=True)
+
+
+class HTTPSession(MCPSession):
+    """Streamable HTTP transport: each message is a POST; replies come back as JSON or an SSE stream."""
+
+    def __init__(self, server: str, url: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+        super().__init__(server, **kwargs)
+        self.url = url
+        self.headers = headers or {}
+        self.session_id: Optional[str] = None
+
+    async def _open(self):
+        pass
+
+    async def _post(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        headers = {
+            "Accept": "application/json, text/event-stream",
+            "Content-Type": "application/json",
+            **self.headers,
+        }
+        if self.session_id:
+            headers["Mcp-Session-Id"] = self.session_id
+        async with http_pool.stream("POST", self.url, headers=headers, content=json.dumps(message), timeout=None) as response:
+            if response.status_code == 404 and self.session_id:
+                self.closed = True
+                raise MCPConnectionError(f"MCP session with {self.server} expired")
+            if response.status_code >= 400:
+                await response.aread()
+                response.raise_for_status()
+            self.session_id = response.headers.get("mcp-session-id", self.session_id)
+            if "id" not in message or response.status_code == 202:
+                return None
+
+            if response.headers.get("content-type", "").startswith("text/event-stream"):
+                data: List[str] = []
+                async for line in response.aiter_lines():
+                    if line.startswith("data:"):
+                        data.append(line[5:].lstrip())
+                        continue
+                    if line or not data:
+                        continue
+                    event, data = json.loads("\n".join(data)), []
+                    if event.get("id") == message["id"] and "method" not in event:
+                        return event
+                    if "method" in event and "id" not in event:
+                        self._dispatch_notification(event)
+                raise MCPConnectionError(f"MCP server {self.server} closed the stream without a response")
+            return json.loads(await response.aread())
+
+    async def _request(self, request_id: int, method: str, params: Dict[str, Any]) -> Any:
+        return _result(await self._post({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}))
+
+    async def notify(self, method: str, params: Optional[Dict[str, Any]] = None):
+        message = {"jsonrpc": "2.0", "method": method}
+        if params:
+            message["params"] = params
+        await self._post(message)
+
+    async def close(self):
+        self.closed = True
+        if not self.session_id:
+            return
+        try:
+            await http_pool.request("DELETE", self.url, headers={**self.headers, "Mcp-Session-Id": self.session_id})
+        except Exception as e:
+            logger.debug(f"Failed to end MCP session with {self.server}: {e}")
@@ -0,0 +1,66 @@
+"""Worker-side Prometheus metrics and the HTTP server that exposes them."""
+import asyncio
+import logging
+import os
+from typing import Set
+
+from prometheus_client import Gauge, Histogram, start_http_server
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.metrics import refresh_queue_metrics
+
+logger = logging.getLogger(__name__)
+
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+METRICS_QUEUE_SAMPLE_SECONDS = float(os.getenv("METRICS_QUEUE_SAMPLE_SECONDS", "15"))
+METRICS_MAX_HOSTS = int(os.getenv("METRICS_MAX_HOSTS", "100"))
+
+# Run and step latencies range from milliseconds to many minutes.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+QUEUE_WAIT = Histogram(
+    "orchestrator_queue_wait_seconds", "Time from a RunStarted event being published to a worker starting the run",
+    buckets=LATENCY_BUCKETS,
+)
+RUN_DURATION = Histogram("orchestrator_run_duration_seconds", "Run execution time by final status", ["status"], buckets=LATENCY_BUCKETS)
+STEP_DURATION = Histogram(
+    "orchestrator_step_duration_seconds", "Step execution time, including retries, by step type and outcome",
+    ["step_type", "outcome"], buckets=LATENCY_BUCKETS,
+)
+HTTP_STEP_DURATION = Histogram(
+    "orchestrator_http_step_duration_seconds", "HTTP step request time by target host and outcome",
+    ["host", "outcome"], buckets=LATENCY_BUCKETS,
+)
+RUNS_IN_FLIGHT = Gauge("orchestrator_runs_in_flight", "Runs currently executing in this worker")
+
+_hosts: Set[str] = set()
+
+
+def host_label(host: str) -> str:
+    """Keeps the host label's cardinality bounded; hosts beyond ``METRICS_MAX_HOSTS`` share 'other'."""
+    if host in _hosts:
+        return host
+    if len(_hosts) < METRICS_MAX_HOSTS:
+        _hosts.add(host)
+        return host
+    return "other"
+
+
+def start_metrics_server(port: int = WORKER_METRICS_PORT):
+    if port:
+        start_http_server(port)
+        logger.info(f"Serving metrics on :{port}/metrics")
+
+
+async def sample_queue(stop_event: asyncio.Event, interval: float = METRICS_QUEUE_SAMPLE_SECONDS):
+    """Refreshes the queue gauges until stopped; the stream is shared, so every worker reports the same depth."""
+    while not stop_event.is_set():
+        try:
+            await refresh_queue_metrics(await get_redis())
+        except Exception as e:
+            logger.warning(f"Queue metrics sample failed: {e}")
+        try:
+            await asyncio.wait_for(stop_event.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional
+from uuid import UUID
+
+from sqlalchemy import DateTime, Integer, String, Text, cast, column, func, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+
+from apps.api.app.db.models import Run
+from apps.api.app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FLUSH_INTERVAL_SECONDS = float(os.getenv("PROGRESS_FLUSH_INTERVAL_SECONDS", "1"))
+PROGRESS_FLUSH_BATCH_SIZE = int(os.getenv("PROGRESS_FLUSH_BATCH_SIZE", "500"))
+
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "CANCELED"}
+
+# Columns the writer is allowed to touch, with the SQL type used to cast the
+# VALUES column (a column that is NULL in every row would otherwise be text).
+PROGRESS_COLUMNS = {
+    "status": String,
+    "current_step_index": Integer,
+    "started_at": DateTime,
+    "finished_at": DateTime,
+    "error_message": Text,
+}
+
+
+class ProgressWriter:
+    """Coalesces run progress updates and writes them to Postgres in bulk.
+
+    ``record()`` only merges fields into an in-memory map keyed by run id; the
+    background loop flushes that map every ``PROGRESS_FLUSH_INTERVAL_SECONDS``
+    as a single ``UPDATE runs ... FROM (VALUES ...)`` per batch. Terminal
+    transitions go through ``record_terminal()``, which writes them right
+    away; if that fails they stay queued for the background loop. Once a run
+    has a terminal status queued, later updates for it are ignored, so a
+    failed write can't turn SUCCEEDED into FAILED.
+    """
+
+    def __init__(self, flush_interval: float = PROGRESS_FLUSH_INTERVAL_SECONDS, batch_size: int = PROGRESS_FLUSH_BATCH_SIZE):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: Dict[str, dict] = {}
+        self._flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.rows_written = 0
+
+    def record(self, run_id: str, **fields):
+        unknown = set(fields) - set(PROGRESS_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unsupported progress fields: {sorted(unknown)}")
+        self._merge(self._pending.setdefault(str(run_id), {}), fields)
+
+    @staticmethod
+    def _merge(pending: dict, fields: dict):
+        if pending.get("status") in TERMINAL_STATUSES:
+            return
+        pending.update(fields)
+
+    async def record_terminal(self, run_id: str, status: str, **fields):
+        if status not in TERMINAL_STATUSES:
+            raise ValueError(f"{status} is not a terminal status")
+        self.record(run_id, status=status, **fields)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Could not write {status} for run {run_id} yet, the background flush will retry: {e}")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            items = list(pending.items())
+            written = 0
+            try:
+                for start in range(0, len(items), self.batch_size):
+                    written += await self._write(items[start:start + self.batch_size])
+            except Exception:
+                # Put unwritten updates back, under anything recorded since.
+                for run_id, fields in items[written:]:
+                    merged = dict(fields)
+                    self._merge(merged, self._pending.get(run_id, {}))
+                    self._pending[run_id] = merged
+                raise
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    async def _write(self, items) -> int:
+        names = list(PROGRESS_COLUMNS)
+        rows = [(UUID(run_id), *(fields.get(name) for name in names)) for run_id, fields in items]
+        v = values(
+            column("id", PG_UUID(as_uuid=True)),
+            *(column(name, PROGRESS_COLUMNS[name]) for name in names),
+            name="progress",
+        ).data(rows)
+        assignments = {
+            name: func.coalesce(cast(v.c[name], PROGRESS_COLUMNS[name]), getattr(Run, name))
+            for name in names
+        }
+        stmt = update(Run).where(Run.id == v.c.id).values(**assignments, updated_at=datetime.utcnow())
+        async with AsyncSessionLocal() as session:
+            await session.execute(stmt, execution_options={"synchronize_session": False})
+            await session.commit()
+        return len(rows)
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        stop_event = stop_event or asyncio.Event()
+        while not stop_event.is_set():
+            try:
+                await asyncio.wait_for(stop_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Progress flush failed, will retry: {e}")
+
+    def stats(self) -> dict:
+        return {"pending": len(self._pending), "flushes": self.flushes, "rows_written": self.rows_written}
+
+
+progress_writer = ProgressWriter()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from apps.api.app.cache.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Requests per second (and burst) allowed per host across all workers; 0 disables.
+HTTP_RATE_LIMIT_PER_SECOND = float(os.getenv("HTTP_RATE_LIMIT_PER_SECOND", "0"))
+HTTP_RATE_LIMIT_BURST = int(os.getenv("HTTP_RATE_LIMIT_BURST", "0"))
+# Per-host overrides: "api.example.com=10:20,slow.example.com=1" (rate[:burst]).
+HTTP_RATE_LIMITS = os.getenv("HTTP_RATE_LIMITS", "")
+HTTP_RATE_LIMIT_MAX_WAIT_SECONDS = float(os.getenv("HTTP_RATE_LIMIT_MAX_WAIT_SECONDS", "60"))
+
+# Token bucket in a hash {tokens, ts}. Time comes from the Redis server so all
+# workers refill against the same clock. Returns 0 when a token was taken,
+# otherwise the milliseconds until one will be available.
+_TAKE_TOKEN = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return wait
+"""
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, host: str, waited: float):
+        super().__init__(f"Rate limit for {host} still exhausted after waiting {waited:.1f}s")
+        self.host = host
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, int]]:
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        host, _, value = item.partition("=")
+        rate, _, burst = value.partition(":")
+        rate = float(rate)
+        limits[host.strip().lower()] = (rate, int(burst) if burst else max(1, int(rate)))
+    return limits
+
+
+class HostRateLimiter:
+    """Distributed per-host token bucket shared by all workers through Redis."""
+
+    def __init__(
+        self,
+        default_rate: float = HTTP_RATE_LIMIT_PER_SECOND,
+        default_burst: int = HTTP_RATE_LIMIT_BURST,
+        overrides: str = HTTP_RATE_LIMITS,
+        max_wait: float = HTTP_RATE_LIMIT_MAX_WAIT_SECONDS,
+    ):
+        self.default = (default_rate, default_burst or max(1, int(default_rate)))
+        self.overrides = parse_limits(overrides)
+        self.max_wait = max_wait
+        self._script = None
+        self.throttled = 0
+
+    def limit_for(self, host: str) -> Optional[Tuple[float, int]]:
+        rate, burst = self.overrides.get(host.lower(), self.default)
+        return (rate, burst) if rate > 0 else None
+
+    async def acquire(self, host: str):
+        """Waits until the host's bucket has a token; raises RateLimitExceeded after ``max_wait``."""
+        limit = self.limit_for(host)
+        if limit is None:
+            return
+        redis = await get_redis()
+        if self._script is None:
+            self._script = redis.register_script(_TAKE_TOKEN)
+        waited = 0.0
+        while True:
+            wait_ms = await self._script(keys=[f"ratelimit:{host.lower()}"], args=[limit[0], limit[1]])
+            if not wait_ms:
+                return
+            if waited + wait_ms / 1000 > self.max_wait:
+                raise RateLimitExceeded(host, waited)
+            self.throttled += 1
+            await asyncio.sleep(wait_ms / 1000)
+            waited += wait_ms / 1000
+
+
+rate_limiter = HostRateLimiter()
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.db.models import Run
+from apps.api.app.db.session import AsyncSessionLocal
+from apps.api.app.events.bus import event_bus
+from apps.worker.app.leases import Lease, run_lease_key
+
+logger = logging.getLogger(__name__)
+
+REAPER_INTERVAL_SECONDS = float(os.getenv("REAPER_INTERVAL_SECONDS", "30"))
+# Longer than EVENT_VISIBILITY_TIMEOUT_MS, so stream redelivery gets the first
+# chance to pick up a run whose worker died.
+REAPER_STALE_SECONDS = int(os.getenv("REAPER_STALE_SECONDS", "120"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "100"))
+REAPER_LEADER_KEY = os.getenv("REAPER_LEADER_KEY", "reaper:leader")
+
+
+class RunReaper:
+    """Re-enqueues runs stuck in RUNNING whose worker no longer holds their lease.
+
+    Every worker runs a reaper, but only the one holding ``REAPER_LEADER_KEY``
+    scans the database. A re-enqueued run resumes from its saved context.
+    """
+
+    def __init__(self, interval: float = REAPER_INTERVAL_SECONDS, stale_seconds: int = REAPER_STALE_SECONDS, batch_size: int = REAPER_BATCH_SIZE):
+        self.interval = interval
+        self.stale_seconds = stale_seconds
+        self.batch_size = batch_size
+        self.leader = Lease(REAPER_LEADER_KEY, ttl_ms=int(interval * 3000))
+        self.reaped = 0
+
+    async def reap_once(self) -> int:
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_seconds)
+        stmt = (
+            select(Run.id, Run.workflow_id, Run.tenant_id, Run.priority)
+            .where(Run.status == "RUNNING", Run.updated_at < cutoff)
+            .order_by(Run.updated_at)
+            .limit(self.batch_size)
+        )
+        async with AsyncSessionLocal() as session:
+            rows = (await session.execute(stmt)).all()
+        if not rows:
+            return 0
+
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                pipe.exists(run_lease_key(row.id))
+            leased = await pipe.execute()
+        orphaned = [row for row, is_leased in zip(rows, leased) if not is_leased]
+        if not orphaned:
+            return 0
+
+        # Remember what we re-enqueued so a run still waiting in the stream
+        # isn't enqueued again on every pass.
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in orphaned:
+                pipe.set(f"run:{row.id}:reaped", "1", nx=True, ex=self.stale_seconds)
+            marked = await pipe.execute()
+        events = [
+            ("RunStarted", {
+                "run_id": str(row.id),
+                "workflow_id": str(row.workflow_id),
+                "tenant_id": str(row.tenant_id) if row.tenant_id else None,
+                "priority": row.priority,
+            }, None)
+            for row, is_new in zip(orphaned, marked) if is_new
+        ]
+        if events:
+            await event_bus.publish_many(events)
+            logger.warning(f"Re-enqueued {len(events)} run(s) with no live lease")
+        self.reaped += len(events)
+        return len(events)
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        stop_event = stop_event or asyncio.Event()
+        try:
+            while not stop_event.is_set():
+                try:
+                    is_leader = await self.leader.renew() if self.leader.held else await self.leader.acquire()
+                    if is_leader:
+                        await self.reap_once()
+                except Exception as e:
+                    logger.error(f"Reaper pass failed: {e}")
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.leader.release()
+
+    def stats(self) -> dict:
+        return {"leader": self.leader.held, "reaped": self.reaped}
+
+
+run_reaper = RunReaper()
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import random
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Optional
+
+import httpx
+
+from shared.shared.schemas.workflow import RetryPolicy
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable(error: Exception, policy: RetryPolicy) -> bool:
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in policy.retry_on_status
+    # Connect/read/pool timeouts and connection failures, plus errors that
+    # declare themselves transient (e.g. a dropped MCP session).
+    return isinstance(error, httpx.TransportError) or getattr(error, "retryable", False)
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """Reads a Retry-After header (seconds or HTTP date) from a failed response."""
+    if not isinstance(error, httpx.HTTPStatusError):
+        return None
+    value = error.response.headers.get("retry-after")
+    if not value:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_seconds(policy: RetryPolicy, attempt: int) -> float:
+    """Wait before retry number ``attempt`` (1-based)."""
+    backoff = min(policy.max_backoff_seconds, policy.initial_backoff_seconds * policy.backoff_multiplier ** (attempt - 1))
+    return random.uniform(0, backoff) if policy.jitter else backoff
+
+
+async def call_with_retry(fn: Callable[[], Awaitable[Any]], policy: Optional[RetryPolicy], description: str = "step") -> Any:
+    """Calls ``fn`` until it succeeds, fails with a non-retryable error or runs out of attempts."""
+    if policy is None:
+        return await fn()
+    attempt = 1
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= policy.max_attempts or not is_retryable(e, policy):
+                raise
+            delay = backoff_seconds(policy, attempt)
+            server_delay = retry_after_seconds(e)
+            if server_delay is not None:
+                delay = min(max(delay, server_delay), policy.max_backoff_seconds)
+            logger.warning(f"{description} failed (attempt {attempt}/{policy.max_attempts}), retrying in {delay:.2f}s: {e}")
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from apps.api.app.cache.redis_client import get_redis
+from apps.api.app.db.models import Run, Workflow, WorkflowSchedule
+from apps.api.app.db.session import AsyncSessionLocal
+from apps.api.app.events.bus import SCHEDULED_RUNS_KEY, SCHEDULES_KEY, epoch, event_bus, scheduled_run_member
+from apps.worker.app.leases import Lease
+from shared.shared.cron import CronExpression
+
+logger = logging.getLogger(__name__)
+
+SCHEDULER_INTERVAL_SECONDS = float(os.getenv("SCHEDULER_INTERVAL_SECONDS", "1"))
+SCHEDULER_BATCH_SIZE = int(os.getenv("SCHEDULER_BATCH_SIZE", "500"))
+SCHEDULER_RECONCILE_SECONDS = float(os.getenv("SCHEDULER_RECONCILE_SECONDS", "300"))
+SCHEDULER_LEADER_KEY = os.getenv("SCHEDULER_LEADER_KEY", "scheduler:leader")
+SCHEDULER_LEADER_TTL_MS = int(os.getenv("SCHEDULER_LEADER_TTL_MS", "10000"))
+
+# Cron runs get ids derived from the schedule and fire time, so a fire retried
+# after a crash finds its run already created instead of creating another.
+SCHEDULE_RUN_NAMESPACE = uuid.UUID("6f1c2a0e-4b7d-4f25-9a43-2d8e5b1c7f90")
+
+# Moves a schedule to its next fire time unless someone (e.g. an API update)
+# changed it since we read it.
+_ADVANCE_IF_UNCHANGED = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if score and tonumber(score) == tonumber(ARGV[2]) then
+    if ARGV[3] == '' then
+        return redis.call('ZREM', KEYS[1], ARGV[1])
+    end
+    return redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+end
+return 0
+"""
+
+
+def schedule_run_id(schedule_id, fire_at: float) -> uuid.UUID:
+    return uuid.uuid5(SCHEDULE_RUN_NAMESPACE, f"{schedule_id}:{int(fire_at)}")
+
+
+class RunScheduler:
+    """Starts delayed runs and cron-scheduled runs when they fall due.
+
+    Both live in Redis sorted sets scored by due time; Postgres stays the
+    source of truth and ``reconcile()`` restores anything missing from Redis.
+    Every worker runs a scheduler, but only the one holding
+    ``SCHEDULER_LEADER_KEY`` fires anything. Cron fires missed while no
+    scheduler was running collapse into a single run.
+    """
+
+    def __init__(
+        self,
+        interval: float = SCHEDULER_INTERVAL_SECONDS,
+        batch_size: int = SCHEDULER_BATCH_SIZE,
+        reconcile_interval: float = SCHEDULER_RECONCILE_SECONDS,
+    ):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.reconcile_interval = reconcile_interval
+        self.leader = Lease(SCHEDULER_LEADER_KEY, ttl_ms=SCHEDULER_LEADER_TTL_MS)
+        self._advance_script = None
+        self._last_reconcile: Optional[float] = None
+        self.released = 0
+        self.fired = 0
+
+    async def release_due_runs(self, now: datetime) -> int:
+        released = 0
+        while True:
+            payloads = await event_bus.release_due_runs(epoch(now), self.batch_size)
+            if payloads:
+                async with AsyncSessionLocal() as session:
+                    await session.execute(
+                        update(Run)
+                        .where(Run.id.in_([uuid.UUID(p["run_id"]) for p in payloads]), Run.status == "SCHEDULED")
+                        .values(status="QUEUED")
+                    )
+                    await session.commit()
+            released += len(payloads)
+            if len(payloads) < self.batch_size:
+                break
+        self.released += released
+        return released
+
+    async def fire_schedules(self, now: datetime) -> int:
+        redis = await get_redis()
+        due: List[Tuple[str, float]] = await redis.zrangebyscore(
+            SCHEDULES_KEY, "-inf", epoch(now), start=0, num=self.batch_size, withscores=True
+        )
+        if not due:
+            return 0
+
+        stmt = (
+            select(WorkflowSchedule, Workflow.tenant_id, Workflow.priority, Workflow.is_active.label("workflow_active"))
+            .join(Workflow, Workflow.id == WorkflowSchedule.workflow_id)
+            .where(WorkflowSchedule.id.in_([uuid.UUID(member) for member, _ in due]))
+        )
+        runs, advances = [], []
+        async with AsyncSessionLocal() as session:
+            rows = {row.WorkflowSchedule.id: row for row in (await session.execute(stmt)).all()}
+            for member, score in due:
+                row = rows.get(uuid.UUID(member))
+                if row is None or not row.WorkflowSchedule.is_active or not row.workflow_active:
+                    advances.append((member, score, None))
+                    continue
+                schedule = row.WorkflowSchedule
+                try:
+                    cron = CronExpression.parse(schedule.cron)
+                except ValueError as e:
+                    logger.error(f"Schedule {schedule.id} has an invalid cron expression, dropping it: {e}")
+                    advances.append((member, score, None))
+                    continue
+                fire_at = datetime.utcfromtimestamp(score)
+                runs.append({
+                    "id": schedule_run_id(schedule.id, score),
+                    "workflow_id": schedule.workflow_id,
+                    "tenant_id": row.tenant_id,
+                    "priority": row.priority,
+                    "status": "QUEUED",
+                    "triggered_by": "SCHEDULE",
+                    "input_json": schedule.input_json,
+                    "scheduled_at": fire_at,
+                    "created_at": now,
+                })
+                advances.append((member, score, cron.next_after(max(fire_at, now))))
+
+            created = set()
+            if runs:
+                result = await session.execute(
+                    insert(Run).values(runs).on_conflict_do_nothing(index_elements=[Run.id]).returning(Run.id)
+                )
+                created = set(result.scalars())
+                await session.commit()
+
+        # A run that already existed was created by an earlier attempt at this
+        # fire; publish it again (executors skip runs already leased or
+        # finished) but leave its state alone.
+        events = []
+        for run in runs:
+            run_id = str(run["id"])
+            payload = {
+                "run_id": run_id,
+                "workflow_id": str(run["workflow_id"]),
+                "tenant_id": str(run["tenant_id"]) if run["tenant_id"] else None,
+                "priority": run["priority"],
+            }
+            state = None
+            if run["id"] in created:
+                state = {
+                    "run_id": run_id,
+                    "workflow_id": payload["workflow_id"],
+                    "status": "QUEUED",
+                    "current_step_index": 0,
+                    "created_at": now.isoformat(),
+                }
+            events.append(("RunStarted", payload, state))
+        if events:
+            await event_bus.publish_many(events)
+
+        if self._advance_script is None:
+            self._advance_script = redis.register_script(_ADVANCE_IF_UNCHANGED)
+        for member, score, next_run_at in advances:
+            await self._advance_script(
+                keys=[SCHEDULES_KEY], args=[member, score, epoch(next_run_at) if next_run_at else ""]
+            )
+        self.fired += len(runs)
+        if runs:
+            logger.info(f"Started {len(runs)} scheduled run(s)")
+        return len(runs)
+
+    async def reconcile(self, now: datetime):
+        """Re-adds delayed runs and active schedules missing from Redis (e.g. after a flush)."""
+        async with AsyncSessionLocal() as session:
+            runs = (await session.execute(
+                select(Run.id, Run.workflow_id, Run.tenant_id, Run.priority, Run.scheduled_at).where(Run.status == "SCHEDULED")
+            )).all()
+            schedules = (await session.execute(
+                select(WorkflowSchedule.id, WorkflowSchedule.cron)
+                .join(Workflow, Workflow.id == WorkflowSchedule.workflow_id)
+                .where(WorkflowSchedule.is_active.is_(True), Workflow.is_active.is_(True))
+            )).all()
+
+        redis = await get_redis()
+        async with redis.pipeline(transaction=False) as pipe:
+            for run in runs:
+                payload = {
+                    "run_id": str(run.id),
+                    "workflow_id": str(run.workflow_id),
+                    "tenant_id": str(run.tenant_id) if run.tenant_id else None,
+                    "priority": run.priority,
+                }
+                pipe.zadd(SCHEDULED_RUNS_KEY, {scheduled_run_member(payload): epoch(run.scheduled_at or now)}, nx=True)
+            for schedule in schedules:
+                try:
+                    next_run_at = CronExpression.parse(schedule.cron).next_after(now)
+                except ValueError:
+                    continue
+                pipe.zadd(SCHEDULES_KEY, {str(schedule.id): epoch(next_run_at)}, nx=True)
+            added = await pipe.execute()
+        if any(added):
+            logger.warning(f"Restored {sum(added)} scheduled item(s) missing from Redis")
+
+    async def tick(self):
+        loop = asyncio.get_running_loop()
+        now = datetime.utcnow()
+        if self._last_reconcile is None or loop.time() - self._last_reconcile >= self.reconcile_interval:
+            await self.reconcile(now)
+            self._last_reconcile = loop.time()
+        await self.release_due_runs(now)
+        await self.fire_schedules(now)
+
+    async def run(self, stop_event: Optional[asyncio.Event] = None):
+        stop_event = stop_event or asyncio.Event()
+        try:
+            while not stop_event.is_set():
+                try:
+                    is_leader = await self.leader.renew() if self.leader.held else await self.leader.acquire()
+                    if is_leader:
+                        await self.tick()
+                    else:
+                        # Reconcile as soon as we (next) become leader.
+                        self._last_reconcile = None
+                except Exception as e:
+                    logger.error(f"Scheduler pass failed: {e}")
+                try:
+                    await asyncio.wait_for(stop_event.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.leader.release()
+
+    def stats(self) -> dict:
+        return {"leader": self.leader.held, "released": self.released, "fired": self.fired}
+
+
+run_scheduler = RunScheduler()
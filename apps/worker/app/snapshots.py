@@ -0,0 +1,155 @@
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, Optional, Tuple
+from uuid import UUID, uuid4
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.api.app.db.models import RunSnapshot, SnapshotBlob
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Payloads below this size stay inline as JSONB; larger ones are compressed
+# into snapshot_blobs and deduplicated by content hash.
+SNAPSHOT_COMPRESS_THRESHOLD_BYTES = int(os.getenv("SNAPSHOT_COMPRESS_THRESHOLD_BYTES", "2048"))
+# Every Nth snapshot of a run is written in full so a restore never replays
+# more than N-1 deltas.
+SNAPSHOT_FULL_INTERVAL = int(os.getenv("SNAPSHOT_FULL_INTERVAL", "10"))
+# zstd falls back to gzip when the optional zstandard package is missing.
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "zstd")
+SNAPSHOT_ZSTD_LEVEL = int(os.getenv("SNAPSHOT_ZSTD_LEVEL", "3"))
+
+
+def project(context: Dict[str, Any], include_keys: Optional[Iterable[str]]) -> Dict[str, Any]:
+    """Returns the part of the context a snapshot step asked for (all of it if unspecified)."""
+    if include_keys is None:
+        return dict(context)
+    return {key: context[key] for key in include_keys if key in context}
+
+
+def diff(previous: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "set": {key: value for key, value in current.items() if key not in previous or previous[key] != value},
+        "unset": sorted(key for key in previous if key not in current),
+    }
+
+
+def apply_delta(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    state = {key: value for key, value in base.items() if key not in delta.get("unset", ())}
+    state.update(delta.get("set", {}))
+    return state
+
+
+def encode_payload(payload: Dict[str, Any]) -> bytes:
+    # Canonical form so equal payloads hash the same.
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str).encode()
+
+
+def compress(raw: bytes, codec: str = SNAPSHOT_COMPRESSION) -> Tuple[str, bytes]:
+    if codec == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=SNAPSHOT_ZSTD_LEVEL).compress(raw)
+    if codec in ("zstd", "gzip"):
+        return "gzip", gzip.compress(raw, compresslevel=6)
+    return "identity", raw
+
+
+def decompress(encoding: str, data: bytes) -> bytes:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Snapshot blob is zstd-compressed but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    return data
+
+
+class SnapshotWriter:
+    """Writes the snapshots of one run, as deltas against the previous one.
+
+    The writer remembers the last payload it wrote, so a fresh writer (e.g.
+    after a resume) always starts with a full snapshot.
+    """
+
+    def __init__(self, run_id: str, full_interval: int = SNAPSHOT_FULL_INTERVAL, threshold: int = SNAPSHOT_COMPRESS_THRESHOLD_BYTES):
+        self.run_id = UUID(str(run_id))
+        self.full_interval = max(1, full_interval)
+        self.threshold = threshold
+        self._previous: Optional[Dict[str, Any]] = None
+        self._previous_id: Optional[UUID] = None
+        self._since_full = 0
+        self.bytes_inline = 0
+        self.bytes_blob = 0
+
+    def build(self, step_index: int, state: Dict[str, Any]) -> Tuple[RunSnapshot, Optional[dict]]:
+        """Returns the snapshot row and, for large payloads, the blob row to upsert."""
+        if self._previous is None or self._since_full >= self.full_interval - 1:
+            kind, payload, base_id = "full", state, None
+        else:
+            kind, payload, base_id = "delta", diff(self._previous, state), self._previous_id
+
+        snapshot = RunSnapshot(id=uuid4(), run_id=self.run_id, step_index=step_index, kind=kind, base_snapshot_id=base_id)
+        blob = None
+        raw = encode_payload(payload)
+        if len(raw) < self.threshold:
+            snapshot.snapshot_json = payload
+            self.bytes_inline += len(raw)
+        else:
+            encoding, data = compress(raw)
+            blob = {
+                "content_hash": hashlib.sha256(raw).hexdigest(),
+                "encoding": encoding,
+                "size_bytes": len(raw),
+                "data": data,
+            }
+            snapshot.blob_hash = blob["content_hash"]
+            self.bytes_blob += len(data)
+        return snapshot, blob
+
+    async def save(self, db: AsyncSession, step_index: int, state: Dict[str, Any]) -> RunSnapshot:
+        snapshot, blob = self.build(step_index, state)
+        if blob is not None:
+            await db.execute(insert(SnapshotBlob).values(**blob).on_conflict_do_nothing(index_elements=["content_hash"]))
+        db.add(snapshot)
+        await db.commit()
+
+        self._since_full = 0 if snapshot.kind == "full" else self._since_full + 1
+        self._previous = dict(state)
+        self._previous_id = snapshot.id
+        return snapshot
+
+
+async def _payload(db: AsyncSession, snapshot: RunSnapshot) -> Dict[str, Any]:
+    if snapshot.blob_hash is None:
+        return snapshot.snapshot_json or {}
+    blob = await db.get(SnapshotBlob, snapshot.blob_hash)
+    return json.loads(decompress(blob.encoding, blob.data))
+
+
+async def load_latest_snapshot(db: AsyncSession, run_id) -> Optional[Tuple[int, Dict[str, Any]]]:
+    """Rebuilds the most recent snapshot of a run; returns (step_index, state) or None."""
+    stmt = (
+        select(RunSnapshot)
+        .where(RunSnapshot.run_id == UUID(str(run_id)))
+        .order_by(RunSnapshot.created_at.desc())
+        .limit(1)
+    )
+    latest = (await db.execute(stmt)).scalar_one_or_none()
+    if latest is None:
+        return None
+
+    chain = [latest]
+    while chain[-1].kind == "delta":
+        chain.append(await db.get(RunSnapshot, chain[-1].base_snapshot_id))
+
+    state: Dict[str, Any] = {}
+    for snapshot in reversed(chain):
+        payload = await _payload(db, snapshot)
+        state = payload if snapshot.kind == "full" else apply_delta(state, payload)
+    return latest.step_index, state
@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from apps.api.app.cache.redis_client import get_redis
+from shared.shared.schemas.workflow import Step
+
+logger = logging.getLogger(__name__)
+
+_RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_MISSING = object()
+
+
+def cache_inputs(step: Step) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Splits a step's inputs into identity fields (always keyed) and selectable ones."""
+    if step.type == "mcp_tool":
+        return {"tool_name": step.tool_name, "server": step.server}, {"input": step.input}
+    return (
+        {"method": step.method, "url": step.url, "response_mode": step.response_mode, "extract": step.extract},
+        {"headers": step.headers, "json": step.json_body},
+    )
+
+
+def _select(inputs: Dict[str, Any], path: str) -> Any:
+    value: Any = inputs
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def cache_key(step: Step) -> str:
+    identity, inputs = cache_inputs(step)
+    if step.cache.key_fields is not None:
+        inputs = {path: _select(inputs, path) for path in step.cache.key_fields}
+    canonical = json.dumps([step.type, identity, inputs], sort_keys=True, separators=(",", ":"), default=str)
+    return f"stepcache:{step.type}:{hashlib.sha256(canonical.encode()).hexdigest()}"
+
+
+class StepResultCache:
+    """Caches results of deterministic steps in Redis, with single-flight execution.
+
+    On a miss, one caller takes a short Redis lock and executes the step;
+    other callers (on any worker) poll for its result with backoff instead
+    of calling out themselves.
+    """
+
+    def __init__(self, poll_initial: float = 0.05, poll_max: float = 0.5):
+        self.poll_initial = poll_initial
+        self.poll_max = poll_max
+        self._release = None
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    async def get_or_run(self, step: Step, produce: Callable[[], Awaitable[Any]]) -> Any:
+        key = cache_key(step)
+        redis = await get_redis()
+        if self._release is None:
+            self._release = redis.register_script(_RELEASE_IF_OWNER)
+        attempts = step.retry.max_attempts if step.retry else 1
+        # Long enough for the owner to finish (all attempts), short enough to
+        # recover if it dies.
+        lock_ms = (step.timeout_seconds * attempts + 5) * 1000
+        lock_key, token = f"{key}:lock", uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lock_ms / 1000
+        delay = self.poll_initial
+
+        while True:
+            cached = await self._read(redis, key)
+            if cached is not _MISSING:
+                self.hits += 1
+                return cached
+            if await redis.set(lock_key, token, nx=True, px=lock_ms):
+                break
+            if loop.time() >= deadline:
+                logger.warning(f"Gave up waiting for in-flight {step.type} step, executing it here")
+                break
+            self.waits += 1
+            await asyncio.sleep(delay)
+            delay = min(self.poll_max, delay * 2)
+
+        self.misses += 1
+        try:
+            result = await produce()
+            await redis.set(key, json.dumps(result), ex=step.cache.ttl_seconds)
+            return result
+        finally:
+            await self._release(keys=[lock_key], args=[token])
+
+    async def _read(self, redis, key: str) -> Any:
+        value = await redis.get(key)
+        return _MISSING if value is None else json.loads(value)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "waits": self.waits}
+
+
+step_cache = StepResultCache()
@@ -0,0 +1,218 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+WORKER_MAX_CONCURRENCY = int(os.getenv("WORKER_MAX_CONCURRENCY", "32"))
+WORKER_MAX_RUNS_PER_TENANT = int(os.getenv("WORKER_MAX_RUNS_PER_TENANT", "0"))
+WORKER_MAX_RUNS_PER_WORKFLOW = int(os.getenv("WORKER_MAX_RUNS_PER_WORKFLOW", "0"))
+WORKER_DRAIN_TIMEOUT_SECONDS = float(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", "30"))
+
+
+@dataclass
+class Job:
+    run_id: str
+    factory: Callable[[], Awaitable[Any]]
+    workflow_id: Optional[str] = None
+    tenant_id: Optional[str] = None
+    item: Any = None
+    # on_done runs only when the factory returns normally; on_exit runs once the
+    # task has ended for any reason (return, exception or cancellation).
+    on_done: Optional[Callable[["Job"], Awaitable[None]]] = field(default=None, repr=False)
+    on_exit: Optional[Callable[["Job"], None]] = field(default=None, repr=False)
+
+
+class TaskScheduler:
+    """Runs jobs as asyncio tasks with a global limit and per-tenant/per-workflow caps.
+
+    Jobs whose tenant or workflow is already at its cap are parked in memory and
+    started as soon as a slot for that key frees up. Only running jobs count
+    against ``max_concurrency``, so a capped tenant doesn't hold back everyone
+    else. Parking is bounded instead: a tenant or workflow may have at most as
+    many jobs parked as it may run, and ``can_accept()`` says whether a job
+    still fits. Callers keep jobs that don't (e.g. unacked in the stream) and
+    offer them again later.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = WORKER_MAX_CONCURRENCY,
+        max_per_tenant: int = WORKER_MAX_RUNS_PER_TENANT,
+        max_per_workflow: int = WORKER_MAX_RUNS_PER_WORKFLOW,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+        self.max_per_tenant = max_per_tenant
+        self.max_per_workflow = max_per_workflow
+        self._running: Dict[asyncio.Task, Job] = {}
+        self._parked: Deque[Job] = deque()
+        self._tenant_counts: Dict[str, int] = {}
+        self._workflow_counts: Dict[str, int] = {}
+        self._changed = asyncio.Event()
+        self._closed = False
+
+    @property
+    def running(self) -> int:
+        return len(self._running)
+
+    @property
+    def parked(self) -> int:
+        return len(self._parked)
+
+    def free_slots(self) -> int:
+        if self._closed:
+            return 0
+        return max(0, self.max_concurrency - self.running)
+
+    def has_capacity(self) -> bool:
+        return self.free_slots() > 0
+
+    async def wait_for_capacity(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until at least one slot is free. Returns False on timeout."""
+        while not self.has_capacity():
+            if self._closed:
+                return False
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                return self.has_capacity()
+        return True
+
+    async def wait_for_change(self, timeout: Optional[float] = None):
+        """Blocks until a job finishes (or ``timeout`` passes)."""
+        self._changed.clear()
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def can_accept(self, job: Job) -> bool:
+        """Whether ``submit(job)`` would start or park the job rather than refuse it."""
+        if self._closed:
+            return False
+        if self.running < self.max_concurrency and self._within_caps(job):
+            return True
+        return self._parkable(job)
+
+    def submit(self, job: Job) -> bool:
+        """Starts the job now if its caps allow, otherwise parks it. Returns True if started."""
+        if self._closed:
+            raise RuntimeError("TaskScheduler is draining, no new jobs accepted")
+        if self.running < self.max_concurrency and self._within_caps(job):
+            self._start(job)
+            return True
+        if not self._parkable(job):
+            raise RuntimeError(f"No room to park run {job.run_id}, check can_accept() first")
+        self._parked.append(job)
+        return False
+
+    def _parkable(self, job: Job) -> bool:
+        if len(self._parked) >= self.max_concurrency:
+            return False
+        if self.max_per_tenant and job.tenant_id:
+            if sum(1 for p in self._parked if p.tenant_id == job.tenant_id) >= self.max_per_tenant:
+                return False
+        if self.max_per_workflow and job.workflow_id:
+            if sum(1 for p in self._parked if p.workflow_id == job.workflow_id) >= self.max_per_workflow:
+                return False
+        return True
+
+    def _within_caps(self, job: Job) -> bool:
+        if self.max_per_tenant and job.tenant_id:
+            if self._tenant_counts.get(job.tenant_id, 0) >= self.max_per_tenant:
+                return False
+        if self.max_per_workflow and job.workflow_id:
+            if self._workflow_counts.get(job.workflow_id, 0) >= self.max_per_workflow:
+                return False
+        return True
+
+    def _start(self, job: Job):
+        if job.tenant_id:
+            self._tenant_counts[job.tenant_id] = self._tenant_counts.get(job.tenant_id, 0) + 1
+        if job.workflow_id:
+            self._workflow_counts[job.workflow_id] = self._workflow_counts.get(job.workflow_id, 0) + 1
+        task = asyncio.create_task(self._run(job), name=f"run:{job.run_id}")
+        self._running[task] = job
+        task.add_done_callback(self._on_task_done)
+
+    async def _run(self, job: Job):
+        try:
+            await job.factory()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Run {job.run_id} raised in scheduler: {e}")
+            return
+        if job.on_done:
+            try:
+                await job.on_done(job)
+            except Exception as e:
+                logger.error(f"Completion callback for run {job.run_id} failed: {e}")
+
+    def _on_task_done(self, task: asyncio.Task):
+        job = self._running.pop(task, None)
+        if job is not None:
+            self._decrement(self._tenant_counts, job.tenant_id)
+            self._decrement(self._workflow_counts, job.workflow_id)
+            if job.on_exit:
+                try:
+                    job.on_exit(job)
+                except Exception as e:
+                    logger.error(f"Exit callback for run {job.run_id} failed: {e}")
+        self._start_parked()
+        self._changed.set()
+
+    @staticmethod
+    def _decrement(counts: Dict[str, int], key: Optional[str]):
+        if not key:
+            return
+        remaining = counts.get(key, 0) - 1
+        if remaining > 0:
+            counts[key] = remaining
+        else:
+            counts.pop(key, None)
+
+    def _start_parked(self):
+        if not self._parked or self._closed:
+            return
+        still_parked: Deque[Job] = deque()
+        while self._parked:
+            job = self._parked.popleft()
+            if self.running < self.max_concurrency and self._within_caps(job):
+                self._start(job)
+            else:
+                still_parked.append(job)
+        self._parked = still_parked
+
+    async def drain(self, timeout: float = WORKER_DRAIN_TIMEOUT_SECONDS) -> List[Job]:
+        """Stops accepting jobs and waits for the running ones to finish.
+
+        Returns the parked jobs that never started so the caller can hand them
+        back to the queue. Jobs still running after ``timeout`` are cancelled.
+        """
+        self._closed = True
+        self._changed.set()
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._running:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            await asyncio.wait(list(self._running), timeout=remaining)
+
+        if self._running:
+            logger.warning(f"Drain timeout reached, cancelling {len(self._running)} running job(s)")
+            tasks = list(self._running)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        unstarted = list(self._parked)
+        self._parked.clear()
+        return unstarted
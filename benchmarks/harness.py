@@ -0,0 +1,298 @@
+"""Drives webhook ingress and run execution end to end against local stand-ins.
+
+Import this only after ``benchmarks.run`` has configured the environment:
+the app modules read their settings (database URL, stream keys, MCP
+servers) at import time.
+"""
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+import httpx
+from sqlalchemy import event
+
+from apps.api.app.cache.redis_client import redis_client
+from apps.api.app.cache.run_state import run_state_store
+from apps.api.app.db.session import engine
+from apps.api.app.main import app
+from apps.worker.app.events.consumer import consume_events
+from apps.worker.app.executor import WorkflowExecutor
+from apps.worker.app.http_pool import http_pool
+from apps.worker.app.mcp.client import mcp_clients
+from apps.worker.app.progress import progress_writer
+from apps.worker.app.task_scheduler import TaskScheduler
+from benchmarks.scenarios import SCENARIOS
+
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WEBHOOK_SECRET = "bench-secret"
+
+# Time spent inside _execute_step (the step's own work) for the step running in this task.
+_step_work: ContextVar[List[float]] = ContextVar("step_work")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))]
+
+
+def latency_summary(seconds: List[float]) -> dict:
+    return {
+        "p50_ms": round(percentile(seconds, 50) * 1000, 3),
+        "p90_ms": round(percentile(seconds, 90) * 1000, 3),
+        "p99_ms": round(percentile(seconds, 99) * 1000, 3),
+    }
+
+
+class StatementCounter:
+    """Counts SQL statements sent by the shared engine."""
+
+    def __init__(self):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def take(self) -> int:
+        count, self.count = self.count, 0
+        return count
+
+    def close(self):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+
+class ExecutorTimer:
+    """Times whole runs, and each step's orchestration overhead (everything but the call itself)."""
+
+    def __init__(self):
+        self.run_durations: Dict[str, float] = {}
+        self.step_overheads: List[float] = []
+        self.expected = 0
+        self.done = asyncio.Event()
+
+    def reset(self, expected: int):
+        self.run_durations.clear()
+        self.step_overheads.clear()
+        self.expected = expected
+        self.done.clear()
+
+    @contextmanager
+    def installed(self):
+        timer = self
+        execute, run_step, execute_step = WorkflowExecutor.execute, WorkflowExecutor._run_step, WorkflowExecutor._execute_step
+
+        async def timed_execute(executor):
+            started = time.perf_counter()
+            try:
+                await execute(executor)
+            finally:
+                timer.run_durations[executor.run_id] = time.perf_counter() - started
+                if len(timer.run_durations) >= timer.expected:
+                    timer.done.set()
+
+        async def timed_run_step(executor, index, step, context, **state_fields):
+            work = [0.0]
+            token = _step_work.set(work)
+            started = time.perf_counter()
+            try:
+                await run_step(executor, index, step, context, **state_fields)
+            finally:
+                timer.step_overheads.append(time.perf_counter() - started - work[0])
+                _step_work.reset(token)
+
+        async def timed_execute_step(executor, step, context):
+            started = time.perf_counter()
+            try:
+                return await execute_step(executor, step, context)
+            finally:
+                work = _step_work.get(None)
+                if work is not None:
+                    work[0] += time.perf_counter() - started
+
+        WorkflowExecutor.execute = timed_execute
+        WorkflowExecutor._run_step = timed_run_step
+        WorkflowExecutor._execute_step = timed_execute_step
+        try:
+            yield self
+        finally:
+            WorkflowExecutor.execute = execute
+            WorkflowExecutor._run_step = run_step
+            WorkflowExecutor._execute_step = execute_step
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@asynccontextmanager
+async def mock_http_server():
+    """Runs benchmarks.mock_server in a subprocess so it doesn't share our event loop."""
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT}
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.mock_server", "--port", str(port)], env=env, cwd=REPO_ROOT)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient() as client:
+            for _ in range(100):
+                try:
+                    (await client.get(f"{url}/json")).raise_for_status()
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Mock HTTP server did not start")
+        yield url
+    finally:
+        process.terminate()
+        process.wait()
+
+
+class Benchmark:
+    def __init__(self, scenario: str, runs: int, concurrency: int, worker_concurrency: int, warmup: int, step_delay_ms: float, timeout: float):
+        self.scenario = scenario
+        self.runs = runs
+        self.concurrency = concurrency
+        self.worker_concurrency = worker_concurrency
+        self.warmup = warmup
+        self.step_delay_ms = step_delay_ms
+        self.timeout = timeout
+        self.statements = StatementCounter()
+        self.timer = ExecutorTimer()
+
+    async def setup(self, client: httpx.AsyncClient, target: str) -> Tuple[str, int]:
+        definition = SCENARIOS[self.scenario](target, self.step_delay_ms)
+        response = await client.post("/workflows/", json={"name": f"bench-{self.scenario}", "definition": definition})
+        response.raise_for_status()
+        path = f"bench-{uuid.uuid4().hex[:12]}"
+        response = await client.post(
+            f"/workflows/{response.json()['id']}/webhook-endpoints", json={"path": path, "secret": WEBHOOK_SECRET}
+        )
+        response.raise_for_status()
+        return path, len(definition["steps"])
+
+    async def trigger(self, client: httpx.AsyncClient, path: str, count: int) -> Tuple[List[str], List[float], float]:
+        """Posts ``count`` webhooks, ``concurrency`` at a time; returns run ids, latencies and elapsed time."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def one(i: int) -> Tuple[str, float]:
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(
+                    f"/webhooks/{path}", json={"customer_id": i}, headers={"x-webhook-secret": WEBHOOK_SECRET}
+                )
+                latency = time.perf_counter() - started
+                response.raise_for_status()
+                return response.json()["run_id"], latency
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(count)))
+        return [run_id for run_id, _ in results], [latency for _, latency in results], time.perf_counter() - started
+
+    async def execute(self, count: int) -> float:
+        """Runs a worker until ``count`` runs have finished; returns the elapsed time."""
+        self.timer.reset(count)
+        stop_event, writer_stop = asyncio.Event(), asyncio.Event()
+        writer = asyncio.create_task(progress_writer.run(writer_stop))
+        consumer = asyncio.create_task(consume_events(stop_event, TaskScheduler(max_concurrency=self.worker_concurrency)))
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.timer.done.wait(), self.timeout)
+            return time.perf_counter() - started
+        finally:
+            stop_event.set()
+            await consumer
+            writer_stop.set()
+            await writer
+            await progress_writer.flush()
+
+    async def run(self) -> dict:
+        async with mock_http_server() as target, app.router.lifespan_context(app):
+            await http_pool.start()
+            transport = httpx.ASGITransport(app=app)
+            try:
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    path, steps_per_run = await self.setup(client, target)
+                    with self.timer.installed():
+                        if self.warmup:
+                            await self.trigger(client, path, self.warmup)
+                            await self.execute(self.warmup)
+                        self.statements.take()
+
+                        run_ids, latencies, ingress_elapsed = await self.trigger(client, path, self.runs)
+                        ingress_statements = self.statements.take()
+                        execution_elapsed = await self.execute(self.runs)
+                        execution_statements = self.statements.take()
+            finally:
+                self.statements.close()
+                await mcp_clients.close()
+                await http_pool.close()
+
+            states = await run_state_store.get_many(run_ids, ["status"])
+            statuses = [state.get("status") for state in states.values()]
+            durations = list(self.timer.run_durations.values())
+            return {
+                "scenario": self.scenario,
+                "runs": self.runs,
+                "steps_per_run": steps_per_run,
+                "ingress": {
+                    "requests_per_second": round(self.runs / ingress_elapsed, 2),
+                    **latency_summary(latencies),
+                    "db_statements_per_run": round(ingress_statements / self.runs, 2),
+                },
+                "execution": {
+                    "runs_per_second": round(self.runs / execution_elapsed, 2),
+                    "succeeded": statuses.count("SUCCEEDED"),
+                    "failed": len(statuses) - statuses.count("SUCCEEDED"),
+                    "run_duration": latency_summary(durations),
+                    "step_overhead": {
+                        "mean_ms": round(sum(self.timer.step_overheads) / max(1, len(self.timer.step_overheads)) * 1000, 3),
+                        **latency_summary(self.timer.step_overheads),
+                    },
+                    "db_statements_per_run": round(execution_statements / self.runs, 2),
+                },
+            }
+
+
+def blocking_fake_redis():
+    """A fakeredis client whose XREADGROUP honours BLOCK.
+
+    fakeredis answers ``XREADGROUP ... COUNT n BLOCK ms`` at once when nothing
+    is new, which would leave the consumer loop spinning without ever yielding
+    to the runs it is supposed to be executing.
+    """
+    from fakeredis import aioredis as fakeredis
+
+    class BlockingFakeRedis(fakeredis.FakeRedis):
+        async def xreadgroup(self, *args, block=None, **kwargs):
+            deadline = time.monotonic() + (block or 0) / 1000
+            while True:
+                response = await super().xreadgroup(*args, **kwargs)
+                if response or not block or time.monotonic() >= deadline:
+                    return response
+                await asyncio.sleep(0.002)
+
+    return BlockingFakeRedis(decode_responses=True)
+
+
+async def run_benchmark(scenario: str, runs: int, concurrency: int, worker_concurrency: int, warmup: int, step_delay_ms: float, timeout: float, fake_redis: bool, echo_sql: bool = False) -> dict:
+    engine.echo = echo_sql
+    if fake_redis:
+        redis_client.client = blocking_fake_redis()
+    try:
+        return await Benchmark(scenario, runs, concurrency, worker_concurrency, warmup, step_delay_ms, timeout).run()
+    finally:
+        await engine.dispose()
@@ -0,0 +1,36 @@
+"""A minimal HTTP target for benchmark steps, run in its own process.
+
+``GET /json?delay_ms=5&items=10`` waits ``delay_ms`` and returns a small JSON
+document; it is a bare ASGI app so the server adds as little as possible to
+the numbers being measured.
+"""
+import argparse
+import asyncio
+import json
+from urllib.parse import parse_qs
+
+import uvicorn
+
+
+async def app(scope, receive, send):
+    if scope["type"] != "http":
+        return
+    query = parse_qs(scope["query_string"].decode())
+    delay_ms = float(query.get("delay_ms", ["0"])[0])
+    items = int(query.get("items", ["10"])[0])
+    if delay_ms:
+        await asyncio.sleep(delay_ms / 1000)
+    body = json.dumps({"ok": True, "next": "page-2", "items": [{"id": i, "name": f"item-{i}"} for i in range(items)]}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
@@ -0,0 +1,48 @@
+from typing import Dict, List, Tuple
+
+# Metrics compared against a baseline, and whether bigger numbers are better.
+TRACKED_METRICS = {
+    "ingress.requests_per_second": True,
+    "ingress.p50_ms": False,
+    "ingress.p99_ms": False,
+    "ingress.db_statements_per_run": False,
+    "execution.runs_per_second": True,
+    "execution.run_duration.p50_ms": False,
+    "execution.run_duration.p99_ms": False,
+    "execution.step_overhead.mean_ms": False,
+    "execution.db_statements_per_run": False,
+}
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def format_results(results: dict) -> str:
+    lines = [f"scenario {results['scenario']}: {results['runs']} runs x {results['steps_per_run']} steps"]
+    lines += [f"  {name:<40} {value:>12}" for name, value in flatten(results).items() if "." in name]
+    return "\n".join(lines)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> Tuple[List[str], List[str]]:
+    """Returns a report of tracked metrics against the baseline, and the names of those that regressed."""
+    now, before = flatten(current), flatten(baseline)
+    lines, regressions = [f"  {'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}"], []
+    for name, higher_is_better in TRACKED_METRICS.items():
+        if name not in now or name not in before:
+            continue
+        old, new = before[name], now[name]
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = " !" if worse > tolerance else ""
+        if flag:
+            regressions.append(name)
+        lines.append(f"  {name:<40} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+    return lines, regressions
@@ -0,0 +1,124 @@
+"""Benchmark webhook ingress and run execution end to end.
+
+    python -m benchmarks.run --scenario http_chain --runs 500 --output data/benchmarks/http_chain.json
+    python -m benchmarks.run --scenario http_chain --baseline data/benchmarks/http_chain.json
+
+Redis is fakeredis (``--redis fake``, needs ``fakeredis[lua]``) or a real
+server (``--redis redis://...``). Postgres is an embedded server
+(``--database embedded``, needs ``pgserver``) or any ``postgresql+asyncpg://``
+URL. Step targets are a local HTTP server and the fake stdio MCP server from
+the test suite. Ingress runs first with no worker attached, then a worker
+drains the queue, so each phase is measured on its own.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from benchmarks.report import compare, format_results
+from benchmarks.scenarios import SCENARIOS
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_MCP_SERVER = os.path.join(REPO_ROOT, "tests", "fakes", "fake_mcp_server.py")
+
+
+@contextmanager
+def embedded_postgres():
+    """Yields the URL of a throwaway Postgres server, stopped and deleted on exit."""
+    try:
+        import pgserver
+    except ImportError:
+        raise SystemExit("--database embedded requires the pgserver package (or pass a postgresql+asyncpg:// URL)")
+    with pgserver.get_server(tempfile.mkdtemp(prefix="bench-pg-"), cleanup_mode="delete") as server:
+        yield server.get_uri().replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def configure_environment(args, database_url: str):
+    """Points the app at the benchmark's stand-ins; must run before any app module is imported."""
+    os.environ["DATABASE_URL"] = database_url
+    if args.redis != "fake":
+        os.environ["REDIS_URL"] = args.redis
+    # A private stream, so workers attached to the same Redis never see benchmark runs.
+    os.environ["EVENT_STREAM_KEY"] = f"bench:{uuid.uuid4().hex[:8]}:events"
+    os.environ["EVENT_READ_BLOCK_MS"] = "100"
+    os.environ["MCP_SERVERS"] = json.dumps({
+        "fake": {"transport": "stdio", "command": [sys.executable, FAKE_MCP_SERVER], "pool_size": 2},
+    })
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="http_chain")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32, help="concurrent webhook requests")
+    parser.add_argument("--worker-concurrency", type=int, default=32, help="runs executed at once")
+    parser.add_argument("--warmup", type=int, default=20, help="runs triggered and executed before measuring")
+    parser.add_argument("--step-delay-ms", type=float, default=0, help="latency of each mocked step call")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for runs to finish")
+    parser.add_argument("--redis", default="fake", help="'fake' or a redis:// URL")
+    parser.add_argument("--database", default=os.getenv("DATABASE_URL", "embedded"), help="'embedded' or a postgresql+asyncpg:// URL")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against a previous JSON result")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression before failing")
+    parser.add_argument("--echo-sql", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    with embedded_postgres() if args.database == "embedded" else nullcontext(args.database) as database_url:
+        configure_environment(args, database_url)
+        from benchmarks.harness import run_benchmark
+
+        results = asyncio.run(run_benchmark(
+            args.scenario, args.runs, args.concurrency, args.worker_concurrency, args.warmup,
+            args.step_delay_ms, args.timeout, fake_redis=args.redis == "fake", echo_sql=args.echo_sql,
+        ))
+
+    document = {
+        "meta": {
+            "git_commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "redis": "fakeredis" if args.redis == "fake" else "redis",
+            "database": "embedded" if args.database == "embedded" else "postgres",
+            "concurrency": args.concurrency,
+            "worker_concurrency": args.worker_concurrency,
+            "step_delay_ms": args.step_delay_ms,
+        },
+        "results": results,
+    }
+    print(format_results(results))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["results"].get("scenario") != results["scenario"]:
+            raise SystemExit(f"Baseline is for scenario {baseline['results'].get('scenario')!r}, not {results['scenario']!r}")
+        lines, regressions = compare(results, baseline["results"], args.tolerance)
+        print("\n".join(lines))
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
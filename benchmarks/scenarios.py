@@ -0,0 +1,47 @@
+"""Workflow definitions exercised by the benchmark, keyed by scenario name."""
+
+
+def http_chain(target: str, delay_ms: float) -> dict:
+    """Three sequential GETs; the later ones read the webhook input and earlier results."""
+    url = f"{target}/json?delay_ms={delay_ms}"
+    return {
+        "version": "1.0",
+        "steps": [
+            {"type": "http", "method": "GET", "url": url},
+            {"type": "http", "method": "GET", "url": url + "&customer={{ input.customer_id }}"},
+            {"type": "http", "method": "GET", "url": url + "&cursor={{ steps.1.result.next }}"},
+        ],
+    }
+
+
+def http_dag(target: str, delay_ms: float) -> dict:
+    """Three independent GETs fanning in to a fourth."""
+    url = f"{target}/json?delay_ms={delay_ms}"
+    return {
+        "version": "1.0",
+        "max_parallelism": 4,
+        "steps": [
+            {"id": "a", "type": "http", "method": "GET", "url": url},
+            {"id": "b", "type": "http", "method": "GET", "url": url},
+            {"id": "c", "type": "http", "method": "GET", "url": url},
+            {"id": "join", "type": "http", "method": "GET", "url": url, "depends_on": ["a", "b", "c"]},
+        ],
+    }
+
+
+def mcp_chain(target: str, delay_ms: float) -> dict:
+    """Two tool calls on the fake stdio MCP server, the second fed by the first."""
+    return {
+        "version": "1.0",
+        "steps": [
+            {"type": "mcp_tool", "tool_name": "sleep", "input": {"seconds": delay_ms / 1000}},
+            {"type": "mcp_tool", "tool_name": "echo", "input": {"customer": "{{ input.customer_id }}", "slept": "{{ steps.0.result.structuredContent.slept }}"}},
+        ],
+    }
+
+
+SCENARIOS = {
+    "http_chain": http_chain,
+    "http_dag": http_dag,
+    "mcp_chain": mcp_chain,
+}
@@ -0,0 +1,128 @@
+"""Five-field cron expressions (minute hour day-of-month month day-of-week), evaluated in UTC.
+
+Supports ``*``, lists, ranges, ``/step``, month and weekday names and the
+``@hourly``/``@daily``/``@weekly``/``@monthly``/``@yearly`` shorthands. As in
+Vixie cron, when both day fields are restricted a day matching either fires.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Tuple
+
+MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+_MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+_WEEKDAYS = ["sun", "mon", "tue", "wed", "thu", "fri", "sat"]
+# (name, low, high, names standing for low, low + 1, ...)
+_FIELDS: List[Tuple[str, int, int, List[str]]] = [
+    ("minute", 0, 59, []),
+    ("hour", 0, 23, []),
+    ("day of month", 1, 31, []),
+    ("month", 1, 12, _MONTHS),
+    ("day of week", 0, 7, _WEEKDAYS),
+]
+# A schedule that can't fire within this many years (e.g. "0 0 30 2 *") is rejected.
+_SEARCH_YEARS = 5
+
+
+def _value(token: str, name: str, low: int, high: int, names: List[str]) -> int:
+    lowered = token.lower()
+    if lowered in names:
+        return names.index(lowered) + low
+    if not token.isdigit():
+        raise ValueError(f"Invalid {name} value {token!r}")
+    value = int(token)
+    if not low <= value <= high:
+        raise ValueError(f"{name.capitalize()} value {value} is outside {low}-{high}")
+    return value
+
+
+def _parse_field(text: str, name: str, low: int, high: int, names: List[str]) -> FrozenSet[int]:
+    values = set()
+    for part in text.split(","):
+        base, _, step_text = part.partition("/")
+        step = 1
+        if step_text:
+            if not step_text.isdigit() or int(step_text) == 0:
+                raise ValueError(f"Invalid {name} step {step_text!r}")
+            step = int(step_text)
+        if base == "*":
+            start, end = low, high
+        elif "-" in base:
+            first, _, last = base.partition("-")
+            start, end = _value(first, name, low, high, names), _value(last, name, low, high, names)
+            if start > end:
+                raise ValueError(f"Invalid {name} range {base!r}")
+        else:
+            start = _value(base, name, low, high, names)
+            # "5/15" means from 5 to the end of the range, every 15.
+            end = high if step_text else start
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+@dataclass(frozen=True)
+class CronExpression:
+    expression: str
+    minutes: FrozenSet[int]
+    hours: FrozenSet[int]
+    days: FrozenSet[int]
+    months: FrozenSet[int]
+    weekdays: FrozenSet[int]
+    # Whether each day field was restricted (not "*"), for the either-day rule.
+    days_restricted: bool
+    weekdays_restricted: bool
+
+    @classmethod
+    def parse(cls, expression: str) -> "CronExpression":
+        text = MACROS.get(expression.strip().lower(), expression)
+        parts = text.split()
+        if len(parts) != 5:
+            raise ValueError(f"Cron expression {expression!r} must have 5 fields")
+        minutes, hours, days, months, weekdays = (
+            _parse_field(part, *field) for part, field in zip(parts, _FIELDS)
+        )
+        cron = cls(
+            expression=expression,
+            minutes=minutes,
+            hours=hours,
+            days=days,
+            months=months,
+            # 7 is Sunday too.
+            weekdays=frozenset(day % 7 for day in weekdays),
+            days_restricted=not parts[2].startswith("*"),
+            weekdays_restricted=not parts[4].startswith("*"),
+        )
+        cron.next_after(datetime(2000, 1, 1))
+        return cron
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.days_restricted and self.weekdays_restricted:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        """The first matching minute strictly after ``moment`` (naive UTC)."""
+        current = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = current + timedelta(days=366 * _SEARCH_YEARS)
+        while current < limit:
+            if current.month not in self.months:
+                year, month = divmod(current.month, 12)
+                current = current.replace(year=current.year + year, month=month + 1, day=1, hour=0, minute=0)
+            elif not self._day_matches(current):
+                current = current.replace(hour=0, minute=0) + timedelta(days=1)
+            elif current.hour not in self.hours:
+                current = current.replace(minute=0) + timedelta(hours=1)
+            elif current.minute not in self.minutes:
+                current += timedelta(minutes=1)
+            else:
+                return current
+        raise ValueError(f"Cron expression {self.expression!r} never fires")
@@ -1,20 +1,63 @@
-from typing import List, Optional, Union, Literal, Dict, Any
-from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Set, Union, Literal, Dict, Any
+from pydantic import BaseModel, Field, field_validator, model_validator
+from shared.shared.templating import compile_step_templates
+
+class RetryPolicy(BaseModel):
+    max_attempts: int = Field(default=3, ge=1)
+    initial_backoff_seconds: float = Field(default=0.5, ge=0)
+    max_backoff_seconds: float = Field(default=30, ge=0)
+    backoff_multiplier: float = Field(default=2.0, ge=1)
+    # Full jitter: each wait is drawn uniformly from [0, backoff].
+    jitter: bool = True
+    # HTTP statuses worth retrying; connection errors and timeouts always are.
+    retry_on_status: List[int] = [429, 502, 503, 504]
+
+class CachePolicy(BaseModel):
+    ttl_seconds: int = Field(ge=1)
+    # Dotted paths into the step's inputs (e.g. "input.query", "headers.Accept")
+    # that make up the cache key besides the tool/URL; all inputs when omitted.
+    key_fields: Optional[List[str]] = None
 
 class StepBase(BaseModel):
+    id: Optional[str] = None
+    depends_on: List[str] = []
     timeout_seconds: int = 30
+    retry: Optional[RetryPolicy] = None
 
 class MCPToolStep(StepBase):
     type: Literal["mcp_tool"]
     tool_name: str
+    # String values may use {{ input.* }} and {{ steps.<index or id>.result.* }}.
     input: Dict[str, Any]
+    # Configured MCP server to call; when omitted it is looked up by tool name.
+    server: Optional[str] = None
+    # Reuse results of identical calls for cache.ttl_seconds.
+    cache: Optional[CachePolicy] = None
 
 class HTTPStep(StepBase):
     type: Literal["http"]
     method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"]
+    # url, headers and json may contain {{ ... }} placeholders like MCP tool inputs.
     url: str
     headers: Dict[str, str] = {}
     json_body: Optional[Dict[str, Any]] = Field(default=None, alias="json")
+    # "json" parses the body (keeping only the `extract` fields when given);
+    # "raw" stores the undecoded body in the blob store and returns a reference.
+    response_mode: Literal["json", "raw"] = "json"
+    # Output name -> field path, e.g. {"total": "$.meta.total", "first": "items[0].id"}.
+    extract: Optional[Dict[str, str]] = None
+    # Overrides HTTP_STEP_MAX_RESPONSE_BYTES for this step.
+    max_response_bytes: Optional[int] = Field(default=None, ge=1)
+    # Reuse responses of identical GET requests for cache.ttl_seconds.
+    cache: Optional[CachePolicy] = None
+
+    @model_validator(mode='after')
+    def check_extract_mode(self) -> 'HTTPStep':
+        if self.extract and self.response_mode == "raw":
+            raise ValueError('extract cannot be combined with response_mode "raw"')
+        if self.cache and self.method != "GET":
+            raise ValueError('Only GET requests can be cached')
+        return self
 
 class PersistSnapshotStep(StepBase):
     type: Literal["persist_snapshot"]
@@ -25,6 +68,8 @@ Step = Union[MCPToolStep, HTTPStep, PersistSnapshotStep]
 class WorkflowDefinition(BaseModel):
     version: str
     steps: List[Step]
+    # Upper bound on concurrently running steps of one run when steps form a DAG.
+    max_parallelism: int = Field(default=4, ge=1)
 
     @field_validator('steps')
     @classmethod
@@ -32,3 +77,80 @@ class WorkflowDefinition(BaseModel):
         if not v:
             raise ValueError('Workflow must have at least one step')
         return v
+
+    @model_validator(mode='after')
+    def check_step_graph(self) -> 'WorkflowDefinition':
+        ids = {}
+        for index, step in enumerate(self.steps):
+            if step.id is None:
+                continue
+            if step.id in ids:
+                raise ValueError(f"Duplicate step id '{step.id}' (steps {ids[step.id]} and {index})")
+            ids[step.id] = index
+
+        for index, step in enumerate(self.steps):
+            for dep in step.depends_on:
+                if dep not in ids:
+                    raise ValueError(f"Step {index} depends on unknown step id '{dep}'")
+                if ids[dep] == index:
+                    raise ValueError(f"Step {index} depends on itself")
+
+        cycle = find_cycle(self.dependency_indices())
+        if cycle:
+            names = [self.steps[i].id or str(i) for i in cycle]
+            raise ValueError(f"Step dependencies contain a cycle: {' -> '.join(names)}")
+
+        # Placeholders may only read results of steps guaranteed to finish first.
+        dependencies = self.dependency_indices()
+        for index, template in compile_step_templates(self.steps).items():
+            before = ancestors(dependencies, index) if self.is_dag else set(range(index))
+            unavailable = template.step_refs - before
+            if unavailable:
+                raise ValueError(f"Step {index} uses the result of step {min(unavailable)}, which does not run before it")
+        return self
+
+    @property
+    def is_dag(self) -> bool:
+        """True when any step declares dependencies; plain lists run sequentially."""
+        return any(step.depends_on for step in self.steps)
+
+    def dependency_indices(self) -> List[List[int]]:
+        """For each step, the indices of the steps it depends on."""
+        ids = {step.id: index for index, step in enumerate(self.steps) if step.id is not None}
+        return [sorted({ids[dep] for dep in step.depends_on if dep in ids}) for step in self.steps]
+
+
+def ancestors(dependencies: List[List[int]], index: int) -> Set[int]:
+    """All steps that ``index`` depends on, directly or transitively."""
+    seen: Set[int] = set()
+    stack = list(dependencies[index])
+    while stack:
+        node = stack.pop()
+        if node not in seen:
+            seen.add(node)
+            stack.extend(dependencies[node])
+    return seen
+
+
+def find_cycle(dependencies: List[List[int]]) -> Optional[List[int]]:
+    """Returns one dependency cycle as a list of node indices, or None if acyclic."""
+    WHITE, GREY, BLACK = 0, 1, 2
+    color = [WHITE] * len(dependencies)
+    for root in range(len(dependencies)):
+        if color[root] != WHITE:
+            continue
+        path = [root]
+        stack = [iter(dependencies[root])]
+        color[root] = GREY
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                color[path.pop()] = BLACK
+                stack.pop()
+            elif color[node] == GREY:
+                return path[path.index(node):] + [node]
+            elif color[node] == WHITE:
+                color[node] = GREY
+                path.append(node)
+                stack.append(iter(dependencies[node]))
+    return None
@@ -0,0 +1,162 @@
+"""``{{ input.foo }}`` / ``{{ steps.0.result.bar }}`` placeholders in step fields.
+
+Templates are parsed once per workflow definition into ``StepTemplate``
+objects; rendering a step only walks the pre-parsed fields and looks values
+up in the run's scope (``{"input": ..., "steps": {index: context entry}}``).
+"""
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Sequence, Tuple, Union
+
+_PLACEHOLDER = re.compile(r"\{\{\s*(.*?)\s*\}\}")
+_PATH_PART = re.compile(r"^[A-Za-z0-9_\-]+$")
+
+# Step fields that may contain placeholders, by step type.
+TEMPLATED_FIELDS = {
+    "mcp_tool": ("input",),
+    "http": ("url", "headers", "json_body"),
+}
+
+Path = Tuple[Union[str, int], ...]
+
+
+class TemplateError(ValueError):
+    """A placeholder is malformed or refers to something the run doesn't have."""
+
+
+def _format_path(path: Path) -> str:
+    return ".".join(str(part) for part in path)
+
+
+def parse_path(expression: str, step_ids: Dict[str, int]) -> Path:
+    """Parses ``input.a.b`` or ``steps.<index or id>.result.c``; step ids become indices."""
+    parts = expression.split(".")
+    if not all(_PATH_PART.match(part) for part in parts):
+        raise TemplateError(f"Invalid placeholder '{{{{ {expression} }}}}'")
+    root = parts[0]
+    if root == "input":
+        return tuple(parts)
+    if root == "steps" and len(parts) >= 2:
+        ref = parts[1]
+        if ref.isdigit():
+            index = int(ref)
+        elif ref in step_ids:
+            index = step_ids[ref]
+        else:
+            raise TemplateError(f"Placeholder '{{{{ {expression} }}}}' refers to unknown step '{ref}'")
+        return ("steps", index, *parts[2:])
+    raise TemplateError(f"Placeholder '{{{{ {expression} }}}}' must start with 'input.' or 'steps.<step>'")
+
+
+def resolve(path: Path, scope: Dict[str, Any]) -> Any:
+    value: Any = scope
+    for part in path:
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and isinstance(part, str) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            raise TemplateError(f"'{{{{ {_format_path(path)} }}}}' is not available")
+    return value
+
+
+@dataclass(frozen=True)
+class Template:
+    """A string split into literal text and placeholder paths."""
+    parts: Tuple[Union[str, Path], ...]
+
+    @classmethod
+    def parse(cls, text: str, step_ids: Dict[str, int]) -> "Template":
+        parts: List[Union[str, Path]] = []
+        position = 0
+        for match in _PLACEHOLDER.finditer(text):
+            if match.start() > position:
+                parts.append(text[position:match.start()])
+            parts.append(parse_path(match.group(1), step_ids))
+            position = match.end()
+        if position < len(text):
+            parts.append(text[position:])
+        return cls(tuple(parts))
+
+    @property
+    def paths(self) -> List[Path]:
+        return [part for part in self.parts if isinstance(part, tuple)]
+
+    def render(self, scope: Dict[str, Any]) -> Any:
+        # A string that is exactly one placeholder keeps the value's type.
+        if len(self.parts) == 1 and isinstance(self.parts[0], tuple):
+            return resolve(self.parts[0], scope)
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                value = resolve(part, scope)
+                out.append(value if isinstance(value, str) else json.dumps(value))
+        return "".join(out)
+
+
+def compile_value(value: Any, step_ids: Dict[str, int]) -> Tuple[Any, bool]:
+    """Replaces strings containing placeholders with ``Template``s; also returns whether any did."""
+    if isinstance(value, str):
+        if "{{" not in value:
+            return value, False
+        return Template.parse(value, step_ids), True
+    if isinstance(value, dict):
+        items = {key: compile_value(item, step_ids) for key, item in value.items()}
+        return {key: item for key, (item, _) in items.items()}, any(found for _, found in items.values())
+    if isinstance(value, list):
+        items = [compile_value(item, step_ids) for item in value]
+        return [item for item, _ in items], any(found for _, found in items)
+    return value, False
+
+
+def render_value(value: Any, scope: Dict[str, Any]) -> Any:
+    if isinstance(value, Template):
+        return value.render(scope)
+    if isinstance(value, dict):
+        return {key: render_value(item, scope) for key, item in value.items()}
+    if isinstance(value, list):
+        return [render_value(item, scope) for item in value]
+    return value
+
+
+def _collect_paths(value: Any) -> List[Path]:
+    if isinstance(value, Template):
+        return value.paths
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        return [path for item in value for path in _collect_paths(item)]
+    return []
+
+
+@dataclass(frozen=True)
+class StepTemplate:
+    """The templated fields of one step, ready to render against a run's scope."""
+    fields: Dict[str, Any]
+    step_refs: FrozenSet[int]
+
+    def render(self, step, scope: Dict[str, Any]):
+        return step.model_copy(update={name: render_value(value, scope) for name, value in self.fields.items()})
+
+
+def compile_step_templates(steps: Sequence[Any]) -> Dict[int, StepTemplate]:
+    """Parses the placeholders of every step; steps without any are left out."""
+    step_ids = {step.id: index for index, step in enumerate(steps) if step.id is not None}
+    templates = {}
+    for index, step in enumerate(steps):
+        fields = {}
+        for name in TEMPLATED_FIELDS.get(step.type, ()):
+            compiled, found = compile_value(getattr(step, name), step_ids)
+            if found:
+                fields[name] = compiled
+        if not fields:
+            continue
+        step_refs = frozenset(path[1] for path in _collect_paths(list(fields.values())) if path[0] == "steps")
+        for ref in step_refs:
+            if ref >= len(steps):
+                raise TemplateError(f"Step {index} refers to step {ref}, but the workflow has {len(steps)} steps")
+        templates[index] = StepTemplate(fields=fields, step_refs=step_refs)
+    return templates
@@ -3,7 +3,8 @@ import pytest_asyncio
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from apps.api.app.main import app
-from apps.api.app.db.session import get_db, Base
+from apps.api.app.db.session import get_db
+from apps.api.app.db.models import Base
 from apps.api.app.cache.redis_client import redis_client
 import os
 
@@ -39,3 +40,12 @@ async def redis():
     await redis_client.connect()
     yield redis_client.client
     await redis_client.close()
+
+@pytest_asyncio.fixture
+async def fake_redis(monkeypatch):
+    """Points get_redis() at a fresh in-memory Redis (fakeredis, with Lua)."""
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    monkeypatch.setattr(redis_client, "client", client)
+    yield client
+    await client.aclose()
@@ -0,0 +1,96 @@
+"""A minimal MCP server for tests.
+
+Run it as a script to serve MCP over stdio, or call ``handle()`` directly to
+back a mocked HTTP transport. Requests are handled concurrently, so replies
+can come back out of order just like with a real server.
+"""
+import asyncio
+import json
+import os
+import sys
+
+TOOLS = [
+    {"name": "echo", "description": "Returns its arguments", "inputSchema": {"type": "object"}},
+    {"name": "add", "description": "Adds a and b", "inputSchema": {"type": "object"}},
+    {"name": "sleep", "description": "Waits for `seconds`", "inputSchema": {"type": "object"}},
+    {"name": "fail", "description": "Always reports an error", "inputSchema": {"type": "object"}},
+    {"name": "stats", "description": "Reports server counters", "inputSchema": {"type": "object"}},
+]
+PAGE_SIZE = 3
+
+counters = {"initialize": 0, "tools/list": 0, "tools/call": 0}
+
+
+def text(value):
+    return {"content": [{"type": "text", "text": json.dumps(value)}], "structuredContent": value}
+
+
+async def call_tool(name, arguments):
+    if name == "echo":
+        return text(arguments)
+    if name == "add":
+        return text({"sum": arguments["a"] + arguments["b"]})
+    if name == "sleep":
+        await asyncio.sleep(arguments.get("seconds", 0))
+        return text({"slept": arguments.get("seconds", 0)})
+    if name == "fail":
+        return {"content": [{"type": "text", "text": "tool exploded"}], "isError": True}
+    if name == "stats":
+        return text({"pid": os.getpid(), **counters})
+    return None
+
+
+async def handle(message):
+    """Returns the reply to a JSON-RPC message, or None for notifications."""
+    method = message.get("method")
+    if "id" not in message:
+        return None
+    if method in counters:
+        counters[method] += 1
+
+    params = message.get("params") or {}
+    result = None
+    if method == "initialize":
+        result = {
+            "protocolVersion": params.get("protocolVersion"),
+            "capabilities": {"tools": {"listChanged": True}},
+            "serverInfo": {"name": "fake-mcp", "version": "1.0"},
+        }
+    elif method == "ping":
+        result = {}
+    elif method == "tools/list":
+        start = int(params.get("cursor") or 0)
+        result = {"tools": TOOLS[start:start + PAGE_SIZE]}
+        if start + PAGE_SIZE < len(TOOLS):
+            result["nextCursor"] = str(start + PAGE_SIZE)
+    elif method == "tools/call":
+        result = await call_tool(params.get("name"), params.get("arguments") or {})
+        if result is None:
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32602, "message": f"Unknown tool: {params.get('name')}"}}
+
+    if result is None:
+        return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": "Method not found"}}
+    return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+
+async def serve_stdio():
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
+    await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+    def reply(task):
+        response = task.result()
+        if response is not None:
+            sys.stdout.write(json.dumps(response) + "\n")
+            sys.stdout.flush()
+
+    tasks = set()
+    while line := await reader.readline():
+        task = asyncio.create_task(handle(json.loads(line)))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        task.add_done_callback(reply)
+
+
+if __name__ == "__main__":
+    asyncio.run(serve_stdio())
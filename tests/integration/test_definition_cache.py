@@ -0,0 +1,41 @@
+import pytest
+from apps.api.app.db.models import Workflow
+from apps.worker.app.definition_cache import DefinitionCache
+
+
+def definition(url):
+    return {"version": "1.0", "steps": [{"type": "http", "method": "GET", "url": url}]}
+
+
+@pytest.mark.asyncio
+async def test_load_caches_and_picks_up_edits_without_an_invalidation(db_session):
+    workflow = Workflow(name="cached", definition_json=definition("https://example.com/v1"))
+    db_session.add(workflow)
+    await db_session.commit()
+    cache = DefinitionCache()
+
+    first = await cache.load(db_session, workflow.id)
+    assert await cache.load(db_session, workflow.id) is first
+    assert cache.stats()["hits"] == 1
+
+    # Edited by the API, but the invalidation message never arrived.
+    workflow.definition_json = definition("https://example.com/v2")
+    await db_session.commit()
+    reloaded = await cache.load(db_session, workflow.id)
+    assert reloaded.definition.steps[0].url == "https://example.com/v2"
+    assert reloaded.updated_at > first.updated_at
+    assert cache.stats()["stale"] == 1
+
+
+@pytest.mark.asyncio
+async def test_deleted_workflow_is_not_served_from_cache(db_session):
+    workflow = Workflow(name="deleted", definition_json=definition("https://example.com/"))
+    db_session.add(workflow)
+    await db_session.commit()
+    cache = DefinitionCache()
+    assert await cache.load(db_session, workflow.id) is not None
+
+    await db_session.delete(workflow)
+    await db_session.commit()
+    assert await cache.load(db_session, workflow.id) is None
+    assert cache.stats()["entries"] == 0
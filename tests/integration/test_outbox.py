@@ -0,0 +1,86 @@
+import uuid
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, select
+from apps.api.app.cache.run_state import RUN_STATE_TTL_SECONDS, run_state_key
+from apps.api.app.db.models import OutboxEvent
+from apps.api.app.db.session import AsyncSessionLocal
+from apps.api.app.events import outbox
+from apps.api.app.events.bus import EVENT_STREAM_KEY, EVENT_STREAMS_KEY, EventBus, decode_event, run_stream_key
+from apps.api.app.events.outbox import OutboxRelay
+
+
+@pytest_asyncio.fixture
+async def outbox_rows(db_session):
+    await db_session.execute(delete(OutboxEvent))
+    rows = []
+    for _ in range(3):
+        run_id = str(uuid.uuid4())
+        rows.append(OutboxEvent(
+            event_name="RunStarted",
+            payload={"run_id": run_id, "tenant_id": None},
+            run_state={"run_id": run_id, "status": "QUEUED"},
+        ))
+    db_session.add_all(rows)
+    await db_session.commit()
+    return [{"id": row.id, "payload": row.payload} for row in rows]
+
+
+async def remaining(db_session):
+    return (await db_session.scalars(select(OutboxEvent.id).order_by(OutboxEvent.id))).all()
+
+
+@pytest.mark.asyncio
+async def test_relay_publishes_then_deletes_rows(db_session, fake_redis, outbox_rows):
+    relay = OutboxRelay(batch_size=2)
+    assert await relay.relay_once() == 2
+    assert await relay.relay_once() == 1
+    assert await relay.relay_once() == 0
+
+    assert await remaining(db_session) == []
+    entries = await fake_redis.xrange(EVENT_STREAM_KEY)
+    assert [decode_event(fields)["payload"] for _, fields in entries] == [row["payload"] for row in outbox_rows]
+    state_key = run_state_key(outbox_rows[0]["payload"]["run_id"])
+    assert await fake_redis.hget(state_key, "status") == "QUEUED"
+
+
+@pytest.mark.asyncio
+async def test_relay_skips_rows_locked_by_another_relay(db_session, fake_redis, outbox_rows):
+    async with AsyncSessionLocal() as other:
+        # Another relay is part-way through publishing the first row.
+        await other.execute(
+            select(OutboxEvent).where(OutboxEvent.id == outbox_rows[0]["id"]).with_for_update()
+        )
+        assert await OutboxRelay().relay_once() == 2
+        await other.rollback()
+    assert await remaining(db_session) == [outbox_rows[0]["id"]]
+
+
+@pytest.mark.asyncio
+async def test_rows_stay_when_publishing_fails(db_session, fake_redis, outbox_rows, monkeypatch):
+    async def unavailable(events):
+        raise ConnectionError("redis unavailable")
+    monkeypatch.setattr(outbox.event_bus, "publish_many", unavailable)
+    with pytest.raises(ConnectionError):
+        await OutboxRelay().relay_once()
+    assert len(await remaining(db_session)) == 3
+
+
+@pytest.mark.asyncio
+async def test_publish_many_writes_states_and_events_together(fake_redis):
+    run_id = str(uuid.uuid4())
+    payloads = [
+        {"run_id": run_id, "tenant_id": "t1", "priority": "high"},
+        {"run_id": str(uuid.uuid4()), "tenant_id": None},
+    ]
+    ids = await EventBus().publish_many([
+        ("RunStarted", payloads[0], {"run_id": run_id, "status": "QUEUED"}),
+        ("RunStarted", payloads[1], None),
+    ])
+    assert len(ids) == 2
+    high = run_stream_key(payloads[0])
+    assert [entry_id for entry_id, _ in await fake_redis.xrange(high)] == ids[:1]
+    assert [entry_id for entry_id, _ in await fake_redis.xrange(EVENT_STREAM_KEY)] == ids[1:]
+    assert await fake_redis.smembers(EVENT_STREAMS_KEY) == {high, EVENT_STREAM_KEY}
+    assert await fake_redis.hgetall(run_state_key(run_id)) == {"run_id": run_id, "status": "QUEUED"}
+    assert 0 < await fake_redis.ttl(run_state_key(run_id)) <= RUN_STATE_TTL_SECONDS
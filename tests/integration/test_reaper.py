@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+import pytest
+from apps.api.app.db.models import Run, Workflow
+from apps.api.app.events.bus import EVENT_STREAM_KEY, EventBus, decode_event
+from apps.worker.app import reaper as reaper_module
+from apps.worker.app.leases import Lease, run_lease_key
+from apps.worker.app.reaper import RunReaper
+
+
+@pytest.fixture
+def bus(monkeypatch, fake_redis):
+    bus = EventBus()
+    monkeypatch.setattr(reaper_module, "event_bus", bus)
+    return bus
+
+
+async def add_runs(db_session, *statuses, age=timedelta(hours=2)):
+    workflow = Workflow(name="reaped", definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    updated_at = datetime.utcnow() - age
+    runs = [
+        Run(workflow_id=workflow.id, status=status, triggered_by="API", created_at=updated_at, updated_at=updated_at)
+        for status in statuses
+    ]
+    db_session.add_all(runs)
+    await db_session.commit()
+    return [str(run.id) for run in runs]
+
+
+async def republished(redis, run_ids):
+    events = [decode_event(fields) for _, fields in await redis.xrange(EVENT_STREAM_KEY)]
+    return [event["payload"]["run_id"] for event in events if event["payload"]["run_id"] in run_ids]
+
+
+@pytest.mark.asyncio
+async def test_stale_runs_without_a_lease_are_republished_once(db_session, fake_redis, bus):
+    orphaned, leased, queued = await add_runs(db_session, "RUNNING", "RUNNING", "QUEUED")
+    assert await Lease(run_lease_key(leased)).acquire()
+    reaper = RunReaper(stale_seconds=3600)
+
+    assert await reaper.reap_once() >= 1
+    assert await republished(fake_redis, {orphaned, leased, queued}) == [orphaned]
+    assert await fake_redis.exists(f"run:{orphaned}:reaped")
+
+    # The run is still waiting in the stream; the marker keeps it from being enqueued again.
+    assert await reaper.reap_once() == 0
+    assert await republished(fake_redis, {orphaned}) == [orphaned]
+
+
+@pytest.mark.asyncio
+async def test_recently_updated_runs_are_left_to_stream_redelivery(db_session, fake_redis, bus):
+    [recent] = await add_runs(db_session, "RUNNING", age=timedelta(minutes=1))
+    await RunReaper(stale_seconds=3600).reap_once()
+    assert await republished(fake_redis, {recent}) == []
@@ -0,0 +1,80 @@
+import uuid
+import pytest
+from sqlalchemy import select
+from apps.api.app.cache.run_state import RunStateStore
+from apps.api.app.db.models import Run, RunSnapshot, Workflow
+from apps.worker.app.executor import WorkflowExecutor
+from apps.worker.app.snapshots import SnapshotWriter, load_latest_snapshot
+from shared.shared.schemas.workflow import WorkflowDefinition
+
+
+def http_steps(count):
+    return [{"type": "http", "method": "GET", "url": "http://example.invalid"} for _ in range(count)]
+
+
+async def add_run(db_session, status="RUNNING"):
+    workflow = Workflow(name="resumed", definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    run = Run(workflow_id=workflow.id, status=status, triggered_by="API")
+    db_session.add(run)
+    await db_session.commit()
+    return run
+
+
+async def snapshot_rows(db_session, run_id):
+    stmt = select(RunSnapshot).where(RunSnapshot.run_id == run_id).order_by(RunSnapshot.created_at)
+    return (await db_session.scalars(stmt)).all()
+
+
+@pytest.mark.asyncio
+async def test_latest_snapshot_replays_deltas_onto_the_last_full_snapshot(db_session):
+    run = await add_run(db_session)
+    writer = SnapshotWriter(run.id, full_interval=10, threshold=64)
+    states = [
+        {"step_0": {"n": 0}},
+        {"step_0": {"n": 0}, "step_1": {"n": 1}},
+        {"step_0": {"n": 0}, "step_1": {"n": 1}, "step_2": {"big": "x" * 100}},
+        {"step_1": {"n": 1}, "step_3": {"n": 3}},
+        {"step_1": {"n": 1}, "step_3": {"n": 3}, "step_4": {"n": 4}},
+    ]
+    for index, state in enumerate(states):
+        await writer.save(db_session, index, state)
+
+    # One full snapshot, then deltas (one of them a blob, one unsetting a key).
+    assert [s.kind for s in await snapshot_rows(db_session, run.id)] == ["full"] + ["delta"] * 4
+    assert await load_latest_snapshot(db_session, run.id) == (4, states[-1])
+    assert await load_latest_snapshot(db_session, uuid.uuid4()) is None
+
+
+@pytest.mark.asyncio
+async def test_restore_context_merges_step_results_over_the_snapshot(db_session, fake_redis):
+    run = await add_run(db_session)
+    writer = SnapshotWriter(run.id, full_interval=2)
+    await writer.save(db_session, 0, {"step_0": {"type": "http", "result": "old"}})
+    await writer.save(db_session, 1, {"step_0": {"type": "http", "result": "old"}, "step_1": {"type": "http", "result": 1}})
+
+    executor = WorkflowExecutor(str(run.id))
+    executor.db = db_session
+    executor.state_store = RunStateStore()
+    # Step 1's result expired from Redis; step 0 was redone since the snapshot.
+    await executor.state_store.set_step_result(run.id, 0, "http", "new")
+    await executor.state_store.set_step_result(run.id, 2, "http", 2)
+    definition = WorkflowDefinition(version="1.0", steps=http_steps(4))
+
+    context = await executor._restore_context(run, definition)
+    assert context == {
+        "step_0": {"type": "http", "result": "new"},
+        "step_1": {"type": "http", "result": 1},
+        "step_2": {"type": "http", "result": 2},
+    }
+
+
+@pytest.mark.asyncio
+async def test_fresh_runs_start_with_an_empty_context(db_session, fake_redis):
+    run = await add_run(db_session, status="QUEUED")
+    executor = WorkflowExecutor(str(run.id))
+    executor.db = db_session
+    executor.state_store = RunStateStore()
+    definition = WorkflowDefinition(version="1.0", steps=http_steps(1))
+    assert await executor._restore_context(run, definition) == {}
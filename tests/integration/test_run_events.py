@@ -0,0 +1,111 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from apps.api.app.cache.run_state import encode_state, run_state_key
+from apps.api.app.db.models import Run, Workflow
+from apps.api.app.events.hub import run_event_hub
+from apps.api.app.routes.runs import run_events_websocket
+
+
+@pytest_asyncio.fixture(autouse=True)
+async def stop_hub():
+    yield
+    await run_event_hub.stop()
+
+
+def sse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        if lines:
+            events.append(json.loads(lines["data"]))
+    return events
+
+
+async def add_run(db_session, status):
+    workflow = Workflow(name="streamed", definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    run = Run(workflow_id=workflow.id, status=status, triggered_by="API", finished_at=datetime.utcnow())
+    db_session.add(run)
+    await db_session.commit()
+    return run
+
+
+async def cache_state(redis, run_id, status):
+    state = {"run_id": run_id, "workflow_id": str(uuid.uuid4()), "status": status, "created_at": datetime.utcnow()}
+    await redis.hset(run_state_key(run_id), mapping=encode_state(state))
+
+
+async def finish_soon(run_id):
+    # Once the stream has subscribed, as the worker would announce it.
+    while not run_event_hub._subscribers.get(run_id):
+        await asyncio.sleep(0.01)
+    run_event_hub.dispatch({"run_id": run_id, "event": "run_status", "status": "SUCCEEDED", "terminal": True})
+
+
+@pytest.mark.asyncio
+async def test_sse_reads_a_finished_run_from_postgres(client: AsyncClient, db_session, fake_redis):
+    run = await add_run(db_session, "SUCCEEDED")
+    response = await client.get(f"/runs/{run.id}/events")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    [state] = sse_events(response.text)
+    assert state["event"] == "state" and state["status"] == "SUCCEEDED"
+
+
+@pytest.mark.asyncio
+async def test_sse_streams_live_events_until_the_run_is_terminal(client: AsyncClient, fake_redis):
+    run_id = str(uuid.uuid4())
+    await cache_state(fake_redis, run_id, "RUNNING")
+    finisher = asyncio.create_task(finish_soon(run_id))
+    response = await client.get(f"/runs/{run_id}/events")
+    await finisher
+    events = sse_events(response.text)
+    assert [(event["event"], event["status"]) for event in events] == [("state", "RUNNING"), ("run_status", "SUCCEEDED")]
+    assert run_event_hub._subscribers == {}
+
+
+@pytest.mark.asyncio
+async def test_sse_for_an_unknown_run_is_404(client: AsyncClient, fake_redis):
+    response = await client.get(f"/runs/{uuid.uuid4()}/events")
+    assert response.status_code == 404
+
+
+class RecordingWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    async def accept(self):
+        pass
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_websocket_sends_state_then_events(fake_redis):
+    run_id = str(uuid.uuid4())
+    await cache_state(fake_redis, run_id, "RUNNING")
+    websocket = RecordingWebSocket()
+    finisher = asyncio.create_task(finish_soon(run_id))
+    await run_events_websocket(websocket, uuid.UUID(run_id))
+    await finisher
+    assert [event["event"] for event in websocket.sent] == ["state", "run_status"]
+    assert websocket.closed
+
+
+@pytest.mark.asyncio
+async def test_websocket_reports_unknown_runs(engine, fake_redis):
+    websocket = RecordingWebSocket()
+    await run_events_websocket(websocket, uuid.uuid4())
+    assert websocket.sent == [{"event": "error", "detail": "Run not found"}]
+    assert websocket.closed
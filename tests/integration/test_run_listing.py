@@ -0,0 +1,79 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from apps.api.app.cache.run_state import encode_state, run_state_key
+from apps.api.app.db.models import Run, Workflow
+
+
+async def add_runs(db_session, statuses, created_at=None):
+    workflow = Workflow(name="listed", definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    base = created_at or datetime.utcnow()
+    runs = [
+        # The last two share a created_at, so the id has to break the tie.
+        Run(workflow_id=workflow.id, status=status, triggered_by="API",
+            created_at=base - timedelta(seconds=min(index, len(statuses) - 2)))
+        for index, status in enumerate(statuses)
+    ]
+    db_session.add_all(runs)
+    await db_session.commit()
+    return workflow.id, runs
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_cover_every_run_once_in_order(client: AsyncClient, db_session, fake_redis):
+    workflow_id, runs = await add_runs(db_session, ["SUCCEEDED"] * 5)
+    expected = [str(run.id) for run in sorted(runs, key=lambda run: (run.created_at, run.id), reverse=True)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"workflow_id": str(workflow_id), "limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = (await client.get("/runs/", params=params)).json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+
+    response = await client.get(f"/workflows/{workflow_id}/runs", params={"limit": 3})
+    assert [item["id"] for item in response.json()["items"]] == expected[:3]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor_is_rejected(client: AsyncClient, fake_redis):
+    response = await client.get("/runs/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_live_state_is_overlaid_on_in_flight_rows_only(client: AsyncClient, db_session, fake_redis):
+    workflow_id, (running, finished) = await add_runs(db_session, ["RUNNING", "FAILED"])
+    for run in (running, finished):
+        state = {"run_id": str(run.id), "status": "SUCCEEDED", "current_step_index": 3}
+        await fake_redis.hset(run_state_key(run.id), mapping=encode_state(state))
+
+    items = (await client.get("/runs/", params={"workflow_id": str(workflow_id)})).json()["items"]
+    by_id = {item["id"]: item for item in items}
+    assert (by_id[str(running.id)]["status"], by_id[str(running.id)]["current_step_index"]) == ("SUCCEEDED", 3)
+    assert by_id[str(finished.id)]["status"] == "FAILED"
+
+
+@pytest.mark.asyncio
+async def test_batch_get_reads_redis_then_postgres(client: AsyncClient, db_session, fake_redis):
+    _, (in_db, _) = await add_runs(db_session, ["SUCCEEDED", "SUCCEEDED"])
+    in_redis, unknown = str(uuid.uuid4()), str(uuid.uuid4())
+    state = {"run_id": in_redis, "workflow_id": str(uuid.uuid4()), "status": "RUNNING", "created_at": datetime.utcnow()}
+    await fake_redis.hset(run_state_key(in_redis), mapping=encode_state(state))
+
+    ids = [unknown, in_redis, str(in_db.id), in_redis]
+    response = await client.post("/runs:batchGet", json={"ids": ids})
+    assert response.status_code == 200
+    body = response.json()
+    assert [(item["id"], item["status"]) for item in body["items"]] == [(in_redis, "RUNNING"), (str(in_db.id), "SUCCEEDED")]
+    assert body["not_found"] == [unknown]
+
+    # Not mistaken for GET /runs/{run_id}.
+    assert (await client.post("/runs:batchGet", json={"ids": []})).status_code == 422
+    assert (await client.get("/runs:batchGet")).status_code == 405
@@ -0,0 +1,117 @@
+import uuid
+from datetime import datetime, timedelta
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import select
+from apps.api.app.cache.run_state import run_state_key
+from apps.api.app.db.models import Run, Workflow, WorkflowSchedule
+from apps.api.app.events.bus import (
+    EVENT_STREAM_KEY,
+    SCHEDULED_RUNS_KEY,
+    SCHEDULES_KEY,
+    EventBus,
+    decode_event,
+    epoch,
+)
+from apps.worker.app import scheduler as scheduler_module
+from apps.worker.app.scheduler import RunScheduler, schedule_run_id
+
+
+@pytest.fixture
+def bus(monkeypatch, fake_redis):
+    bus = EventBus()
+    monkeypatch.setattr(scheduler_module, "event_bus", bus)
+    return bus
+
+
+async def add_workflow(db_session):
+    workflow = Workflow(name="scheduled", definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.commit()
+    return workflow
+
+
+async def stream_run_ids(redis):
+    return [decode_event(fields)["payload"]["run_id"] for _, fields in await redis.xrange(EVENT_STREAM_KEY)]
+
+
+async def run_status(db_session, run_id):
+    return await db_session.scalar(select(Run.status).where(Run.id == uuid.UUID(str(run_id))))
+
+
+@pytest.mark.asyncio
+async def test_run_at_in_the_past_starts_now_and_in_the_future_waits(client: AsyncClient, db_session, fake_redis):
+    workflow = await add_workflow(db_session)
+    now = datetime.utcnow()
+
+    past = (await client.post(f"/workflows/{workflow.id}/runs", json={"run_at": (now - timedelta(minutes=5)).isoformat()})).json()
+    assert past["status"] == "QUEUED"
+    assert await stream_run_ids(fake_redis) == [past["run_id"]]
+
+    future = (await client.post(f"/workflows/{workflow.id}/runs", json={"run_at": (now + timedelta(hours=1)).isoformat()})).json()
+    assert future["status"] == "SCHEDULED"
+    assert await stream_run_ids(fake_redis) == [past["run_id"]]
+    [(member, score)] = await fake_redis.zrange(SCHEDULED_RUNS_KEY, 0, -1, withscores=True)
+    assert future["run_id"] in member and score > epoch(now)
+    assert await fake_redis.hget(run_state_key(future["run_id"]), "status") == "SCHEDULED"
+
+
+@pytest.mark.asyncio
+async def test_due_runs_are_released_once(client: AsyncClient, db_session, fake_redis, bus):
+    workflow = await add_workflow(db_session)
+    now = datetime.utcnow()
+    runs = [
+        (await client.post(f"/workflows/{workflow.id}/runs", json={"run_at": (now + timedelta(minutes=minutes)).isoformat()})).json()
+        for minutes in (1, 60)
+    ]
+    scheduler = RunScheduler(batch_size=1)
+    later = now + timedelta(minutes=2)
+
+    assert await scheduler.release_due_runs(later) == 1
+    assert await stream_run_ids(fake_redis) == [runs[0]["run_id"]]
+    assert await fake_redis.hget(run_state_key(runs[0]["run_id"]), "status") == "QUEUED"
+    assert await run_status(db_session, runs[0]["run_id"]) == "QUEUED"
+    assert await run_status(db_session, runs[1]["run_id"]) == "SCHEDULED"
+
+    # A second pass, or another scheduler, has nothing left to release.
+    assert await scheduler.release_due_runs(later) == 0
+    assert await RunScheduler().release_due_runs(later) == 0
+    assert await stream_run_ids(fake_redis) == [runs[0]["run_id"]]
+
+
+@pytest.mark.asyncio
+async def test_a_retried_cron_fire_creates_its_run_once(db_session, fake_redis, bus):
+    workflow = await add_workflow(db_session)
+    schedule = WorkflowSchedule(workflow_id=workflow.id, cron="*/5 * * * *")
+    db_session.add(schedule)
+    await db_session.commit()
+    now = datetime(2030, 1, 1, 12, 1)
+    fire_at = epoch(datetime(2030, 1, 1, 12, 0))
+    await fake_redis.zadd(SCHEDULES_KEY, {str(schedule.id): fire_at})
+
+    assert await RunScheduler().fire_schedules(now) == 1
+    run_id = str(schedule_run_id(schedule.id, fire_at))
+    assert await stream_run_ids(fake_redis) == [run_id]
+    assert await fake_redis.zscore(SCHEDULES_KEY, str(schedule.id)) == epoch(datetime(2030, 1, 1, 12, 5))
+
+    # The same fire again, as after a crash before the schedule was advanced.
+    await fake_redis.hset(run_state_key(run_id), "status", "RUNNING")
+    await fake_redis.zadd(SCHEDULES_KEY, {str(schedule.id): fire_at})
+    assert await RunScheduler().fire_schedules(now) == 1
+    runs = (await db_session.scalars(select(Run.id).where(Run.workflow_id == workflow.id))).all()
+    assert [str(run) for run in runs] == [run_id]
+    # Re-published (executors skip runs already running), but its state is left alone.
+    assert await stream_run_ids(fake_redis) == [run_id, run_id]
+    assert await fake_redis.hget(run_state_key(run_id), "status") == "RUNNING"
+
+
+@pytest.mark.asyncio
+async def test_schedules_of_inactive_workflows_are_dropped(db_session, fake_redis, bus):
+    workflow = await add_workflow(db_session)
+    schedule = WorkflowSchedule(workflow_id=workflow.id, cron="*/5 * * * *", is_active=False)
+    db_session.add(schedule)
+    await db_session.commit()
+    await fake_redis.zadd(SCHEDULES_KEY, {str(schedule.id): epoch(datetime(2030, 1, 1))})
+
+    assert await RunScheduler().fire_schedules(datetime(2030, 1, 1, 0, 1)) == 0
+    assert await fake_redis.zcard(SCHEDULES_KEY) == 0
@@ -0,0 +1,67 @@
+import json
+import pytest
+from apps.api.app.cache import webhook_endpoints
+from apps.api.app.cache.webhook_endpoints import WebhookEndpointResolver
+from apps.api.app.db.models import WebhookEndpoint, Workflow
+
+
+@pytest.fixture
+def no_local_cache(monkeypatch):
+    monkeypatch.setattr(webhook_endpoints, "WEBHOOK_ENDPOINT_LOCAL_TTL_SECONDS", 0)
+
+
+async def add_endpoint(db_session, path, secret="s3cret"):
+    workflow = Workflow(name=path, definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    endpoint = WebhookEndpoint(workflow_id=workflow.id, path=path, secret=secret)
+    db_session.add(endpoint)
+    await db_session.commit()
+    return endpoint
+
+
+@pytest.mark.asyncio
+async def test_secret_is_kept_out_of_redis(db_session, fake_redis, no_local_cache):
+    await add_endpoint(db_session, "no-secret-in-redis")
+    api_a, api_b = WebhookEndpointResolver(), WebhookEndpointResolver()
+
+    assert (await api_a.resolve(db_session, "no-secret-in-redis")).secret == "s3cret"
+    shared = json.loads(await fake_redis.get("webhook_endpoint:no-secret-in-redis"))
+    assert "secret" not in shared and "s3cret" not in json.dumps(shared)
+
+    # A process that hasn't loaded the secret yet goes to Postgres for it...
+    assert (await api_b.resolve(db_session, "no-secret-in-redis")).secret == "s3cret"
+    assert api_b.stats()["misses"] == 1
+    # ...after which the Redis entry is enough.
+    assert (await api_b.resolve(db_session, "no-secret-in-redis")).secret == "s3cret"
+    assert api_b.stats() == {"entries": 1, "hits": 1, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_rotated_secret_is_reloaded_by_other_processes(db_session, fake_redis, no_local_cache):
+    endpoint = await add_endpoint(db_session, "rotated")
+    api_a, api_b = WebhookEndpointResolver(), WebhookEndpointResolver()
+    await api_a.resolve(db_session, "rotated")
+    await api_b.resolve(db_session, "rotated")
+
+    endpoint.secret = "rotated-secret"
+    await db_session.commit()
+    await api_a.invalidate("rotated")
+    assert (await api_a.resolve(db_session, "rotated")).secret == "rotated-secret"
+    # api_b sees a Redis entry with a version it has no secret for.
+    assert (await api_b.resolve(db_session, "rotated")).secret == "rotated-secret"
+
+
+@pytest.mark.asyncio
+async def test_unknown_paths_are_negatively_cached_until_invalidated(db_session, fake_redis, no_local_cache):
+    resolver = WebhookEndpointResolver()
+    assert await resolver.resolve(db_session, "later") is None
+    assert await fake_redis.get("webhook_endpoint:later") == "null"
+    assert await fake_redis.ttl("webhook_endpoint:later") <= webhook_endpoints.WEBHOOK_ENDPOINT_NEGATIVE_TTL_SECONDS
+
+    await add_endpoint(db_session, "later")
+    assert await resolver.resolve(db_session, "later") is None
+    assert resolver.stats()["misses"] == 1
+
+    await resolver.invalidate("later")
+    assert (await resolver.resolve(db_session, "later")).secret == "s3cret"
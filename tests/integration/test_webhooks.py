@@ -0,0 +1,49 @@
+import pytest
+from httpx import AsyncClient
+from apps.api.app.cache.webhook_dedupe import PENDING_PREFIX, WebhookDeduplicator, dedupe_key
+from apps.api.app.cache.webhook_endpoints import ResolvedEndpoint
+from apps.api.app.db.models import WebhookEndpoint, Workflow
+from apps.api.app.routes import webhooks
+
+
+@pytest.fixture
+def deduplicator(monkeypatch):
+    deduplicator = WebhookDeduplicator()
+    monkeypatch.setattr(webhooks, "webhook_deduplicator", deduplicator)
+    return deduplicator
+
+
+async def add_endpoint(db_session, path):
+    workflow = Workflow(name=path, definition_json={"version": "1.0", "steps": []})
+    db_session.add(workflow)
+    await db_session.flush()
+    endpoint = WebhookEndpoint(workflow_id=workflow.id, path=path, secret="s3cret")
+    db_session.add(endpoint)
+    await db_session.commit()
+    return endpoint
+
+
+def trigger(client, path, key):
+    return client.post(f"/webhooks/{path}", headers={"x-webhook-secret": "s3cret", "idempotency-key": key}, content=b"{}")
+
+
+@pytest.mark.asyncio
+async def test_retries_get_the_original_run(client: AsyncClient, db_session, fake_redis, deduplicator):
+    await add_endpoint(db_session, "retried")
+    first = (await trigger(client, "retried", "order-1")).json()
+    second = (await trigger(client, "retried", "order-1")).json()
+    assert second == {"run_id": first["run_id"], "duplicate": True}
+    assert deduplicator.stats() == {"claims": 1, "duplicates": 1, "in_progress": 0}
+
+
+@pytest.mark.asyncio
+async def test_retry_during_an_unfinished_delivery_is_refused(client: AsyncClient, db_session, fake_redis, deduplicator):
+    endpoint = await add_endpoint(db_session, "in-flight")
+    resolved = ResolvedEndpoint(id=str(endpoint.id), workflow_id=str(endpoint.workflow_id), tenant_id=None, is_active=True, secret="")
+    key, _ = dedupe_key(resolved, "order-1", b"{}")
+    # The first delivery has claimed the key but not committed its run.
+    await fake_redis.set(key, PENDING_PREFIX + "some-run", ex=30)
+
+    response = await trigger(client, "in-flight", "order-1")
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "1"
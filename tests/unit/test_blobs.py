@@ -0,0 +1,27 @@
+import pytest
+from apps.worker.app.blobs import LocalBlobStore, is_ref, load, offload
+
+
+@pytest.mark.asyncio
+async def test_local_store_is_content_addressed(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    digest = await store.put(b"payload")
+    assert await store.put(b"payload") == digest
+    assert await store.get(digest) == b"payload"
+    assert await store.exists(digest)
+    with pytest.raises(KeyError):
+        await store.get("0" * 64)
+
+
+@pytest.mark.asyncio
+async def test_large_results_are_replaced_by_references(tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    small = {"id": 1}
+    large = {"items": ["x" * 100] * 100}
+
+    assert await offload(small, store, threshold=1024) is small
+    ref = await offload(large, store, threshold=1024)
+    assert is_ref(ref)
+    assert ref["size"] > 1024
+    assert await load(ref, store) == large
+    assert await load(small, store) is small
@@ -0,0 +1,82 @@
+import pytest
+from apps.worker.app.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(clock):
+    return CircuitBreaker("api.test", window_seconds=10, min_requests=4, failure_rate=0.5, open_seconds=5, clock=clock)
+
+
+def test_opens_when_failure_rate_crosses_threshold():
+    clock = Clock()
+    b = breaker(clock)
+    for success in (True, False, True):
+        b.before_request()
+        b.record(success)
+    assert b.state == CLOSED
+    b.record(False)
+    assert b.state == OPEN
+    with pytest.raises(CircuitOpen):
+        b.before_request()
+
+
+def test_old_outcomes_leave_the_window():
+    clock = Clock()
+    b = breaker(clock)
+    b.record(False)
+    b.record(False)
+    clock.now = 20
+    b.record(True)
+    b.record(False)
+    assert b.state == CLOSED
+
+
+def test_half_open_probe_closes_or_reopens():
+    clock = Clock()
+    b = breaker(clock)
+    for _ in range(4):
+        b.record(False)
+    clock.now = 6
+    probe = b.before_request()
+    assert b.state == HALF_OPEN
+    with pytest.raises(CircuitOpen):
+        b.before_request()  # only one probe at a time
+    b.record(False, probe)
+    assert b.state == OPEN
+
+    clock.now = 12
+    probe = b.before_request()
+    b.record(True, probe)
+    assert b.state == CLOSED
+
+
+def test_only_the_probe_resolves_a_half_open_circuit():
+    clock = Clock()
+    b = breaker(clock)
+    stale = b.before_request()
+    assert stale is None
+    for _ in range(4):
+        b.record(False)
+    clock.now = 6
+    probe = b.before_request()
+
+    # A request sent before the circuit opened finishes while the probe is out.
+    b.abandon(stale)
+    with pytest.raises(CircuitOpen):
+        b.before_request()
+    b.record(True, stale)
+    assert b.state == HALF_OPEN
+
+    b.abandon(probe)
+    next_probe = b.before_request()
+    b.record(True, probe)
+    assert b.state == HALF_OPEN
+    b.record(True, next_probe)
+    assert b.state == CLOSED
@@ -0,0 +1,282 @@
+import asyncio
+import uuid
+import pytest
+from apps.api.app.events.bus import EVENT_CONSUMER_GROUP, EVENT_STREAMS_KEY, event_bus, run_stream_key
+from apps.worker.app.events import consumer as consumer_module
+from apps.worker.app.events.consumer import StreamConsumer
+from apps.worker.app.task_scheduler import Job, TaskScheduler
+
+
+def backlog_job(consumer, run_id, stream, gate, tenant_id=None):
+    async def work():
+        await gate.wait()
+    consumer._backlog.push(
+        stream,
+        Job(run_id=run_id, factory=work, tenant_id=tenant_id, item=(stream, f"{run_id}-0")),
+        consumer.weight(stream),
+    )
+
+
+@pytest.mark.asyncio
+async def test_capped_tenant_is_held_without_blocking_other_streams():
+    gate = asyncio.Event()
+    scheduler = TaskScheduler(max_concurrency=4, max_per_tenant=1)
+    consumer = StreamConsumer(None, scheduler)
+    stream_a, stream_b = run_stream_key({"tenant_id": "a"}), run_stream_key({"tenant_id": "b"})
+    consumer.streams = [stream_a, stream_b]
+    for i in range(5):
+        backlog_job(consumer, f"a{i}", stream_a, gate, tenant_id="a")
+
+    consumer._start_backlog()
+    assert (scheduler.running, scheduler.parked) == (1, 1)
+    assert [job.run_id for job in consumer._held[stream_a]] == ["a2", "a3", "a4"]
+    assert scheduler.free_slots() == 3
+    assert consumer.readable_streams() == [stream_b]
+    assert list(consumer.read_quotas(3)) == [stream_b]
+
+    backlog_job(consumer, "b0", stream_b, gate, tenant_id="b")
+    consumer._start_backlog()
+    assert scheduler.running == 2
+
+    gate.set()
+    while consumer._held:
+        await scheduler.wait_for_change(timeout=1)
+        consumer._start_backlog()
+    assert consumer.readable_streams() == [stream_a, stream_b]
+    await scheduler.drain(timeout=1)
+
+
+def tenant_streams(*tenants):
+    return [run_stream_key({"tenant_id": tenant}) for tenant in tenants]
+
+
+def test_idle_streams_are_probed_in_turns_up_to_count():
+    consumer = StreamConsumer(None, TaskScheduler(max_concurrency=4))
+    consumer.streams = tenant_streams("a", "b", "c", "d", "e")
+    consumer._busy = {consumer.streams[0]}
+
+    first = consumer.read_quotas(2)
+    assert first == {consumer.streams[0]: 2, consumer.streams[1]: 1, consumer.streams[2]: 1}
+    second = consumer.read_quotas(2)
+    assert list(second)[1:] == consumer.streams[3:5]
+    third = consumer.read_quotas(2)
+    assert list(third)[1:] == consumer.streams[1:3]
+
+
+async def attach(consumer):
+    # What StreamConsumer.run() does before its first read.
+    await consumer.ensure_groups([consumer_module.EVENT_STREAM_KEY])
+    await consumer.refresh_streams()
+
+
+async def publish(tenant, count):
+    await event_bus.publish_many(
+        [("RunStarted", {"run_id": str(uuid.uuid4()), "tenant_id": tenant}, None) for _ in range(count)]
+    )
+
+
+@pytest.mark.asyncio
+async def test_read_splits_count_between_busy_streams(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler(max_concurrency=8))
+    await publish("a", 5)
+    await publish("b", 1)
+    await attach(consumer)
+    stream_a, stream_b = tenant_streams("a", "b")
+
+    entries = await consumer._read(4)
+    assert sorted(stream for stream, _, _ in entries) == [stream_a, stream_b]
+    assert consumer._busy == {stream_a, stream_b}
+
+    entries = await consumer._read(4)
+    assert [stream for stream, _, _ in entries] == [stream_a, stream_a]
+    assert consumer._busy == {stream_a}
+
+    entries = await consumer._read(4)
+    assert [stream for stream, _, _ in entries] == [stream_a, stream_a]
+    assert consumer._busy == set()
+    # Everything is empty: falls back to one read across every stream.
+    assert await consumer._read(4) == []
+
+
+@pytest.mark.asyncio
+async def test_read_falls_back_to_streams_it_did_not_probe(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler(max_concurrency=8))
+    await publish("a", 1)
+    await publish("b", 1)
+    await publish("c", 1)
+    await attach(consumer)
+    await consumer._read(8)
+    await publish("c", 1)
+
+    # One probe, of the empty base stream; the blocking read still finds c's entry.
+    consumer._busy = set()
+    consumer._probe_cursor = 0
+    assert list(consumer.read_quotas(1)) == [consumer_module.EVENT_STREAM_KEY]
+    consumer._probe_cursor = 0
+    entries = await consumer._read(1)
+    assert [stream for stream, _, _ in entries] == tenant_streams("c")
+
+
+@pytest.mark.asyncio
+async def test_reclaim_takes_over_idle_entries_of_another_consumer(fake_redis, monkeypatch):
+    monkeypatch.setattr(consumer_module, "EVENT_VISIBILITY_TIMEOUT_MS", 0)
+    await publish("a", 2)
+    dead = StreamConsumer(fake_redis, TaskScheduler(), consumer_name="dead")
+    await attach(dead)
+    # The first read probes; the second takes the rest of the now busy stream.
+    assert len(await dead._read(2) + await dead._read(2)) == 2
+
+    live = StreamConsumer(fake_redis, TaskScheduler(), consumer_name="live")
+    await attach(live)
+    stream_a = tenant_streams("a")[0]
+    reclaimed = await live._reclaim(8)
+    assert [(entry_id, fields) for _, entry_id, fields in reclaimed] == await fake_redis.xrange(stream_a)
+    pending = await fake_redis.xpending_range(stream_a, EVENT_CONSUMER_GROUP, "-", "+", 10)
+    assert {p["consumer"] for p in pending} == {"live"}
+    assert {p["times_delivered"] for p in pending} == {2}
+
+
+@pytest.mark.asyncio
+async def test_empty_streams_are_pruned_until_their_tenant_publishes_again(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler())
+    await publish("a", 1)
+    await publish("b", 1)
+    await attach(consumer)
+    stream_a, stream_b = tenant_streams("a", "b")
+    entries = await consumer._read(8)
+    for stream, entry_id, _ in entries:
+        if stream == stream_a:
+            await consumer._ack((stream, entry_id))
+
+    assert await consumer.prune_streams(idle_seconds=0) == [stream_a]
+    assert await fake_redis.smembers(EVENT_STREAMS_KEY) == {stream_b}
+    assert stream_a not in consumer.streams
+
+    # Another worker drops it on refresh, and picks it up again once it's published to.
+    other = StreamConsumer(fake_redis, TaskScheduler(), consumer_name="other")
+    other.streams.append(stream_a)
+    await attach(other)
+    assert stream_a not in other.streams
+    await publish("a", 1)
+    await attach(other)
+    assert stream_a in other.streams
+    assert [stream for stream, _, _ in await other._read(8)] == [stream_a]
+
+
+async def read_all(consumer, count=8):
+    entries = []
+    while batch := await consumer._read(count):
+        entries.extend(batch)
+    return entries
+
+
+@pytest.mark.asyncio
+async def test_ack_removes_the_entry_from_the_stream_and_pending_list(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler())
+    await event_bus.publish("RunCanceled", {"run_id": "r1", "tenant_id": "a"})
+    await attach(consumer)
+    [(stream, entry_id, fields)] = await read_all(consumer)
+
+    # Events other than RunStarted are acked as soon as they're dispatched.
+    await consumer._dispatch(stream, entry_id, fields)
+    assert await fake_redis.xlen(stream) == 0
+    assert (await fake_redis.xpending(stream, EVENT_CONSUMER_GROUP))["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_entries_are_dead_lettered_after_max_deliveries(fake_redis, monkeypatch):
+    monkeypatch.setattr(consumer_module, "EVENT_VISIBILITY_TIMEOUT_MS", 0)
+    monkeypatch.setattr(consumer_module, "EVENT_MAX_DELIVERIES", 1)
+    await publish("a", 1)
+    stream_a = tenant_streams("a")[0]
+    dead = StreamConsumer(fake_redis, TaskScheduler(), consumer_name="dead")
+    await attach(dead)
+    [(_, entry_id, fields)] = await read_all(dead)
+
+    live = StreamConsumer(fake_redis, TaskScheduler(), consumer_name="live")
+    await attach(live)
+    assert await live._reclaim(8) == []
+    assert await fake_redis.xlen(stream_a) == 0
+    [(_, dead_fields)] = await fake_redis.xrange(consumer_module.EVENT_DEAD_LETTER_KEY)
+    assert dead_fields == {**fields, "stream": stream_a, "original_id": entry_id, "reason": "exceeded 1 deliveries"}
+
+
+@pytest.mark.asyncio
+async def test_undecodable_entries_are_dead_lettered(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler())
+    await attach(consumer)
+    await fake_redis.xadd(consumer_module.EVENT_STREAM_KEY, {"event": "RunStarted", "payload": "{not json"})
+    [(stream, entry_id, fields)] = await read_all(consumer)
+
+    await consumer._dispatch(stream, entry_id, fields)
+    assert await fake_redis.xlen(stream) == 0
+    [(_, dead_fields)] = await fake_redis.xrange(consumer_module.EVENT_DEAD_LETTER_KEY)
+    assert dead_fields["reason"].startswith("undecodable payload")
+
+
+@pytest.mark.asyncio
+async def test_extend_visibility_resets_idle_time_without_counting_a_delivery(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler())
+    await publish("a", 1)
+    await attach(consumer)
+    [(stream, entry_id, fields)] = await read_all(consumer)
+    consumer._inflight[(stream, entry_id)] = fields
+
+    await asyncio.sleep(0.05)
+    [before] = await fake_redis.xpending_range(stream, EVENT_CONSUMER_GROUP, "-", "+", 1)
+    await consumer._extend_visibility()
+    [after] = await fake_redis.xpending_range(stream, EVENT_CONSUMER_GROUP, "-", "+", 1)
+    assert before["time_since_delivered"] >= 50 > after["time_since_delivered"]
+    assert after["times_delivered"] == before["times_delivered"] == 1
+
+
+@pytest.mark.asyncio
+async def test_drain_returns_unstarted_runs_to_their_streams(fake_redis):
+    consumer = StreamConsumer(fake_redis, TaskScheduler())
+    await publish("a", 2)
+    await attach(consumer)
+    entries = await read_all(consumer)
+    for stream, entry_id, fields in entries:
+        await consumer._dispatch(stream, entry_id, fields)
+    assert len(consumer._backlog) == 2
+
+    await consumer.drain()
+    stream_a = tenant_streams("a")[0]
+    republished = await fake_redis.xrange(stream_a)
+    assert [fields for _, fields in republished] == [fields for _, _, fields in entries]
+    assert {entry_id for entry_id, _ in republished}.isdisjoint(entry_id for _, entry_id, _ in entries)
+    assert (await fake_redis.xpending(stream_a, EVENT_CONSUMER_GROUP))["pending"] == 0
+    assert consumer._inflight == {}
+
+
+def failing_executor(failure):
+    class Executor:
+        def __init__(self, run_id, **kwargs):
+            self.run_id = run_id
+
+        async def execute(self):
+            if failure == "cancel":
+                # What Lease.keep_alive does to the owner task when the lease is lost.
+                asyncio.current_task().cancel()
+                await asyncio.sleep(0)
+            raise RuntimeError("lease acquire failed: connection reset")
+    return Executor
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", ["raise", "cancel"])
+async def test_runs_that_do_not_finish_are_left_pending_for_redelivery(fake_redis, monkeypatch, failure):
+    monkeypatch.setattr(consumer_module, "WorkflowExecutor", failing_executor(failure))
+    scheduler = TaskScheduler()
+    consumer = StreamConsumer(fake_redis, scheduler)
+    await publish("a", 1)
+    await attach(consumer)
+    [(stream, entry_id, fields)] = await read_all(consumer)
+
+    await consumer._dispatch(stream, entry_id, fields)
+    consumer._start_backlog()
+    await scheduler.drain(timeout=1)
+    assert consumer._inflight == {}
+    assert await fake_redis.xrange(stream) == [(entry_id, fields)]
+    [pending] = await fake_redis.xpending_range(stream, EVENT_CONSUMER_GROUP, "-", "+", 10)
+    assert pending["message_id"] == entry_id
@@ -0,0 +1,28 @@
+from datetime import datetime
+import pytest
+from apps.worker.app.scheduler import schedule_run_id
+from shared.shared.cron import CronExpression
+
+
+@pytest.mark.parametrize("expression, after, expected", [
+    ("*/15 * * * *", datetime(2024, 1, 1, 10, 7, 30), datetime(2024, 1, 1, 10, 15)),
+    ("@daily", datetime(2024, 1, 31, 23, 59), datetime(2024, 2, 1, 0, 0)),
+    ("0 9 * * mon-fri", datetime(2024, 1, 5, 9, 0), datetime(2024, 1, 8, 9, 0)),
+    ("30 2 29 feb *", datetime(2024, 3, 1), datetime(2028, 2, 29, 2, 30)),
+    # Both day fields restricted: either one matching fires.
+    ("0 0 13 * 5", datetime(2024, 1, 1), datetime(2024, 1, 5, 0, 0)),
+    ("0 0 * * 7", datetime(2024, 1, 1), datetime(2024, 1, 7, 0, 0)),
+])
+def test_next_after(expression, after, expected):
+    assert CronExpression.parse(expression).next_after(after) == expected
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "60 * * * *", "*/0 * * * *", "5-1 * * * *", "0 0 30 2 *", "0 0 * * funday"])
+def test_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        CronExpression.parse(expression)
+
+
+def test_schedule_run_ids_are_stable_per_fire():
+    assert schedule_run_id("s", 1700000000.0) == schedule_run_id("s", 1700000000.0)
+    assert schedule_run_id("s", 1700000000.0) != schedule_run_id("s", 1700000060.0)
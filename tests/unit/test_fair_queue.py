@@ -0,0 +1,53 @@
+import pytest
+from apps.api.app.events.bus import EVENT_STREAM_KEY, run_stream_key, stream_flow
+from apps.worker.app.events.consumer import StreamConsumer
+from apps.worker.app.fair_queue import FairQueue, parse_weights
+from apps.worker.app.task_scheduler import TaskScheduler
+
+
+def test_small_flow_is_not_stuck_behind_a_backlog():
+    queue = FairQueue()
+    for i in range(100):
+        queue.push("noisy", f"noisy{i}")
+    queue.pop()
+    queue.push("quiet", "quiet0")
+    assert [queue.pop() for _ in range(3)] == ["noisy1", "quiet0", "noisy2"]
+
+
+def test_backlogged_flows_share_by_weight():
+    queue = FairQueue()
+    for i in range(40):
+        queue.push("high", "high", weight=4)
+        queue.push("low", "low", weight=1)
+    served = [queue.pop() for _ in range(20)]
+    assert served.count("high") == 16
+    assert len(queue.drain()) == 60
+    assert len(queue) == 0
+
+
+def test_parse_weights():
+    assert parse_weights(" high=8, low=0.5 ,") == {"high": 8.0, "low": 0.5}
+    with pytest.raises(ValueError):
+        parse_weights("low=0")
+
+
+@pytest.mark.parametrize("payload, flow", [
+    ({"tenant_id": None}, ("normal", None)),
+    ({"tenant_id": "t1", "priority": "high"}, ("high", "t1")),
+    ({"tenant_id": None, "priority": "low"}, ("low", None)),
+])
+def test_stream_keys_round_trip(payload, flow):
+    assert stream_flow(run_stream_key(payload)) == flow
+
+
+def test_busy_streams_split_reads_by_weight():
+    consumer = StreamConsumer(None, TaskScheduler(), priority_weights="high=3,normal=1", tenant_weights="big=0.5")
+    high, normal, big, idle = (
+        run_stream_key({"tenant_id": "a", "priority": "high"}),
+        run_stream_key({"tenant_id": "a"}),
+        run_stream_key({"tenant_id": "big"}),
+        run_stream_key({"tenant_id": "b"}),
+    )
+    consumer.streams = [EVENT_STREAM_KEY, high, normal, big, idle]
+    consumer._busy = {high, normal, big}
+    assert consumer.read_quotas(18) == {EVENT_STREAM_KEY: 1, high: 12, normal: 4, big: 2, idle: 1}
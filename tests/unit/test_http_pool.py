@@ -0,0 +1,68 @@
+import asyncio
+import httpx
+import pytest
+import pytest_asyncio
+from apps.worker.app.http_pool import HTTPClientPool
+
+
+@pytest_asyncio.fixture
+async def server():
+    """A keep-alive HTTP/1.1 server on localhost; yields its base URL and a connection counter."""
+    connections = []
+
+    async def handle(reader, writer):
+        connections.append(writer)
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    srv = await asyncio.start_server(handle, "127.0.0.1", 0)
+    port = srv.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}", connections
+    srv.close()
+    await srv.wait_closed()
+
+
+def test_clients_are_per_origin_with_an_overflow_client():
+    pool = HTTPClientPool(max_hosts=2)
+    a = pool.client_for(httpx.URL("https://a.example/x"))
+    assert pool.client_for(httpx.URL("https://a.example:443/y")) is a
+    assert pool.client_for(httpx.URL("http://a.example/x")) is not a
+    overflow = pool.client_for(httpx.URL("https://b.example/"))
+    assert pool.client_for(httpx.URL("https://c.example/")) is overflow
+    assert pool.stats()["hosts"] == 2 and pool.stats()["overflow"]
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_keep_alive_connections(server):
+    url, connections = server
+    pool = HTTPClientPool()
+    try:
+        for _ in range(3):
+            assert (await pool.request("GET", f"{url}/ping")).text == "ok"
+        async with pool.stream("GET", f"{url}/stream") as response:
+            assert await response.aread() == b"ok"
+    finally:
+        await pool.close()
+    assert len(connections) == 1
+    stats = pool.stats()
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["per_host"] == {"127.0.0.1": {"hits": 3, "misses": 1}}
+
+
+@pytest.mark.asyncio
+async def test_failed_requests_are_counted(server):
+    url, _ = server
+    pool = HTTPClientPool()
+    dead_url = url.rsplit(":", 1)[0] + ":1"
+    try:
+        with pytest.raises(httpx.ConnectError):
+            await pool.request("GET", dead_url)
+    finally:
+        await pool.close()
+    assert pool.stats()["misses"] == 1
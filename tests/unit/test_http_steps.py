@@ -0,0 +1,89 @@
+import json
+import httpx
+import pytest
+from apps.worker.app import http_steps
+from apps.worker.app.blobs import LocalBlobStore, is_ref, load
+from apps.worker.app.circuit_breaker import CLOSED, CircuitBreakerRegistry
+from apps.worker.app.http_pool import HTTPClientPool
+from apps.worker.app.rate_limit import HostRateLimiter, RateLimitExceeded
+from shared.shared.schemas.workflow import HTTPStep
+
+DOCUMENT = {"meta": {"total": 2}, "items": [{"id": "a"}, {"id": "b"}], "padding": "x" * 10_000}
+
+
+class MockPool(HTTPClientPool):
+    def _new_client(self):
+        def handler(request):
+            return httpx.Response(200, content=json.dumps(DOCUMENT).encode(), headers={"content-type": "application/json"})
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = MockPool()
+    monkeypatch.setattr(http_steps, "http_pool", pool)
+    return pool
+
+
+def step(**fields):
+    return HTTPStep(type="http", method="GET", url="http://upstream.test/export", **fields)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("streaming", [True, False])
+async def test_extract_keeps_only_requested_fields(pool, monkeypatch, streaming):
+    if streaming:
+        pytest.importorskip("ijson")
+    else:
+        monkeypatch.setattr(http_steps, "ijson", None)
+    result = await http_steps.execute_http_step(step(extract={"total": "$.meta.total", "second": "items[1].id"}), None)
+    assert result == {"total": 2, "second": "b"}
+
+
+@pytest.mark.asyncio
+async def test_buffered_extract_warns_once_without_ijson(pool, monkeypatch, caplog):
+    monkeypatch.setattr(http_steps, "ijson", None)
+    monkeypatch.setattr(http_steps, "_warned_buffered_extract", False)
+    for _ in range(2):
+        await http_steps.execute_http_step(step(extract={"total": "$.meta.total"}), None)
+    assert [r.message for r in caplog.records if "ijson" in r.message] == [
+        "HTTP steps use 'extract' but the 'ijson' package is not installed; "
+        "whole responses (up to max_response_bytes) are buffered before extracting"
+    ]
+
+
+@pytest.mark.asyncio
+async def test_response_over_limit_fails(pool):
+    with pytest.raises(http_steps.ResponseTooLarge):
+        await http_steps.execute_http_step(step(max_response_bytes=1024), None)
+
+
+@pytest.mark.asyncio
+async def test_raw_mode_streams_body_to_blob_store(pool, tmp_path):
+    store = LocalBlobStore(str(tmp_path))
+    ref = await http_steps.execute_http_step(step(response_mode="raw"), store)
+    assert is_ref(ref)
+    assert ref["media_type"] == "application/json"
+    assert await load(ref, store) == DOCUMENT
+
+
+class ExhaustedRateLimiter:
+    async def acquire(self, host):
+        raise RateLimitExceeded(host, 60)
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_failure_releases_half_open_probe(pool, monkeypatch):
+    now = [0.0]
+    breakers = CircuitBreakerRegistry(min_requests=1, failure_rate=0.5, open_seconds=5, clock=lambda: now[0])
+    breakers.get("upstream.test").record(False)
+    now[0] = 10.0  # due for a half-open probe
+    monkeypatch.setattr(http_steps, "circuit_breakers", breakers)
+    monkeypatch.setattr(http_steps, "rate_limiter", ExhaustedRateLimiter())
+
+    with pytest.raises(RateLimitExceeded):
+        await http_steps.execute_http_step(step(), None)
+
+    monkeypatch.setattr(http_steps, "rate_limiter", HostRateLimiter())
+    assert await http_steps.execute_http_step(step(), None) == DOCUMENT
+    assert breakers.get("upstream.test").state == CLOSED
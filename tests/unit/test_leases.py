@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from apps.worker.app.leases import Lease, run_lease_key
+
+
+@pytest.mark.asyncio
+async def test_only_the_owner_renews_or_releases(fake_redis):
+    key = run_lease_key("r1")
+    first, second = Lease(key, ttl_ms=10_000), Lease(key, ttl_ms=10_000)
+    assert await first.acquire()
+    assert not await second.acquire()
+
+    assert not await second.renew()
+    await second.release()
+    assert await fake_redis.get(key) == first.token
+
+    await fake_redis.pexpire(key, 100)
+    assert await first.renew()
+    assert await fake_redis.pttl(key) > 100
+    await first.release()
+    assert await fake_redis.get(key) is None
+    assert await second.acquire()
+
+
+@pytest.mark.asyncio
+async def test_expired_lease_taken_over_by_another_owner_is_left_alone(fake_redis):
+    key = run_lease_key("r1")
+    first = Lease(key, ttl_ms=10_000)
+    assert await first.acquire()
+    # The lease expired and another worker took it.
+    await fake_redis.delete(key)
+    second = Lease(key, ttl_ms=10_000)
+    assert await second.acquire()
+
+    assert not await first.renew()
+    await first.release()
+    assert await fake_redis.get(key) == second.token
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_renews_until_the_block_ends(fake_redis):
+    lease = Lease(run_lease_key("r1"), ttl_ms=60)
+    assert await lease.acquire()
+    async with lease.keep_alive():
+        await asyncio.sleep(0.15)
+    assert lease.held
+    assert await fake_redis.get(lease.key) == lease.token
+
+
+@pytest.mark.asyncio
+async def test_keep_alive_cancels_the_owner_after_a_failed_renew(fake_redis):
+    lease = Lease(run_lease_key("r1"), ttl_ms=60)
+    assert await lease.acquire()
+    reached_end = False
+
+    async def owner():
+        nonlocal reached_end
+        async with lease.keep_alive():
+            await fake_redis.set(lease.key, "another-worker")
+            await asyncio.sleep(1)
+            reached_end = True
+
+    task = asyncio.create_task(owner())
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(task, 1)
+    assert not reached_end
+    assert not lease.held
+    assert await fake_redis.get(lease.key) == "another-worker"
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import httpx
+import pytest
+import pytest_asyncio
+from apps.worker.app.http_pool import HTTPClientPool
+from apps.worker.app.mcp import session as mcp_session
+from apps.worker.app.mcp.client import MCPClientManager, MCPToolError
+from apps.worker.app.mcp.session import MCPError
+from tests.fakes import fake_mcp_server
+
+FAKE_SERVER = str(Path(__file__).parent.parent / "fakes" / "fake_mcp_server.py")
+
+
+@pytest_asyncio.fixture
+async def stdio_clients():
+    clients = MCPClientManager({
+        "fake": {"transport": "stdio", "command": [sys.executable, FAKE_SERVER], "pool_size": 2, "max_inflight_per_session": 4},
+    })
+    yield clients
+    await clients.close()
+
+
+@pytest.mark.asyncio
+async def test_stdio_session_is_reused_across_calls(stdio_clients):
+    assert (await stdio_clients.call_tool("add", {"a": 2, "b": 3}))["structuredContent"] == {"sum": 5}
+    await stdio_clients.call_tool("echo", {"x": 1})
+    stats = (await stdio_clients.call_tool("stats", {}))["structuredContent"]
+    assert stats["initialize"] == 1
+    assert stdio_clients.stats()["fake"]["sessions_started"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_are_multiplexed_within_the_pool(stdio_clients):
+    results = await asyncio.gather(*(
+        stdio_clients.call_tool("sleep", {"seconds": 0.2}) for _ in range(8)
+    ))
+    assert len(results) == 8
+    # Four calls per session, two sessions: no more processes than that.
+    assert stdio_clients.stats()["fake"]["sessions_started"] == 2
+
+
+@pytest.mark.asyncio
+async def test_tool_errors_and_unknown_tools_raise(stdio_clients):
+    with pytest.raises(MCPToolError, match="tool exploded"):
+        await stdio_clients.call_tool("fail", {})
+    with pytest.raises(MCPError, match="Unknown tool"):
+        await stdio_clients.call_tool("missing", {})
+
+
+@pytest.mark.asyncio
+async def test_tools_list_is_paginated_and_cached(stdio_clients):
+    pool = stdio_clients.pool("fake")
+    tools = await pool.list_tools()
+    assert [tool["name"] for tool in tools] == [tool["name"] for tool in fake_mcp_server.TOOLS]
+    await pool.list_tools()
+    stats = (await stdio_clients.call_tool("stats", {}))["structuredContent"]
+    assert stats["tools/list"] == 2  # two pages, fetched once
+
+
+class FakeHTTPServerPool(HTTPClientPool):
+    """Routes MCP-over-HTTP requests to the fake server's handler, replying with SSE."""
+
+    def _new_client(self):
+        async def handler(request):
+            reply = await fake_mcp_server.handle(json.loads(request.content))
+            if reply is None:
+                return httpx.Response(202)
+            body = f"event: message\ndata: {json.dumps(reply)}\n\n"
+            return httpx.Response(200, content=body.encode(), headers={
+                "content-type": "text/event-stream",
+                "mcp-session-id": "session-1",
+            })
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_http_transport(monkeypatch):
+    monkeypatch.setattr(mcp_session, "http_pool", FakeHTTPServerPool())
+    clients = MCPClientManager({"remote": {"transport": "http", "url": "http://mcp.test/mcp"}})
+    result = await clients.call_tool("echo", {"hello": "world"})
+    assert result["structuredContent"] == {"hello": "world"}
+    assert clients.pool("remote")._sessions[0].session_id == "session-1"
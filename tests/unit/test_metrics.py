@@ -0,0 +1,80 @@
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+from apps.api.app import tracing
+from apps.api.app.metrics import StatsCollector
+from apps.worker.app.executor import StepFailed, WorkflowExecutor
+from apps.worker.app.metrics import host_label
+from shared.shared.schemas.workflow import WorkflowDefinition
+
+
+def test_stats_are_exported_as_gauges():
+    collector = StatsCollector()
+    collector.register("cache", lambda: {"hits": 3, "enabled": True, "per_host": {"a": 1}})
+    collector.register("mcp", lambda: {"search": {"sessions": 2}, "files": {"sessions": 1}}, label="server")
+    registry = CollectorRegistry()
+    registry.register(collector)
+
+    assert registry.get_sample_value("orchestrator_cache_hits") == 3
+    assert registry.get_sample_value("orchestrator_cache_enabled") == 1
+    assert registry.get_sample_value("orchestrator_mcp_sessions", {"server": "files"}) == 1
+    assert b"per_host" not in generate_latest(registry)
+
+
+def test_host_labels_are_capped(monkeypatch):
+    monkeypatch.setattr("apps.worker.app.metrics.METRICS_MAX_HOSTS", 1)
+    monkeypatch.setattr("apps.worker.app.metrics._hosts", set())
+    assert host_label("a.test") == "a.test"
+    assert host_label("b.test") == "other"
+    assert host_label("a.test") == "a.test"
+
+
+class FakeStateStore:
+    async def update(self, run_id, **fields):
+        pass
+
+    async def set_step_result(self, run_id, index, step_type, result):
+        pass
+
+
+class FlakyExecutor(WorkflowExecutor):
+    def __init__(self):
+        super().__init__("00000000-0000-0000-0000-000000000000")
+        self.state_store = FakeStateStore()
+
+    async def _execute_step(self, step, context):
+        if step.input.get("fail"):
+            raise RuntimeError("boom")
+        return step.input
+
+
+def step_count(outcome):
+    return REGISTRY.get_sample_value("orchestrator_step_duration_seconds_count", {"step_type": "mcp_tool", "outcome": outcome}) or 0
+
+
+@pytest.mark.asyncio
+async def test_step_durations_are_recorded_by_outcome():
+    workflow = WorkflowDefinition(version="1.0", steps=[
+        {"type": "mcp_tool", "tool_name": "t", "input": {}},
+        {"type": "mcp_tool", "tool_name": "t", "input": {"fail": True}},
+    ])
+    ok, error = step_count("ok"), step_count("error")
+    with pytest.raises(StepFailed):
+        await FlakyExecutor()._run_sequential(None, workflow, {})
+    assert step_count("ok") == ok + 1
+    assert step_count("error") == error + 1
+
+
+def test_trace_context_round_trips_through_a_carrier():
+    sdk = pytest.importorskip("opentelemetry.sdk.trace")
+    from opentelemetry import trace
+
+    provider = sdk.TracerProvider()
+    tracer = provider.get_tracer("test")
+    with tracer.start_as_current_span("ingress") as ingress:
+        carrier = tracing.inject()
+    assert carrier["traceparent"].split("-")[1] == format(ingress.get_span_context().trace_id, "032x")
+
+    trace.set_tracer_provider(provider)
+    with tracing.span("run.execute", carrier) as run:
+        assert run.get_span_context().trace_id == ingress.get_span_context().trace_id
+        assert run.parent.span_id == ingress.get_span_context().span_id
@@ -0,0 +1,69 @@
+import pytest
+from apps.worker.app.progress import ProgressWriter
+
+RUN_A = "00000000-0000-0000-0000-00000000000a"
+RUN_B = "00000000-0000-0000-0000-00000000000b"
+
+
+class RecordingWriter(ProgressWriter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.batches = []
+        self.fail = 0
+
+    async def _write(self, items):
+        if self.fail:
+            self.fail -= 1
+            raise ConnectionError("database unavailable")
+        self.batches.append(dict(items))
+        return len(items)
+
+
+@pytest.mark.asyncio
+async def test_updates_are_coalesced_per_run_and_batched():
+    writer = RecordingWriter(batch_size=1)
+    writer.record(RUN_A, status="RUNNING")
+    writer.record(RUN_A, current_step_index=2)
+    writer.record(RUN_B, status="RUNNING")
+    assert await writer.flush() == 2
+    assert writer.batches == [{RUN_A: {"status": "RUNNING", "current_step_index": 2}}, {RUN_B: {"status": "RUNNING"}}]
+    assert writer.stats() == {"pending": 0, "flushes": 1, "rows_written": 2}
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(ValueError):
+        RecordingWriter().record(RUN_A, output="x")
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_requeues_under_newer_updates():
+    writer = RecordingWriter()
+    writer.record(RUN_A, status="RUNNING", current_step_index=1)
+    writer.fail = 1
+    with pytest.raises(ConnectionError):
+        await writer.flush()
+    writer.record(RUN_A, current_step_index=3)
+    writer.fail = 0
+    await writer.flush()
+    assert writer.batches == [{RUN_A: {"status": "RUNNING", "current_step_index": 3}}]
+
+
+@pytest.mark.asyncio
+async def test_terminal_status_survives_a_failed_write():
+    writer = RecordingWriter()
+    writer.fail = 1
+    await writer.record_terminal(RUN_A, "SUCCEEDED", current_step_index=4)
+    # e.g. the executor's failure handler running after the write error
+    await writer.record_terminal(RUN_A, "FAILED", error_message="boom")
+    await writer.flush()
+    assert writer.batches == [{RUN_A: {"status": "SUCCEEDED", "current_step_index": 4}}]
+
+
+@pytest.mark.asyncio
+async def test_terminal_write_is_immediate_and_after_earlier_progress():
+    writer = RecordingWriter()
+    writer.record(RUN_A, status="RUNNING")
+    await writer.record_terminal(RUN_A, "FAILED", error_message="boom")
+    assert writer.batches == [{RUN_A: {"status": "FAILED", "error_message": "boom"}}]
+    with pytest.raises(ValueError):
+        await writer.record_terminal(RUN_A, "RUNNING")
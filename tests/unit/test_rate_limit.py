@@ -0,0 +1,38 @@
+import pytest
+from apps.worker.app.rate_limit import HostRateLimiter, RateLimitExceeded, parse_limits
+
+
+def test_parse_limits():
+    assert parse_limits("API.test=10:20, slow.test=0.5") == {"api.test": (10.0, 20), "slow.test": (0.5, 1)}
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_allows_burst_then_throttles(fake_redis):
+    limiter = HostRateLimiter(overrides="api.test=1:2", max_wait=0)
+    await limiter.acquire("api.test")
+    await limiter.acquire("API.test")
+    with pytest.raises(RateLimitExceeded):
+        await limiter.acquire("api.test")
+    state = await fake_redis.hgetall("ratelimit:api.test")
+    assert float(state["tokens"]) < 1
+    assert 0 < await fake_redis.pttl("ratelimit:api.test") <= 3000
+
+
+@pytest.mark.asyncio
+async def test_waits_for_the_next_token(fake_redis, monkeypatch):
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+        await fake_redis.hset("ratelimit:api.test", "tokens", 1)
+    monkeypatch.setattr("apps.worker.app.rate_limit.asyncio.sleep", sleep)
+    limiter = HostRateLimiter(overrides="api.test=10:1", max_wait=1)
+    await limiter.acquire("api.test")
+    await limiter.acquire("api.test")
+    assert len(slept) == 1 and 0 < slept[0] <= 0.1
+    assert limiter.throttled == 1
+
+
+@pytest.mark.asyncio
+async def test_hosts_without_a_limit_skip_redis():
+    await HostRateLimiter(default_rate=0).acquire("free.test")
@@ -0,0 +1,54 @@
+import httpx
+import pytest
+from apps.worker.app import retry
+from shared.shared.schemas.workflow import RetryPolicy
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("GET", "http://api.test/")
+    response = httpx.Response(status, request=request, headers=headers)
+    return httpx.HTTPStatusError("failed", request=request, response=response)
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+    monkeypatch.setattr(retry.asyncio, "sleep", sleep)
+    return delays
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_errors_until_success(no_sleep):
+    errors = [httpx.ConnectError("refused"), status_error(503)]
+
+    async def call():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    policy = RetryPolicy(max_attempts=3, initial_backoff_seconds=1, jitter=False)
+    assert await retry.call_with_retry(call, policy) == "ok"
+    assert no_sleep == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_immediately(no_sleep):
+    calls = 0
+
+    async def call():
+        nonlocal calls
+        calls += 1
+        raise status_error(404)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await retry.call_with_retry(call, RetryPolicy(max_attempts=5))
+    assert calls == 1
+
+
+def test_backoff_is_capped_and_honours_retry_after():
+    policy = RetryPolicy(initial_backoff_seconds=1, max_backoff_seconds=5, jitter=False)
+    assert [retry.backoff_seconds(policy, n) for n in (1, 2, 3, 4)] == [1, 2, 4, 5]
+    assert retry.retry_after_seconds(status_error(429, {"retry-after": "7"})) == 7
@@ -0,0 +1,38 @@
+import asyncio
+import pytest
+from apps.api.app.cache.run_state import RunStateStore, run_state_key
+from apps.api.app.events.hub import RunEventHub
+
+
+@pytest.mark.asyncio
+async def test_events_reach_only_the_runs_subscribers(fake_redis):
+    hub = RunEventHub()
+    async with hub.subscribe("r1") as first, hub.subscribe("r1") as second, hub.subscribe("r2") as other:
+        hub.dispatch({"run_id": "r1", "event": "run_status"})
+        assert first.get_nowait() == second.get_nowait() == {"run_id": "r1", "event": "run_status"}
+        assert other.empty()
+    assert hub._subscribers == {}
+    await hub.stop()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_lose_their_oldest_events(fake_redis):
+    hub = RunEventHub(queue_size=2)
+    async with hub.subscribe("r1") as queue:
+        for index in range(3):
+            hub.dispatch({"run_id": "r1", "step_index": index})
+        assert [queue.get_nowait()["step_index"] for _ in range(2)] == [1, 2]
+    await hub.stop()
+
+
+@pytest.mark.asyncio
+async def test_state_updates_are_fanned_out_from_redis(fake_redis):
+    hub = RunEventHub()
+    await fake_redis.hset(run_state_key("r1"), "status", "RUNNING")
+    async with hub.subscribe("r1") as queue:
+        # Give the read loop a moment to subscribe; pub/sub doesn't buffer.
+        await asyncio.sleep(0.05)
+        await RunStateStore().update("r1", event="run_status", event_data={"status": "SUCCEEDED", "terminal": True}, status="SUCCEEDED")
+        event = await asyncio.wait_for(queue.get(), 2)
+    assert event == {"run_id": "r1", "event": "run_status", "status": "SUCCEEDED", "terminal": True}
+    await hub.stop()
@@ -0,0 +1,53 @@
+import json
+import pytest
+from apps.api.app.cache.run_state import (
+    RUN_EVENTS_CHANNEL,
+    RUN_STATE_TTL_SECONDS,
+    RunStateStore,
+    encode_state,
+    run_state_key,
+)
+
+
+@pytest.mark.asyncio
+async def test_update_sets_fields_refreshes_ttl_and_publishes(fake_redis):
+    store = RunStateStore()
+    key = run_state_key("r1")
+    await fake_redis.hset(key, mapping=encode_state({"run_id": "r1", "status": "QUEUED"}))
+    await fake_redis.expire(key, 10)
+    pubsub = fake_redis.pubsub()
+    await pubsub.subscribe(RUN_EVENTS_CHANNEL)
+    await pubsub.get_message(timeout=1)
+
+    assert await store.update("r1", event="run_status", event_data={"terminal": False}, status="RUNNING", current_step_index=2)
+    state = await store.get("r1")
+    assert (state["status"], state["current_step_index"]) == ("RUNNING", 2)
+    assert state["last_updated_at"]
+    assert await fake_redis.ttl(key) > 10
+    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1)
+    assert json.loads(message["data"]) == {"run_id": "r1", "event": "run_status", "terminal": False}
+    await pubsub.aclose()
+
+
+@pytest.mark.asyncio
+async def test_update_does_not_resurrect_an_expired_state(fake_redis):
+    store = RunStateStore()
+    pubsub = fake_redis.pubsub()
+    await pubsub.subscribe(RUN_EVENTS_CHANNEL)
+    await pubsub.get_message(timeout=1)
+
+    assert not await store.update("gone", event="run_status", status="SUCCEEDED")
+    assert not await fake_redis.exists(run_state_key("gone"))
+    assert await pubsub.get_message(ignore_subscribe_messages=True, timeout=0.1) is None
+    await pubsub.aclose()
+
+
+@pytest.mark.asyncio
+async def test_get_many_and_step_results(fake_redis):
+    store = RunStateStore()
+    await fake_redis.hset(run_state_key("r1"), mapping=encode_state({"run_id": "r1", "status": "RUNNING"}))
+    assert await store.get_many(["r1", "r2"], ["status"]) == {"r1": {"status": "RUNNING"}}
+
+    await store.set_step_result("r1", 0, "http", {"ok": True})
+    assert await store.get_step_results("r1", [0, 1]) == {0: {"type": "http", "result": {"ok": True}}}
+    assert 0 < await fake_redis.ttl("run:r1:step:0") <= RUN_STATE_TTL_SECONDS
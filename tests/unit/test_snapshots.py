@@ -0,0 +1,71 @@
+import json
+import pytest
+from apps.worker.app.snapshots import SnapshotWriter, apply_delta, compress, decompress, diff, project
+
+RUN_ID = "00000000-0000-0000-0000-000000000000"
+
+
+class FakeSession:
+    def __init__(self):
+        self.added = []
+        self.blob_inserts = 0
+
+    async def execute(self, stmt):
+        self.blob_inserts += 1
+
+    def add(self, row):
+        self.added.append(row)
+
+    async def commit(self):
+        pass
+
+
+def test_project_honours_include_keys():
+    context = {"step_0": 1, "step_1": 2}
+    assert project(context, ["step_1", "missing"]) == {"step_1": 2}
+    assert project(context, None) == context
+
+
+def test_delta_round_trip():
+    previous = {"step_0": {"a": 1}, "step_1": {"b": 2}}
+    current = {"step_0": {"a": 1}, "step_2": {"c": 3}}
+    delta = diff(previous, current)
+    assert delta == {"set": {"step_2": {"c": 3}}, "unset": ["step_1"]}
+    assert apply_delta(previous, delta) == current
+
+
+@pytest.mark.parametrize("codec", ["zstd", "gzip", "identity"])
+def test_compression_round_trip(codec):
+    raw = json.dumps({"items": list(range(1000))}).encode()
+    encoding, data = compress(raw, codec)
+    assert decompress(encoding, data) == raw
+
+
+@pytest.mark.asyncio
+async def test_writer_writes_deltas_between_full_snapshots():
+    db = FakeSession()
+    writer = SnapshotWriter(RUN_ID, full_interval=3, threshold=10_000)
+    state = {}
+    for index in range(5):
+        state[f"step_{index}"] = {"value": index}
+        await writer.save(db, index, dict(state))
+
+    assert [row.kind for row in db.added] == ["full", "delta", "delta", "full", "delta"]
+    assert db.added[1].base_snapshot_id == db.added[0].id
+    assert db.added[2].snapshot_json == {"set": {"step_2": {"value": 2}}, "unset": []}
+
+    rebuilt = db.added[3].snapshot_json
+    rebuilt = apply_delta(rebuilt, db.added[4].snapshot_json)
+    assert rebuilt == state
+
+
+@pytest.mark.asyncio
+async def test_large_payloads_go_to_deduplicated_blobs():
+    db = FakeSession()
+    payload = {"step_0": {"data": "x" * 5000}}
+    first = await SnapshotWriter(RUN_ID, threshold=100).save(db, 0, payload)
+    second = await SnapshotWriter(RUN_ID, threshold=100).save(db, 0, payload)
+
+    assert first.snapshot_json is None
+    assert first.blob_hash == second.blob_hash
+    assert db.blob_inserts == 2
@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from apps.worker.app.step_cache import StepResultCache, cache_key
+from shared.shared.schemas.workflow import HTTPStep, MCPToolStep
+
+
+def mcp_step(tool="search", key_fields=None, **input):
+    return MCPToolStep(type="mcp_tool", tool_name=tool, input=input, cache={"ttl_seconds": 60, "key_fields": key_fields})
+
+
+def test_key_ignores_input_order_but_not_values():
+    assert cache_key(mcp_step(a=1, b=2)) == cache_key(mcp_step(b=2, a=1))
+    assert cache_key(mcp_step(a=1)) != cache_key(mcp_step(a=2))
+
+
+def test_key_fields_select_inputs_but_tool_is_always_keyed():
+    fields = ["input.query"]
+    assert cache_key(mcp_step(key_fields=fields, query="x", trace_id=1)) == cache_key(mcp_step(key_fields=fields, query="x", trace_id=2))
+    assert cache_key(mcp_step("search", fields, query="x")) != cache_key(mcp_step("lookup", fields, query="x"))
+
+
+def test_only_get_requests_can_be_cached():
+    HTTPStep(type="http", method="GET", url="http://api.test", cache={"ttl_seconds": 60})
+    with pytest.raises(ValidationError, match="Only GET"):
+        HTTPStep(type="http", method="POST", url="http://api.test", cache={"ttl_seconds": 60})
+
+
+def fast_cache():
+    return StepResultCache(poll_initial=0.01, poll_max=0.02)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_run_the_step_once(fake_redis):
+    step = mcp_step(query="x")
+    owner, waiter = fast_cache(), fast_cache()
+    calls = []
+    release = asyncio.Event()
+
+    async def produce():
+        calls.append(1)
+        await release.wait()
+        return {"answer": 42}
+
+    first = asyncio.create_task(owner.get_or_run(step, produce))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(waiter.get_or_run(step, produce))
+    await asyncio.sleep(0.05)
+    release.set()
+
+    assert await first == await second == {"answer": 42}
+    assert len(calls) == 1
+    assert owner.stats() == {"hits": 0, "misses": 1, "waits": 0}
+    assert waiter.stats()["hits"] == 1 and waiter.stats()["waits"] >= 1
+    assert not await fake_redis.exists(f"{cache_key(step)}:lock")
+    assert 0 < await fake_redis.ttl(cache_key(step)) <= 60
+
+
+@pytest.mark.asyncio
+async def test_lock_is_released_when_the_step_fails(fake_redis):
+    step = mcp_step(query="x")
+    cache = fast_cache()
+
+    async def fail():
+        raise RuntimeError("tool failed")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_run(step, fail)
+    assert not await fake_redis.exists(f"{cache_key(step)}:lock")
+    assert not await fake_redis.exists(cache_key(step))
+
+    async def succeed():
+        return "ok"
+
+    assert await cache.get_or_run(step, succeed) == "ok"
+    assert cache.stats()["misses"] == 2
+
+
+@pytest.mark.asyncio
+async def test_waiters_take_over_when_the_owner_dies(fake_redis):
+    step = mcp_step(query="x")
+    # A worker took the lock and died; the lock expires on its own.
+    await fake_redis.set(f"{cache_key(step)}:lock", "dead-worker", px=50)
+    cache = fast_cache()
+
+    async def produce():
+        return "ran here"
+
+    assert await cache.get_or_run(step, produce) == "ran here"
+    assert cache.stats()["waits"] >= 1 and cache.stats()["misses"] == 1
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from apps.worker.app.task_scheduler import Job, TaskScheduler
+
+
+def make_job(run_id, gate, log, tenant_id=None, workflow_id=None):
+    async def work():
+        log.append(("start", run_id))
+        await gate.wait()
+        log.append(("end", run_id))
+    return Job(run_id=run_id, factory=work, tenant_id=tenant_id, workflow_id=workflow_id, item=run_id)
+
+
+@pytest.mark.asyncio
+async def test_global_limit_applies_backpressure():
+    gate = asyncio.Event()
+    log = []
+    scheduler = TaskScheduler(max_concurrency=2)
+
+    assert scheduler.submit(make_job("a", gate, log))
+    assert scheduler.submit(make_job("b", gate, log))
+    assert scheduler.running == 2
+    assert scheduler.free_slots() == 0
+
+    gate.set()
+    assert await scheduler.wait_for_capacity(timeout=1)
+    await scheduler.drain(timeout=1)
+    assert sorted(r for e, r in log if e == "end") == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_tenant_cap_parks_and_resumes():
+    gate = asyncio.Event()
+    log = []
+    scheduler = TaskScheduler(max_concurrency=4, max_per_tenant=1)
+
+    assert scheduler.submit(make_job("a1", gate, log, tenant_id="a"))
+    assert not scheduler.submit(make_job("a2", gate, log, tenant_id="a"))
+    assert scheduler.submit(make_job("b1", gate, log, tenant_id="b"))
+    await asyncio.sleep(0)
+    assert scheduler.running == 2
+    assert scheduler.parked == 1
+
+    gate.set()
+    for _ in range(20):
+        if scheduler.running == 0 and scheduler.parked == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert ("end", "a2") in log
+
+
+@pytest.mark.asyncio
+async def test_drain_returns_unstarted_jobs_and_cancels_stragglers():
+    gate = asyncio.Event()
+    log = []
+    scheduler = TaskScheduler(max_concurrency=2, max_per_workflow=1)
+
+    scheduler.submit(make_job("r1", gate, log, workflow_id="wf"))
+    scheduler.submit(make_job("r2", gate, log, workflow_id="wf"))
+
+    unstarted = await scheduler.drain(timeout=0.05)
+    assert [job.run_id for job in unstarted] == ["r2"]
+    assert scheduler.running == 0
+    assert ("end", "r1") not in log
+    with pytest.raises(RuntimeError):
+        scheduler.submit(make_job("r3", gate, log))
+
+
+@pytest.mark.asyncio
+async def test_capped_tenant_does_not_use_up_global_capacity():
+    gate = asyncio.Event()
+    log = []
+    scheduler = TaskScheduler(max_concurrency=4, max_per_tenant=1)
+    jobs = [make_job(f"a{i}", gate, log, tenant_id="a") for i in range(5)]
+
+    assert scheduler.submit(jobs[0])
+    assert scheduler.can_accept(jobs[1])
+    assert not scheduler.submit(jobs[1])
+    # Tenant a has as many parked as it may run; the rest stay with the caller.
+    assert not scheduler.can_accept(jobs[2])
+    with pytest.raises(RuntimeError):
+        scheduler.submit(jobs[2])
+    assert scheduler.running == 1
+    assert scheduler.parked == 1
+    assert scheduler.free_slots() == 3
+
+    assert scheduler.submit(make_job("b1", gate, log, tenant_id="b"))
+    assert scheduler.running == 2
+
+    gate.set()
+    for _ in range(20):
+        if scheduler.running == 0 and scheduler.parked == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert ("end", "a1") in log
+
+
+@pytest.mark.asyncio
+async def test_on_done_only_runs_when_the_factory_returns():
+    done, exited = [], []
+
+    async def ok():
+        pass
+
+    async def broken():
+        raise RuntimeError("redis went away")
+
+    async def cancelled():
+        asyncio.current_task().cancel()
+        await asyncio.sleep(0)
+
+    async def on_done(job):
+        done.append(job.run_id)
+
+    scheduler = TaskScheduler(max_concurrency=4)
+    for run_id, factory in (("ok", ok), ("broken", broken), ("cancelled", cancelled)):
+        scheduler.submit(Job(run_id=run_id, factory=factory, on_done=on_done, on_exit=lambda job: exited.append(job.run_id)))
+    await scheduler.drain(timeout=1)
+    assert done == ["ok"]
+    assert sorted(exited) == ["broken", "cancelled", "ok"]
@@ -0,0 +1,101 @@
+import pytest
+from apps.worker.app.blobs import LocalBlobStore, is_ref
+from apps.worker.app.executor import StepFailed, WorkflowExecutor
+from shared.shared.schemas.workflow import WorkflowDefinition
+from shared.shared.templating import TemplateError, compile_step_templates
+
+
+def definition(*steps):
+    return WorkflowDefinition(version="1.0", steps=list(steps))
+
+
+def test_only_steps_with_placeholders_are_compiled():
+    templates = compile_step_templates(definition(
+        {"type": "http", "method": "GET", "url": "http://api.test/static"},
+        {"id": "fetch", "type": "http", "method": "GET", "url": "http://api.test/{{ input.id }}"},
+        {"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ steps.fetch.result.name }}"}},
+    ).steps)
+    assert set(templates) == {1, 2}
+    assert templates[1].step_refs == frozenset()
+    assert templates[2].step_refs == {1}
+
+
+def test_whole_placeholders_keep_their_type_and_inline_ones_are_interpolated():
+    step = definition({"type": "mcp_tool", "tool_name": "t", "input": {
+        "ids": "{{ input.ids }}", "label": "order {{ input.ids.0 }} of {{input.count}}", "fixed": 1,
+    }}).steps[0]
+    rendered = compile_step_templates([step])[0].render(step, {"input": {"ids": [7, 8], "count": 2}, "steps": {}})
+    assert rendered.input == {"ids": [7, 8], "label": "order 7 of 2", "fixed": 1}
+    assert step.input["ids"] == "{{ input.ids }}"
+
+
+def test_missing_values_raise():
+    step = definition({"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ input.missing }}"}}).steps[0]
+    with pytest.raises(TemplateError, match="input.missing"):
+        compile_step_templates([step])[0].render(step, {"input": {}, "steps": {}})
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([{"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ steps.0.result }}"}}], "does not run before it"),
+    ([{"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ steps.nope.result }}"}}], "unknown step"),
+    ([{"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ env.SECRET }}"}}], "must start with"),
+])
+def test_invalid_references_are_rejected(steps, message):
+    with pytest.raises(ValueError, match=message):
+        definition(*steps)
+
+
+def test_dag_steps_only_read_results_of_their_dependencies():
+    a = {"id": "a", "type": "http", "method": "GET", "url": "http://api.test"}
+    b = {"id": "b", "type": "http", "method": "GET", "url": "http://api.test", "depends_on": ["a"]}
+    reads_a = {"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ steps.a.result.id }}"}}
+    definition(a, b, {**reads_a, "depends_on": ["b"]})
+    with pytest.raises(ValueError, match="does not run before it"):
+        definition(a, b, {**reads_a, "depends_on": []})
+
+
+class FakeStateStore:
+    async def update(self, run_id, **fields):
+        return True
+
+    async def set_step_result(self, run_id, index, step_type, result):
+        pass
+
+
+class EchoExecutor(WorkflowExecutor):
+    def __init__(self, blobs):
+        super().__init__("00000000-0000-0000-0000-000000000000")
+        self.state_store = FakeStateStore()
+        self.blobs = blobs
+        self.calls = []
+
+    async def _execute_step(self, step, context):
+        self.calls.append(step)
+        return {"items": ["x" * 100] * 1000, "next": "page-2"} if step.type == "http" else step.input
+
+
+@pytest.mark.asyncio
+async def test_executor_renders_input_and_offloaded_step_results(tmp_path):
+    workflow = definition(
+        {"type": "http", "method": "GET", "url": "http://api.test/{{ input.customer }}/orders"},
+        {"type": "mcp_tool", "tool_name": "t", "input": {"cursor": "{{ steps.0.result.next }}", "who": "{{ input.customer }}"}},
+    )
+    executor = EchoExecutor(LocalBlobStore(str(tmp_path)))
+    executor.run_input = {"customer": "c-1"}
+    executor.templates = compile_step_templates(workflow.steps)
+    context = {}
+    await executor._run_sequential(None, workflow, context)
+
+    assert executor.calls[0].url == "http://api.test/c-1/orders"
+    assert is_ref(context["step_0"]["result"])
+    assert context["step_1"]["result"] == {"cursor": "page-2", "who": "c-1"}
+
+
+@pytest.mark.asyncio
+async def test_unresolvable_placeholder_fails_the_step(tmp_path):
+    workflow = definition({"type": "mcp_tool", "tool_name": "t", "input": {"q": "{{ input.q }}"}})
+    executor = EchoExecutor(LocalBlobStore(str(tmp_path)))
+    executor.templates = compile_step_templates(workflow.steps)
+    with pytest.raises(StepFailed, match="input.q"):
+        await executor._run_sequential(None, workflow, {})
+    assert executor.calls == []
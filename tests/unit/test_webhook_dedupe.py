@@ -0,0 +1,61 @@
+import pytest
+from apps.api.app.cache.webhook_dedupe import (
+    WEBHOOK_IDEMPOTENCY_TTL_SECONDS,
+    DeliveryInProgress,
+    WebhookDeduplicator,
+    dedupe_key,
+)
+from apps.api.app.cache.webhook_endpoints import ResolvedEndpoint
+
+ENDPOINT = ResolvedEndpoint(id="e", workflow_id="w", tenant_id=None, is_active=True, secret="s")
+WINDOWED = ResolvedEndpoint(id="e", workflow_id="w", tenant_id=None, is_active=True, secret="s", dedupe_window_seconds=60)
+
+
+def test_idempotency_key_takes_precedence_over_body():
+    key, ttl = dedupe_key(WINDOWED, "order-1", b'{"a": 1}')
+    assert ":idem:" in key and ttl == WEBHOOK_IDEMPOTENCY_TTL_SECONDS
+    assert dedupe_key(WINDOWED, "order-1", b'{"a": 2}')[0] == key
+    assert dedupe_key(WINDOWED, "order-2", b'{"a": 1}')[0] != key
+
+
+def test_body_hash_only_with_a_dedupe_window():
+    assert dedupe_key(ENDPOINT, None, b'{"a": 1}') is None
+    key, ttl = dedupe_key(WINDOWED, None, b'{"a": 1}')
+    assert ":body:" in key and ttl == 60
+    assert dedupe_key(WINDOWED, None, b'{"a": 2}')[0] != key
+
+
+@pytest.mark.asyncio
+async def test_duplicates_wait_until_the_first_run_is_confirmed(fake_redis):
+    dedupe = WebhookDeduplicator(pending_ttl=30)
+    assert await dedupe.claim("k", "run-1") is None
+    assert 0 < await fake_redis.ttl("k") <= 30
+    with pytest.raises(DeliveryInProgress):
+        await dedupe.claim("k", "run-2")
+
+    assert await dedupe.confirm("k", 600, "run-1")
+    assert await dedupe.claim("k", "run-2") == "run-1"
+    assert 30 < await fake_redis.ttl("k") <= 600
+    assert dedupe.stats() == {"claims": 1, "duplicates": 1, "in_progress": 1}
+
+
+@pytest.mark.asyncio
+async def test_only_the_owner_can_confirm_or_release(fake_redis):
+    dedupe = WebhookDeduplicator()
+    await dedupe.claim("k", "run-1")
+    assert not await dedupe.confirm("k", 600, "run-2")
+    await dedupe.release("k", "run-2")
+    with pytest.raises(DeliveryInProgress):
+        await dedupe.claim("k", "run-2")
+
+    await dedupe.release("k", "run-1")
+    assert await dedupe.claim("k", "run-2") is None
+
+
+@pytest.mark.asyncio
+async def test_a_confirmed_claim_is_not_released(fake_redis):
+    dedupe = WebhookDeduplicator()
+    await dedupe.claim("k", "run-1")
+    await dedupe.confirm("k", 600, "run-1")
+    await dedupe.release("k", "run-1")
+    assert await dedupe.claim("k", "run-2") == "run-1"
@@ -0,0 +1,26 @@
+import hashlib
+import hmac
+from apps.api.app.cache.webhook_endpoints import ResolvedEndpoint
+from apps.api.app.routes.webhooks import verify_webhook_request
+
+ENDPOINT = ResolvedEndpoint(id="e", workflow_id="w", tenant_id=None, is_active=True, secret="s3cret")
+
+
+def sign(body: bytes, secret: str = "s3cret") -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_valid_signature_is_accepted():
+    assert verify_webhook_request(ENDPOINT, b'{"a": 1}', sign(b'{"a": 1}'), None)
+
+
+def test_signature_over_different_body_is_rejected():
+    assert not verify_webhook_request(ENDPOINT, b'{"a": 2}', sign(b'{"a": 1}'), None)
+    assert not verify_webhook_request(ENDPOINT, b"", sign(b"", secret="other"), None)
+    assert not verify_webhook_request(ENDPOINT, b"", "md5=abc", None)
+
+
+def test_shared_secret_header_still_works():
+    assert verify_webhook_request(ENDPOINT, b"", None, "s3cret")
+    assert not verify_webhook_request(ENDPOINT, b"", None, "wrong")
+    assert not verify_webhook_request(ENDPOINT, b"", None, None)
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from pydantic import ValidationError
+from shared.shared.schemas.workflow import WorkflowDefinition
+from apps.worker.app.executor import StepFailed, WorkflowExecutor
+
+
+def http_step(step_id=None, depends_on=None):
+    step = {"type": "http", "method": "GET", "url": "http://example.invalid"}
+    if step_id:
+        step["id"] = step_id
+    if depends_on:
+        step["depends_on"] = depends_on
+    return step
+
+
+def test_plain_list_is_sequential():
+    definition = WorkflowDefinition(version="1.0", steps=[http_step(), http_step()])
+    assert not definition.is_dag
+
+
+def test_dependency_indices():
+    definition = WorkflowDefinition(version="1.0", steps=[
+        http_step("a"), http_step("b"), http_step("c", ["a", "b"]),
+    ])
+    assert definition.is_dag
+    assert definition.dependency_indices() == [[], [], [0, 1]]
+
+
+@pytest.mark.parametrize("steps, message", [
+    ([http_step("a", ["b"]), http_step("b", ["a"])], "cycle"),
+    ([http_step("a", ["a"])], "depends on itself"),
+    ([http_step("a", ["missing"])], "unknown step id"),
+    ([http_step("a"), http_step("a")], "Duplicate step id"),
+])
+def test_invalid_graphs_are_rejected(steps, message):
+    with pytest.raises(ValidationError, match=message):
+        WorkflowDefinition(version="1.0", steps=steps)
+
+
+class FakeStateStore:
+    async def update(self, run_id, **fields):
+        return True
+
+    async def set_step_result(self, run_id, index, step_type, result):
+        pass
+
+
+class FakeRun:
+    current_step_index = 0
+
+
+class RecordingExecutor(WorkflowExecutor):
+    def __init__(self, fail_index=None):
+        super().__init__("00000000-0000-0000-0000-000000000000")
+        self.state_store = FakeStateStore()
+        self.active = 0
+        self.peak = 0
+        self.order = []
+        self.fail_index = fail_index
+
+    async def _execute_step(self, step, context):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        self.order.append(step.id)
+        if step.id == self.fail_index:
+            raise RuntimeError("boom")
+        return {"id": step.id}
+
+
+@pytest.mark.asyncio
+async def test_dag_runs_independent_steps_concurrently_within_cap():
+    definition = WorkflowDefinition(version="1.0", max_parallelism=2, steps=[
+        http_step("a"), http_step("b"), http_step("c"), http_step("join", ["a", "b", "c"]),
+    ])
+    executor = RecordingExecutor()
+    context = {}
+    await executor._run_dag(FakeRun(), definition, context)
+
+    assert executor.peak == 2
+    assert executor.order[-1] == "join"
+    assert set(context) == {"step_0", "step_1", "step_2", "step_3"}
+
+
+@pytest.mark.asyncio
+async def test_dag_failure_stops_dependents():
+    definition = WorkflowDefinition(version="1.0", steps=[
+        http_step("a"), http_step("b", ["a"]),
+    ])
+    executor = RecordingExecutor(fail_index="a")
+    with pytest.raises(StepFailed) as excinfo:
+        await executor._run_dag(FakeRun(), definition, {})
+    assert excinfo.value.index == 0
+    assert executor.order == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_dag_resume_skips_restored_steps():
+    definition = WorkflowDefinition(version="1.0", steps=[
+        http_step("a"), http_step("b", ["a"]), http_step("c", ["b"]),
+    ])
+    executor = RecordingExecutor()
+    context = {"step_0": {"type": "http", "result": {"id": "a"}}}
+    await executor._run_dag(FakeRun(), definition, context)
+
+    assert executor.order == ["b", "c"]
+    assert set(context) == {"step_0", "step_1", "step_2"}
+
+
+@pytest.mark.asyncio
+async def test_sequential_resume_reruns_only_missing_steps():
+    definition = WorkflowDefinition(version="1.0", steps=[
+        http_step("a"), http_step("b"), http_step("c"),
+    ])
+    executor = RecordingExecutor()
+    context = {"step_0": {}, "step_2": {}}
+    await executor._run_sequential(FakeRun(), definition, context)
+
+    assert executor.order == ["b"]